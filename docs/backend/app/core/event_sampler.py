@@ -0,0 +1,98 @@
+# event_sampler.py
+import random
+
+import numpy as np
+
+from .game_constants import PA_EVENT_TYPES
+from .rng import make_rng
+
+
+def probabilities_to_vector(probabilities):
+    """
+    Converts an event-probability dict into a vector ordered like PA_EVENT_TYPES.
+    The vector is renormalized so that it sums to exactly 1.0 (required by multinomial sampling).
+    """
+    prob_vector = np.array([max(0.0, probabilities.get(event_type, 0.0)) for event_type in PA_EVENT_TYPES], dtype=np.float64)
+    total = prob_vector.sum()
+    if total <= 0:
+        prob_vector[PA_EVENT_TYPES.index("IPO")] = 1.0 # Default to an out, same as simulate_season
+        return prob_vector
+    return prob_vector / total
+
+
+class AliasEventSampler:
+    """
+    Walker/Vose alias table over PA_EVENT_TYPES.
+    Built once per probability vector (O(k)); every draw afterwards is O(1):
+    one uniform picks a column and a coin flip inside that column picks the event or its alias.
+    """
+
+    def __init__(self, probabilities):
+        self.prob_vector = probabilities_to_vector(probabilities)
+        num_events = len(PA_EVENT_TYPES)
+        scaled = [p * num_events for p in self.prob_vector]
+        prob_table = [0.0] * num_events
+        alias_table = list(range(num_events))
+
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob_table[less] = scaled[less]
+            alias_table[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # Whatever is left is 1.0 up to rounding error
+        for i in large + small:
+            prob_table[i] = 1.0
+
+        self._num_events = num_events
+        self._prob_table = prob_table
+        self._alias_table = alias_table
+        self._prob_array = np.array(prob_table, dtype=np.float64)
+        self._alias_array = np.array(alias_table, dtype=np.int8)
+
+    def draw_index(self, rng=None):
+        """Draws one event index (position in PA_EVENT_TYPES). rng needs a .random() method."""
+        scaled_u = (rng or random).random() * self._num_events
+        column = int(scaled_u)
+        if column >= self._num_events: # guards u * k rounding up to k
+            column = self._num_events - 1
+        if scaled_u - column < self._prob_table[column]:
+            return column
+        return self._alias_table[column]
+
+    def draw(self, rng=None):
+        """Draws one plate-appearance event, e.g. "HR" or "IPO"."""
+        return PA_EVENT_TYPES[self.draw_index(rng)]
+
+    def draw_indices(self, size, rng=None):
+        """Draws event indices in bulk with a NumPy Generator. size may be an int or a shape tuple."""
+        rng = make_rng(rng)
+        columns = rng.integers(0, self._num_events, size=size)
+        coins = rng.random(size=size)
+        return np.where(coins < self._prob_array[columns], columns, self._alias_array[columns]).astype(np.int8)
+
+    def draw_events(self, size, rng=None):
+        """Draws `size` plate-appearance events and returns them as a list of event names."""
+        return [PA_EVENT_TYPES[i] for i in self.draw_indices(size, rng)]
+
+
+def draw_grouped_event_indices(prob_vectors, counts, rng=None):
+    """
+    Draws counts[g] events from prob_vectors[g] for every group g in one vectorized pass
+    (inverse CDF: one uniform per draw, compared against its group's cumulative probabilities).
+    prob_vectors: array (groups, len(PA_EVENT_TYPES)) of vectors from probabilities_to_vector.
+    Returns an int8 array of sum(counts) event indices, grouped in order: the first counts[0]
+    belong to group 0, and so on.
+    """
+    rng = make_rng(rng)
+    prob_vectors = np.asarray(prob_vectors, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    inner_cdfs = np.cumsum(prob_vectors[:, :-1], axis=1) # the last event takes whatever is left
+    group_of_draw = np.repeat(np.arange(len(counts)), counts)
+    uniforms = rng.random(len(group_of_draw))
+    return (uniforms[:, np.newaxis] >= inner_cdfs[group_of_draw]).sum(axis=1).astype(np.int8)
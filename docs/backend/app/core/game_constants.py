@@ -10,6 +10,57 @@ ATTRIBUTE_MAPPING_POINTS = {'pr1': 40, 'pr50': 70, 'pr99': 99}
 
 # 模擬參數 (不變)
 NUM_PA_PER_SEASON_ARCHETYPE = 600
+NUM_SEASONS_FOR_FINAL_RUN = 1000 # 原型校準與最終確認模擬的賽季數
+SIMULATION_BATCH_SEASONS = 10000 # 長時間模擬每批賽季數 (串流彙總，記憶體用量固定)
+
+# 精度導向的自適應模擬 (信賴區間半寬低於容許值即停止)
+ADAPTIVE_SIM_STAT_KEYS = ["BA", "OBP", "SLG", "OPS"] # 預設追蹤的統計量
+ADAPTIVE_SIM_TOLERANCE = 0.010 # 95% 信賴區間半寬容許值 (絕對值)
+ADAPTIVE_SIM_CONFIDENCE = 0.95
+ADAPTIVE_SIM_BATCH_SEASONS = 10 # 每批追加的賽季數
+ADAPTIVE_SIM_MIN_SEASONS = 10 # 估計變異數前的最少賽季數
+ADAPTIVE_SIM_MAX_SEASONS = 400 # 上限
+
+# 打席事件順序 (機率向量與事件計數陣列的欄位順序)
+PA_EVENT_TYPES = ["HR", "2B", "1B", "BB", "HBP", "K", "IPO"]
+
+# 預先計算的 POW x HIT x EYE 機率查表 (見 core/probability_table.py)
+PROBABILITY_TABLE_MAX_ATTRIBUTE = 165.0 # SOFT_CAP_ATTRIBUTE_VALUE * 1.1，S 型曲線在此之後為常數
+PROBABILITY_TABLE_STEP = 5.0 # 格點間距 (34^3 格點 x 7 事件 float32 ≈ 1.1 MB)
+PROBABILITY_TABLE_TOLERANCE = 5e-4 # step=5.0 時查表與 get_pa_event_probabilities 的每事件最大絕對誤差 (實測約 3.2e-4，誤差集中在不在格點上的錨點 99 附近)
+
+# 整場比賽模擬 (見 core/game_engine.py；規則與前端 js/gameLogic.js、js/config.js 相同)
+GAME_INNINGS = 9
+GAME_MAX_INNINGS = 30 # 延長賽上限，仍平手則以和局結束
+GAME_STAMINA_DRAIN_MIN = 2.5 # 每位打者消耗的投手體力 (min, min+1, ... <= max 中均勻抽取)
+GAME_STAMINA_DRAIN_MAX = 4.5
+GAME_RUNNER_EXTRA_BASE_FAST = 0.40 # 一壘安打/二壘安打時，速度 > 7 的跑者多推進一個壘包的機率
+GAME_RUNNER_EXTRA_BASE_MEDIUM = 0.20 # 速度 > 5 (第一次判定未成功時同樣適用)
+GAME_STARTER_PULL_STAMINA_FRACTION = 0.35 # 先發體力低於此比例或已投 GAME_STARTER_MAX_OUTS 個出局數即換投
+GAME_STARTER_MAX_OUTS = 18
+GAME_RELIEVER_PULL_STAMINA_FRACTION = 0.30
+GAME_RELIEVER_MAX_OUTS = 6
+GAME_CLOSER_SCORE_MARGIN = 3 # 第 GAME_INNINGS - 1 局起分差不超過此值時派上終結者
+GAME_STARTER_RETURN_MIN_STAMINA = 30 # 換局時先發體力低於此值則改由牛棚上場
+MAX_GAMES_PER_REQUEST = 1000 # /api/v1/simulate_game 單一請求的比賽數上限
+MAX_SERIES_GAMES = 10000 # /api/v1/simulate_series (串流) 單一請求的比賽數上限
+GAME_SERIES_CHUNK_SIZE = 10 # 行程池每個工作模擬的比賽數
+GAME_SERIES_MAX_IN_FLIGHT_PER_WORKER = 2 # 每個工作行程最多同時排隊的工作數 (限制伺服器記憶體用量)
+GAME_SOCKET_MAX_PLAYS_PER_MESSAGE = 1000 # /api/v1/ws/game 單一 "next" 訊息最多推進的打席數
+GAME_SOCKET_IDLE_TIMEOUT_SECONDS = 600 # WebSocket 比賽工作階段閒置多久後由伺服器關閉 (釋放保存的比賽狀態)
+
+# 批次打席 API (POST /api/v1/simulate_at_bats)
+MAX_AT_BATS_PER_REQUEST = 100000 # 單一請求的打席總數上限
+
+# 解析反推模型 (見 core/inverse_model.py)
+INVERSE_MODEL_MAX_ITERATIONS = 50 # HR / 2B 耦合項的定點迭代上限
+INVERSE_MODEL_TOLERANCE = 1e-4 # 兩次迭代的屬性變化 (點數) 低於此值即收斂
+
+# 事件機率快取 (見 core/probability_cache.py)
+PROBABILITY_MODEL_VERSION = "s-curve-v3" # 內建參數組的名稱；快取與查表以參數內容雜湊區分版本 (見 core/parameter_set.py)
+PROBABILITY_CACHE_MAX_ENTRIES = 65536 # LRU 上限 (每筆約 1 KB)
+PROBABILITY_CACHE_ATTRIBUTE_QUANTUM = 0.01 # 屬性量化間距，鍵與實際計算都使用量化後的值
+PROBABILITY_CACHE_HBP_QUANTUM = 1e-5 # 觸身球率量化間距
 
 # --- 最佳化流程參數 (三階段) ---
 # 階段一
@@ -25,6 +76,17 @@ DEVIATION_PENALTY_WEIGHT_STAGE_ONE = 0.005 # 早期階段錨點懲罰較輕
 # 階段二
 NUM_ITERATIONS_PER_CANDIDATE_STAGE_TWO = 100 # 每個候選區域的迭代次數
 NUM_SEASONS_PER_EVAL_STAGE_TWO = 40
+# 共同亂數 (CRN) 模式: 同一階段所有候選者共用同一組均勻亂數，誤差比較成為配對比較。
+# 實測 CRN 10 個賽季的誤差差異標準差與獨立抽樣 40 個賽季相當
+CRN_SEASONS_PER_EVAL_STAGE_ONE = 5
+CRN_SEASONS_PER_EVAL_STAGE_TWO = 10
+OPTIMIZER_CANDIDATE_CHUNK_SIZE = 50 # 平行評估時每個工作的候選者數
+OPTIMIZER_CHECKPOINT_INTERVAL = 100 # 兩階段搜索每評估這麼多個候選者寫一次檢查點 (見 utils/checkpoint.py)
+
+# 逐次減半競賽 (racing) 搜索: 每輪存活者的累計賽季數加倍，誤差信賴區間明顯較差者淘汰，其餘最多保留一半
+RACING_INITIAL_SEASONS = 4 # 第一輪每個候選者的賽季數 (太少時第一輪減半幾乎是隨機淘汰)
+RACING_MAX_SEASONS = 256 # 每個候選者累計賽季數上限 (達到即停止)
+RACING_CONFIDENCE = 0.95 # 淘汰用的誤差信賴水準
 TOP_M_CANDIDATES_FROM_STAGE_TWO = 15
 ERROR_WEIGHTS_STAGE_TWO = {
     "BA": 1.5, "OBP": 1.8, "SLG": 1.5, "HR": 2.0,
@@ -58,6 +120,13 @@ DEVIATION_PENALTY_WEIGHT = DEVIATION_PENALTY_WEIGHT_STAGE_TWO
 
 ATTRIBUTE_SEARCH_RANGE_DELTA = 30
 
+# 代理 (surrogate) 最佳化: 以解析期望統計量 (expected_sim_stats) 取代蒙地卡羅，Nelder-Mead 局部搜索
+SURROGATE_START_OFFSET = 15.0 # 多起點: 錨點本身，以及各屬性 ±此值的 6 個起點
+SURROGATE_INITIAL_STEP = 8.0 # 初始單純形邊長 (屬性點數)
+SURROGATE_MAX_EVALUATIONS = 300 # 每個起點的目標函數評估上限
+SURROGATE_ERROR_TOLERANCE = 1e-8 # 單純形各頂點誤差差距低於此值...
+SURROGATE_ATTRIBUTE_TOLERANCE = 0.01 # ...且頂點間距低於此值 (屬性點數) 即收斂
+
 # --- S-Curve Anchor Definitions & 其他模型參數 ---
 ATTR_EFFECT_MIDPOINT = 70.0
 SOFT_CAP_ATTRIBUTE_VALUE = 150.0
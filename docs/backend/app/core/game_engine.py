@@ -0,0 +1,370 @@
+# game_engine.py
+import functools
+
+import numpy as np
+
+from .game_constants import (
+    PA_EVENT_TYPES,
+    GAME_INNINGS, GAME_MAX_INNINGS,
+    GAME_STAMINA_DRAIN_MIN, GAME_STAMINA_DRAIN_MAX,
+    GAME_RUNNER_EXTRA_BASE_FAST, GAME_RUNNER_EXTRA_BASE_MEDIUM,
+    GAME_STARTER_PULL_STAMINA_FRACTION, GAME_STARTER_MAX_OUTS,
+    GAME_RELIEVER_PULL_STAMINA_FRACTION, GAME_RELIEVER_MAX_OUTS,
+    GAME_CLOSER_SCORE_MARGIN, GAME_STARTER_RETURN_MIN_STAMINA,
+)
+from .event_sampler import AliasEventSampler
+from .probability_cache import ProbabilityCache
+from .probability_model import get_pa_event_probabilities
+from .probability_table import get_probability_table
+from .rng import make_rng
+
+# Bases a plate-appearance event moves the batter (and, before speed bonuses, every runner)
+_BASES_ADVANCED = {"HR": 4, "2B": 2, "1B": 1, "BB": 1, "HBP": 1, "K": 0, "IPO": 0}
+_AT_BAT_EVENTS = {"HR", "2B", "1B", "K", "IPO"}
+_HIT_EVENTS = {"HR", "2B", "1B"}
+_OUT_EVENTS = {"K", "IPO"}
+# Events drawn per refill of a batter's buffer; a game rarely needs more than 6 per batter
+_EVENT_BUFFER_SIZE = 16
+
+
+class GameBatter:
+    """One lineup slot: attributes, a pre-built sampler and the box-score line for this game."""
+
+    def __init__(self, name, POW, HIT, EYE, hbp_rate=None, speed=5, prob_calculator_func=get_pa_event_probabilities):
+        self.name = name
+        self.speed = speed
+        self.probabilities = prob_calculator_func(POW, HIT, EYE, hbp_rate)
+        self._sampler = AliasEventSampler(self.probabilities)
+        self._buffer = []
+        self.line = {"PA": 0, "AB": 0, "H": 0, "HR": 0, "2B": 0, "1B": 0, "BB": 0, "HBP": 0, "K": 0, "R": 0, "RBI": 0}
+
+    def next_event(self, rng):
+        # The batter's events do not depend on the game situation, so they are drawn in blocks
+        if not self._buffer:
+            self._buffer = [PA_EVENT_TYPES[i] for i in self._sampler.draw_indices(_EVENT_BUFFER_SIZE, rng)][::-1]
+        return self._buffer.pop()
+
+
+class GamePitcher:
+    """A pitcher's stamina and box-score line for this game. role is "Starter", "Reliever" or "Closer"."""
+
+    def __init__(self, name, role="Starter", max_stamina=100.0):
+        self.name = name
+        self.role = role
+        self.max_stamina = float(max_stamina)
+        self.stamina = float(max_stamina)
+        self.line = {"BF": 0, "OUTS": 0, "K": 0, "BB": 0, "H": 0, "HR": 0, "R": 0}
+
+
+class GameTeam:
+    """Lineup, pitching staff (starter plus optional reliever and closer), score and batting-order position."""
+
+    def __init__(self, name, batters, starter, reliever=None, closer=None):
+        if not batters:
+            raise ValueError(f"{name}: lineup is empty")
+        self.name = name
+        self.batters = batters
+        self.starter = starter
+        self.reliever = reliever
+        self.closer = closer
+        self.runs = 0
+        self.hits = 0
+        self.line_score = []
+        self.batter_index = 0
+
+    def bullpen_or_starter(self):
+        return self.reliever or self.closer or self.starter
+
+
+class GameSimulator:
+    """
+    Server-side version of the game loop in js/gameLogic.js (playNextAtBat, processAtBatOutcome,
+    changeHalfInning): nine innings plus extras, pitcher stamina and changes, and speed-based extra
+    bases on singles and doubles. Plate-appearance outcomes come from each batter's
+    get_pa_event_probabilities vector (the pitcher does not affect them, as in the frontend).
+
+    Two deliberate differences from the browser: a runner only takes an extra base when that
+    base is free (the browser can overwrite a runner there), and the game ends as soon as the
+    home team leads in the bottom of the last inning or later (walk-off) instead of after the
+    third out. Extra innings stop at GAME_MAX_INNINGS and the game ends tied.
+
+    The state is a small base/out machine (inning, half, outs, three base slots) that advances one
+    plate appearance per play_plate_appearance() call, so callers can run a game to the end
+    (simulate()) or step through it and send each play.
+    """
+
+    def __init__(self, away, home, rng=None, innings=GAME_INNINGS, max_innings=GAME_MAX_INNINGS):
+        self.away = away
+        self.home = home
+        self.rng = make_rng(rng)
+        self.innings = innings
+        self.max_innings = max_innings
+        self.inning = 1
+        self.half = "top"
+        self.outs = 0
+        self.bases = [None, None, None] # runner (GameBatter) on first, second, third
+        self.game_over = False
+        self.pitchers = {"away": away.starter, "home": home.starter} # pitcher currently in for each team
+        self.pitchers_used = {"away": [away.starter], "home": [home.starter]}
+        away.line_score.append(0) # a half-inning gets its line-score entry when it starts
+
+    # --- State helpers ---
+    @property
+    def batting_team(self):
+        return self.away if self.half == "top" else self.home
+
+    @property
+    def fielding_team(self):
+        return self.home if self.half == "top" else self.away
+
+    @property
+    def fielding_key(self):
+        return "home" if self.half == "top" else "away"
+
+    def _bring_in(self, pitcher):
+        key = self.fielding_key
+        self.pitchers[key] = pitcher
+        if pitcher not in self.pitchers_used[key]:
+            self.pitchers_used[key].append(pitcher)
+
+    def _change_pitcher_if_needed(self):
+        """Same rules as the pitcher-change block in playNextAtBat; returns the new pitcher or None."""
+        team, current = self.fielding_team, self.pitchers[self.fielding_key]
+        stamina_fraction = current.stamina / current.max_stamina if current.max_stamina > 0 else 0.0
+        candidate = None
+        if current.role == "Starter" and (stamina_fraction < GAME_STARTER_PULL_STAMINA_FRACTION
+                                          or current.line["OUTS"] >= GAME_STARTER_MAX_OUTS):
+            candidate = team.reliever or team.closer
+        elif current.role == "Reliever" and (stamina_fraction < GAME_RELIEVER_PULL_STAMINA_FRACTION
+                                             or current.line["OUTS"] >= GAME_RELIEVER_MAX_OUTS):
+            candidate = team.closer or team.reliever
+        late_and_close = (self.inning >= max(1, self.innings - 1)
+                          and abs(self.away.runs - self.home.runs) <= GAME_CLOSER_SCORE_MARGIN)
+        if late_and_close and team.closer is not None and team.closer is not current and team.closer.stamina > 0:
+            candidate = team.closer
+        if candidate is not None and candidate is not current and candidate.stamina > 0:
+            self._bring_in(candidate)
+            return candidate
+        return None
+
+    def _advance_runners(self, event, batter):
+        """Moves the runners and the batter for a hit, walk or HBP; returns the runners who scored."""
+        bases_advanced = _BASES_ADVANCED[event]
+        new_bases = list(self.bases)
+        scored = []
+        for base in (2, 1, 0): # lead runner first
+            runner = new_bases[base]
+            if runner is None:
+                continue
+            advance = bases_advanced
+            if event in ("1B", "2B"):
+                extra = (runner.speed > 7 and self.rng.random() < GAME_RUNNER_EXTRA_BASE_FAST) or \
+                        (runner.speed > 5 and self.rng.random() < GAME_RUNNER_EXTRA_BASE_MEDIUM)
+                if extra and (base + advance + 1 >= 3 or new_bases[base + advance + 1] is None):
+                    advance += 1
+            new_bases[base] = None
+            if base + advance >= 3:
+                scored.append(runner)
+            else:
+                new_bases[base + advance] = runner
+        if event == "HR":
+            scored.append(batter)
+        else:
+            new_bases[bases_advanced - 1] = batter
+        self.bases = new_bases
+        return scored
+
+    def _end_half_inning(self):
+        """changeHalfInning: clear the bases, switch sides and decide whether the game is over."""
+        self.outs = 0
+        self.bases = [None, None, None]
+        if self.half == "top":
+            if self.inning >= self.innings and self.home.runs > self.away.runs:
+                self.game_over = True # home team does not need to bat
+                return
+            self.half = "bottom"
+            self.home.line_score.append(0)
+        else:
+            if self.inning >= self.innings and self.home.runs != self.away.runs:
+                self.game_over = True
+                return
+            if self.inning >= self.max_innings:
+                self.game_over = True # tied after the last allowed inning
+                return
+            self.half = "top"
+            self.inning += 1
+            self.away.line_score.append(0)
+        # The team taking the field starts the half with its starter unless he is spent
+        team = self.fielding_team
+        starter = team.starter
+        if starter.role == "Starter" and starter.stamina < GAME_STARTER_RETURN_MIN_STAMINA:
+            self._bring_in(team.bullpen_or_starter())
+        else:
+            self._bring_in(starter)
+
+    # --- Public API ---
+    def play_plate_appearance(self):
+        """
+        Plays the next plate appearance and returns a play dict: inning, half, batter, pitcher,
+        event, runs and RBI on the play, the pitching change before it (if any), and the outs,
+        bases and score after it.
+        """
+        if self.game_over:
+            raise RuntimeError("the game is over")
+        team, pitcher_change = self.batting_team, self._change_pitcher_if_needed()
+        pitcher = self.pitchers[self.fielding_key]
+        batter = team.batters[team.batter_index]
+        inning, half = self.inning, self.half
+        event = batter.next_event(self.rng)
+
+        drain_steps = int(GAME_STAMINA_DRAIN_MAX - GAME_STAMINA_DRAIN_MIN) + 1
+        pitcher.stamina = max(0.0, pitcher.stamina - (GAME_STAMINA_DRAIN_MIN + int(self.rng.integers(0, drain_steps))))
+
+        batter.line["PA"] += 1
+        pitcher.line["BF"] += 1
+        if event in _AT_BAT_EVENTS:
+            batter.line["AB"] += 1
+        if event in ("HR", "2B", "1B", "BB", "HBP", "K"):
+            batter.line[event] += 1
+        if event in ("K", "BB", "HR"):
+            pitcher.line[event] += 1
+        if event in _HIT_EVENTS:
+            batter.line["H"] += 1
+            pitcher.line["H"] += 1
+            team.hits += 1
+
+        scored = []
+        if event in _OUT_EVENTS:
+            self.outs += 1
+            pitcher.line["OUTS"] += 1
+        else:
+            scored = self._advance_runners(event, batter)
+        runs = len(scored)
+        rbi = runs if event != "BB" else 0 # the browser credits no RBI on a walk
+        for runner in scored:
+            runner.line["R"] += 1
+        batter.line["RBI"] += rbi
+        pitcher.line["R"] += runs
+        team.runs += runs
+        team.line_score[-1] += runs
+
+        team.batter_index = (team.batter_index + 1) % len(team.batters)
+        if self.half == "bottom" and self.inning >= self.innings and self.home.runs > self.away.runs:
+            self.game_over = True # walk-off
+        elif self.outs >= 3:
+            self._end_half_inning()
+
+        return {
+            "inning": inning, "half": half, "batter": batter.name, "pitcher": pitcher.name,
+            "pitching_change": pitcher_change.name if pitcher_change is not None else None,
+            "event": event, "runs": runs, "rbi": rbi,
+            "outs": self.outs, "bases": [runner.name if runner else None for runner in self.bases],
+            "away_runs": self.away.runs, "home_runs": self.home.runs, "game_over": self.game_over,
+        }
+
+    def simulate(self, record_plays=False):
+        """Plays the game to the end and returns result(); with record_plays the play list is included."""
+        plays = []
+        while not self.game_over:
+            play = self.play_plate_appearance()
+            if record_plays:
+                plays.append(play)
+        return self.result(plays if record_plays else None)
+
+    def state(self):
+        """Current situation: inning, half, outs, bases, score, the batter due up and the pitcher in (with stamina)."""
+        team, pitcher = self.batting_team, self.pitchers[self.fielding_key]
+        return {
+            "inning": self.inning, "half": self.half, "outs": self.outs,
+            "bases": [runner.name if runner else None for runner in self.bases],
+            "away_runs": self.away.runs, "home_runs": self.home.runs,
+            "batter": team.batters[team.batter_index].name,
+            "pitcher": pitcher.name, "pitcher_stamina": pitcher.stamina, "game_over": self.game_over,
+        }
+
+    def result(self, plays=None):
+        """
+        Final (or current) score, line scores, winner and box-score lines for both teams.
+        The home line score has no entry for a bottom half that was not played.
+        """
+        if self.away.runs != self.home.runs:
+            winner = "away" if self.away.runs > self.home.runs else "home"
+        else:
+            winner = None
+        teams = {}
+        for key, team in (("away", self.away), ("home", self.home)):
+            teams[key] = {
+                "name": team.name, "runs": team.runs, "hits": team.hits, "line_score": list(team.line_score),
+                "batting": [{"name": batter.name, **batter.line} for batter in team.batters],
+                "pitching": [{"name": pitcher.name, "role": pitcher.role, **pitcher.line} for pitcher in self.pitchers_used[key]],
+            }
+        return {
+            "away": teams["away"], "home": teams["home"], "winner": winner,
+            "innings": self.inning, "game_over": self.game_over, "plays": plays,
+        }
+
+
+def build_team(team_data, prob_calculator_func=get_pa_event_probabilities):
+    """
+    GameTeam from plain data: {"name", "batters": [{"name", "pow", "hit", "eye", "hbp_rate", "speed"}],
+    "starter": {"name", "role", "max_stamina"}, "reliever": ..., "closer": ...} (reliever/closer optional).
+    Returns a fresh team, so the same data can be replayed for many games.
+    """
+    def pitcher(data, default_role):
+        if data is None:
+            return None
+        return GamePitcher(data["name"], data.get("role") or default_role, data.get("max_stamina", 100.0))
+
+    batters = [
+        GameBatter(batter["name"], batter["pow"], batter["hit"], batter["eye"], batter.get("hbp_rate"),
+                   batter.get("speed", 5), prob_calculator_func)
+        for batter in team_data["batters"]
+    ]
+    return GameTeam(team_data["name"], batters, pitcher(team_data["starter"], "Starter"),
+                    pitcher(team_data.get("reliever"), "Reliever"), pitcher(team_data.get("closer"), "Closer"))
+
+
+def simulate_game(away_data, home_data, rng=None, prob_calculator_func=get_pa_event_probabilities, record_plays=False):
+    """Runs one complete game between two teams given as build_team data and returns GameSimulator.result()."""
+    simulator = GameSimulator(build_team(away_data, prob_calculator_func), build_team(home_data, prob_calculator_func), rng)
+    return simulator.simulate(record_plays)
+
+
+# Per-process probability function for simulate_game_chunk, rebuilt when the model version changes
+_chunk_model = {}
+
+
+def _chunk_prob_calculator(params, uses_table, model_version):
+    """
+    The API's pa_event_probabilities_func rebuilt in a worker process: a ProbabilityCache (same
+    quantization, same version key) over the probability table or the exact model. Kept between
+    chunks so the cache stays warm.
+    """
+    if _chunk_model.get("model_version") != model_version:
+        if uses_table:
+            probability_table = get_probability_table(params)
+            if probability_table is None:
+                raise FileNotFoundError(f"no probability table for parameter set {params.version}")
+            prob_func = probability_table.get_pa_event_probabilities
+        else:
+            prob_func = functools.partial(get_pa_event_probabilities, params=params)
+        cache = ProbabilityCache(prob_func=prob_func, model_version=model_version, params=params)
+        _chunk_model.clear()
+        _chunk_model.update(model_version=model_version, prob_calculator_func=cache.get_pa_event_probabilities)
+    return _chunk_model["prob_calculator_func"]
+
+
+def simulate_game_chunk(chunk_args):
+    """
+    Worker: plays a run of games between the same two teams, each with its own SeedSequence, and
+    returns [(game index, result), ...]. The chunk carries the caller's model (parameter set,
+    whether the probability table backs it, and its version), so a seeded game matches
+    /api/v1/simulate_game.
+    """
+    away_data, home_data, (params, uses_table, model_version), first_index, seed_sequences, record_plays = chunk_args
+    prob_calculator_func = _chunk_prob_calculator(params, uses_table, model_version)
+    return [
+        (first_index + offset, simulate_game(away_data, home_data, np.random.default_rng(seed_sequence),
+                                             prob_calculator_func, record_plays))
+        for offset, seed_sequence in enumerate(seed_sequences)
+    ]
@@ -0,0 +1,156 @@
+# inverse_model.py
+from .game_constants import INVERSE_MODEL_MAX_ITERATIONS, INVERSE_MODEL_TOLERANCE
+from .parameter_set import get_active_parameter_set
+from .probability_model import (
+    clamp_hbp_rate,
+    get_pa_event_probabilities,
+    scale_attribute_to_effectiveness,
+    get_rate_from_effectiveness,
+)
+
+
+def _target_rate(target_counts, target_ratios, count_key, ratio_key, pa):
+    """Per-PA rate of one event from the counts (preferred) or the ratio table; None when neither has it."""
+    if pa and target_counts.get(count_key) is not None:
+        return target_counts[count_key] / pa
+    return target_ratios.get(ratio_key)
+
+
+def target_line_rates(target_ratios, target_counts, hbp_rate):
+    """
+    Per-PA rates implied by a target line (player_data layout: counts such as "HR_target",
+    ratios such as "OBP"). Counts are used when present; otherwise hits come from OBP (or BA) and
+    total bases from SLG. "HR" is None when the line has no HR count, in which case HR and 2B are
+    only known through the extra-base total "XB" = 2B + 3 * HR (from TB - H).
+    """
+    pa = target_counts.get("PA_target")
+    bb = _target_rate(target_counts, target_ratios, "BB_target", "BB_rate", pa)
+    k = _target_rate(target_counts, target_ratios, "K_target", "K_rate", pa)
+    if bb is None or k is None:
+        raise ValueError("target line needs a BB and a K rate (BB_target/K_target with PA_target, or BB_rate/K_rate)")
+    ab_share = target_counts["AB_target"] / pa if pa and target_counts.get("AB_target") else 1.0 - bb - hbp_rate
+
+    if pa and target_counts.get("H_target") is not None:
+        h = target_counts["H_target"] / pa
+    elif target_ratios.get("OBP"):
+        h = target_ratios["OBP"] - bb - hbp_rate
+    elif target_ratios.get("BA"):
+        h = target_ratios["BA"] * ab_share
+    else:
+        raise ValueError("target line needs hits (H_target with PA_target, OBP or BA)")
+
+    hr = target_counts["HR_target"] / pa if pa and target_counts.get("HR_target") is not None else None
+    doubles = target_counts["_2B_target"] / pa if pa and target_counts.get("_2B_target") is not None else None
+    if hr is not None and doubles is not None:
+        xb = doubles + 3.0 * hr
+    elif target_ratios.get("SLG"):
+        xb = target_ratios["SLG"] * ab_share - h # TB - H = 2B + 2*3B + 3*HR, 3B folded into 2B
+    else:
+        xb = None
+    if hr is None and xb is None:
+        raise ValueError("target line needs HR_target or SLG")
+    return {"BB": bb, "K": k, "HBP": hbp_rate, "H": h, "HR": hr, "2B": doubles, "XB": xb}
+
+
+def _hr_rate(POW, HIT, EYE, params):
+    """Per-PA HR rate of the probability model (step 2 of get_pa_event_probabilities)."""
+    eye_modifier = 1.0 + scale_attribute_to_effectiveness(EYE, params.HR_EYE_MODIFIER_MIDPOINT, params.HR_EYE_MODIFIER_SCALE) * params.HR_EYE_MODIFIER_MAX_IMPACT
+    hit_modifier = 1.0 + scale_attribute_to_effectiveness(HIT, params.HR_HIT_MODIFIER_MIDPOINT, params.HR_HIT_MODIFIER_SCALE) * params.HR_HIT_MODIFIER_MAX_IMPACT
+    return max(0.0, min(params.curve("HR_S_CURVE_POW_ANCHORS")(POW) * eye_modifier * hit_modifier, params.ABSOLUTE_MAX_HR_RATE_CAP)), eye_modifier * hit_modifier
+
+
+def _double_share(POW, HIT, params):
+    """Share of non-HR hits that are doubles (step 6 of get_pa_event_probabilities)."""
+    combined_eff_xbh = (params.EXTRABASE_POW_WEIGHT * scale_attribute_to_effectiveness(POW, params.EXTRABASE_POW_EFFECT_MIDPOINT, params.EXTRABASE_POW_EFFECT_SCALE)
+                        + params.EXTRABASE_HIT_WEIGHT * scale_attribute_to_effectiveness(HIT, params.EXTRABASE_HIT_EFFECT_MIDPOINT, params.EXTRABASE_HIT_EFFECT_SCALE))
+    share = get_rate_from_effectiveness(params.AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT, params.MIN_2B_PER_HIT_BIP_NOT_HR,
+                                        params.MAX_2B_PER_HIT_BIP_NOT_HR, combined_eff_xbh)
+    return max(params.MIN_2B_PER_HIT_BIP_NOT_HR, min(params.MAX_2B_PER_HIT_BIP_NOT_HR, share))
+
+
+def _solve_pow_for_extra_bases(target_xb, h, HIT, EYE, params):
+    """
+    POW whose model HR rate and 2B share give 2B + 3 * HR == target_xb for a hit rate h.
+    The left side increases with POW (both HR and the 2B share do, and an HR adds more
+    extra bases than the double it displaces), so plain bisection over the curve's domain works.
+    """
+    hr_curve = params.curve("HR_S_CURVE_POW_ANCHORS")
+    low, high = hr_curve.xs[0], hr_curve.xs[-1]
+
+    def extra_bases(POW):
+        hr, _ = _hr_rate(POW, HIT, EYE, params)
+        return _double_share(POW, HIT, params) * max(h - hr, 0.0) + 3.0 * hr
+
+    if extra_bases(low) >= target_xb:
+        return low
+    if extra_bases(high) <= target_xb:
+        return high
+    for _ in range(60):
+        middle = 0.5 * (low + high)
+        if extra_bases(middle) < target_xb:
+            low = middle
+        else:
+            high = middle
+    return 0.5 * (low + high)
+
+
+def invert_target_line(target_ratios, target_counts, hbp_rate, params=None, return_details=False,
+                       max_iterations=INVERSE_MODEL_MAX_ITERATIONS, tolerance=INVERSE_MODEL_TOLERANCE):
+    """
+    Solves POW/HIT/EYE for a target line by inverting the model's piecewise-linear S-curves
+    instead of searching:
+      EYE from the BB rate (BB depends on EYE only),
+      HIT from BABIP = (H - HR) / (PA - K - BB - HBP - HR) (BABIP depends on HIT only),
+      POW from the HR rate divided by the EYE/HIT HR modifiers, or, when the line has no HR count,
+      from the extra-base total 2B + 3 * HR.
+    BABIP depends on the HR rate and the HR modifiers on HIT, so HIT and POW are refined by
+    fixed-point iteration (one pass suffices when the HR count is given). The K rate, which the
+    model ties to EYE and HIT, is not matched separately; compare it in the details.
+
+    Returns {"POW", "HIT", "EYE"}. With return_details=True, also returns a dict with the
+    iteration count, convergence flag, the target rates and the model's rates at the solution.
+    params: ParameterSet to invert (default: the active set).
+    """
+    if params is None:
+        params = get_active_parameter_set()
+    p_hbp = clamp_hbp_rate(hbp_rate, params.LEAGUE_AVG_HBP_RATE)
+    rates = target_line_rates(target_ratios, target_counts, p_hbp)
+
+    bb = max(params.MIN_BB_RATE_CAP, min(params.MAX_BB_RATE_CAP, rates["BB"]))
+    EYE = params.curve("BB_S_CURVE_EYE_ANCHORS").invert(bb)
+    # Starting point of the HIT/POW iteration: the midpoint of the model's tanh terms
+    HIT, POW = params.HR_HIT_MODIFIER_MIDPOINT, params.EXTRABASE_POW_EFFECT_MIDPOINT
+
+    converged = False
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        hr = rates["HR"] if rates["HR"] is not None else _hr_rate(POW, HIT, EYE, params)[0]
+        balls_in_play = 1.0 - rates["K"] - bb - p_hbp - hr
+        if balls_in_play <= 0:
+            raise ValueError("target line leaves no balls in play (K + BB + HBP + HR >= 1)")
+        babip = max(params.MIN_BABIP_RATE_CAP, min(params.MAX_BABIP_RATE_CAP, (rates["H"] - hr) / balls_in_play))
+        new_hit = params.curve("BABIP_S_CURVE_HIT_ANCHORS").invert(babip)
+
+        if rates["HR"] is not None:
+            _, hr_modifier = _hr_rate(POW, new_hit, EYE, params)
+            new_pow = params.curve("HR_S_CURVE_POW_ANCHORS").invert(rates["HR"] / hr_modifier)
+        else:
+            new_pow = _solve_pow_for_extra_bases(rates["XB"], rates["H"], new_hit, EYE, params)
+
+        change = max(abs(new_hit - HIT), abs(new_pow - POW))
+        HIT, POW = new_hit, new_pow
+        if change <= tolerance:
+            converged = True
+            break
+
+    attributes = {"POW": POW, "HIT": HIT, "EYE": EYE}
+    if not return_details:
+        return attributes
+    details = {
+        "iterations": iterations,
+        "converged": converged,
+        "target_rates": {key: value for key, value in rates.items() if value is not None},
+        "model_rates": get_pa_event_probabilities(POW, HIT, EYE, p_hbp, params),
+    }
+    return attributes, details
@@ -0,0 +1,139 @@
+# parameter_set.py
+import hashlib
+import json
+import os
+
+from . import game_constants
+from .s_curve import SCurve
+
+# Every constant the probability model reads; a ParameterSet holds one value for each
+MODEL_PARAMETER_NAMES = [
+    "SOFT_CAP_ATTRIBUTE_VALUE",
+    "HR_S_CURVE_POW_ANCHORS", "ABSOLUTE_MAX_HR_RATE_CAP",
+    "HR_EYE_MODIFIER_MIDPOINT", "HR_EYE_MODIFIER_SCALE", "HR_EYE_MODIFIER_MAX_IMPACT",
+    "HR_HIT_MODIFIER_MIDPOINT", "HR_HIT_MODIFIER_SCALE", "HR_HIT_MODIFIER_MAX_IMPACT",
+    "BABIP_S_CURVE_HIT_ANCHORS", "MIN_BABIP_RATE_CAP", "MAX_BABIP_RATE_CAP",
+    "BB_S_CURVE_EYE_ANCHORS", "MIN_BB_RATE_CAP", "MAX_BB_RATE_CAP",
+    "K_EYE_EFFECTIVENESS_S_CURVE_ANCHORS",
+    "K_RATE_HIT_WEIGHT", "K_RATE_EYE_WEIGHT",
+    "K_HIT_EFFECT_MIDPOINT", "K_HIT_EFFECT_SCALE",
+    "AVG_K_RATE_AT_MIDPOINT", "MIN_K_RATE_CAP", "MAX_K_RATE_CAP",
+    "AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT", "MIN_2B_PER_HIT_BIP_NOT_HR", "MAX_2B_PER_HIT_BIP_NOT_HR",
+    "EXTRABASE_POW_EFFECT_MIDPOINT", "EXTRABASE_POW_EFFECT_SCALE",
+    "EXTRABASE_HIT_EFFECT_MIDPOINT", "EXTRABASE_HIT_EFFECT_SCALE",
+    "EXTRABASE_POW_WEIGHT", "EXTRABASE_HIT_WEIGHT",
+    "LEAGUE_AVG_HBP_RATE",
+]
+
+# When set, this file is loaded as the active parameter set at import (API, CLI and pool workers alike)
+MODEL_PARAMETERS_PATH_ENV = "MODEL_PARAMETERS_PATH"
+
+
+def _canonical_value(name, value):
+    if name.endswith("_ANCHORS"):
+        anchors = [(float(x), float(y)) for x, y in value]
+        if any(x2 < x1 for (x1, _), (x2, _) in zip(anchors, anchors[1:])):
+            raise ValueError(f"{name} anchors must be sorted by x")
+        return tuple(anchors)
+    return float(value)
+
+
+class ParameterSet:
+    """
+    Immutable set of probability-model parameters with a content hash.
+
+    The hash covers the parameter values only (not the name), so two files with the same
+    numbers share caches and precomputed tables. Parameters are read as attributes,
+    e.g. params.MAX_K_RATE_CAP, and every S-curve is compiled once per set (see curve()).
+    """
+
+    def __init__(self, values, name=game_constants.PROBABILITY_MODEL_VERSION):
+        missing = [key for key in MODEL_PARAMETER_NAMES if key not in values]
+        unknown = [key for key in values if key not in MODEL_PARAMETER_NAMES]
+        if missing or unknown:
+            raise ValueError(f"Invalid parameter set: missing {missing}, unknown {unknown}")
+        object.__setattr__(self, "_values", {key: _canonical_value(key, values[key]) for key in MODEL_PARAMETER_NAMES})
+        for key, value in self._values.items(): # plain instance attributes keep the model's hot path fast
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, "name", name)
+        canonical_json = json.dumps(self._serializable_parameters(), sort_keys=True, separators=(",", ":"))
+        object.__setattr__(self, "content_hash", hashlib.sha256(canonical_json.encode("utf-8")).hexdigest())
+        object.__setattr__(self, "_curves", {
+            key: SCurve(value, input_cap=self.SOFT_CAP_ATTRIBUTE_VALUE * 1.1)
+            for key, value in self._values.items() if key.endswith("_ANCHORS")
+        })
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ParameterSet is immutable")
+
+    @property
+    def short_hash(self):
+        return self.content_hash[:12]
+
+    @property
+    def version(self):
+        """Human-readable name plus hash, used as the cache-key version."""
+        return f"{self.name}@{self.short_hash}"
+
+    def curve(self, anchors_name):
+        """The compiled SCurve for one *_ANCHORS parameter, capped at SOFT_CAP_ATTRIBUTE_VALUE * 1.1."""
+        return self._curves[anchors_name]
+
+    # --- Construction / serialization ---
+    @classmethod
+    def from_game_constants(cls):
+        """The built-in parameters from game_constants.py."""
+        return cls({key: getattr(game_constants, key) for key in MODEL_PARAMETER_NAMES})
+
+    @classmethod
+    def from_dict(cls, data, base=None):
+        """
+        Builds a set from {"name": ..., "parameters": {...}}. Parameters not listed are taken
+        from base (default: the game_constants set), so a file only needs the values it retunes.
+        """
+        base = base if base is not None else cls.from_game_constants()
+        values = dict(base._values)
+        values.update(data.get("parameters", {}))
+        return cls(values, name=data.get("name", base.name))
+
+    @classmethod
+    def load(cls, path, base=None):
+        """Loads a JSON parameter file (see from_dict)."""
+        with open(path, encoding="utf-8") as parameter_file:
+            return cls.from_dict(json.load(parameter_file), base=base)
+
+    def _serializable_parameters(self):
+        return {
+            key: [list(anchor) for anchor in value] if key.endswith("_ANCHORS") else value
+            for key, value in self._values.items()
+        }
+
+    def to_dict(self):
+        return {"name": self.name, "content_hash": self.content_hash, "parameters": self._serializable_parameters()}
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as parameter_file:
+            json.dump(self.to_dict(), parameter_file, indent=2)
+
+
+def _initial_parameter_set():
+    path = os.environ.get(MODEL_PARAMETERS_PATH_ENV)
+    return ParameterSet.load(path) if path else ParameterSet.from_game_constants()
+
+
+_active_parameter_set = _initial_parameter_set()
+
+
+def get_active_parameter_set():
+    """The parameter set used when a model function is called without params."""
+    return _active_parameter_set
+
+
+def set_active_parameter_set(parameter_set):
+    """
+    Replaces the active parameter set and returns the previous one. The swap is a single
+    reference assignment, so concurrent readers see either the old or the new set, never a mix.
+    """
+    global _active_parameter_set
+    previous, _active_parameter_set = _active_parameter_set, parameter_set
+    return previous
@@ -0,0 +1,113 @@
+# probability_cache.py
+import functools
+import threading
+from collections import OrderedDict
+
+from .game_constants import (
+    PROBABILITY_CACHE_MAX_ENTRIES,
+    PROBABILITY_CACHE_ATTRIBUTE_QUANTUM,
+    PROBABILITY_CACHE_HBP_QUANTUM,
+)
+from .event_sampler import AliasEventSampler
+from .parameter_set import get_active_parameter_set
+from .probability_model import get_pa_event_probabilities
+
+
+class ProbabilityCache:
+    """
+    Size-bounded LRU cache in front of a get_pa_event_probabilities-style function.
+
+    Keys are (model_version, quantized POW, HIT, EYE, quantized HBP rate). On a miss the
+    function is evaluated at the quantized point, so a key always maps to the same
+    probabilities no matter which nearby input filled it. lookup_sampler() also keeps an
+    AliasEventSampler with the entry, so repeated single draws skip the O(k) table build. Counters for hits, misses and
+    evictions are kept for monitoring. Safe to share between threads.
+
+    By default the cache evaluates the model with `params` (default: the active parameter set
+    at construction) and uses its version, which embeds the content hash. lookup() lets one
+    cache serve several parameter sets side by side, e.g. across an API hot swap.
+    """
+
+    def __init__(self, prob_func=None, max_entries=PROBABILITY_CACHE_MAX_ENTRIES, model_version=None, params=None,
+                 attribute_quantum=PROBABILITY_CACHE_ATTRIBUTE_QUANTUM, hbp_quantum=PROBABILITY_CACHE_HBP_QUANTUM):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if params is None:
+            params = get_active_parameter_set()
+        if prob_func is None:
+            prob_func = functools.partial(get_pa_event_probabilities, params=params)
+        self.prob_func = prob_func
+        self.max_entries = max_entries
+        self.model_version = model_version if model_version is not None else params.version
+        self.attribute_quantum = attribute_quantum
+        self.hbp_quantum = hbp_quantum
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_pa_event_probabilities(self, POW, HIT, EYE, player_hbp_rate):
+        """Same signature and result as get_pa_event_probabilities (returns a fresh dict)."""
+        return self.lookup(self.model_version, self.prob_func, POW, HIT, EYE, player_hbp_rate)
+
+    def lookup(self, model_version, prob_func, POW, HIT, EYE, player_hbp_rate):
+        """Cached prob_func(POW, HIT, EYE, player_hbp_rate), keyed under model_version."""
+        return dict(self._entry(model_version, prob_func, POW, HIT, EYE, player_hbp_rate)[0])
+
+    def lookup_sampler(self, model_version, prob_func, POW, HIT, EYE, player_hbp_rate):
+        """lookup() plus the entry's AliasEventSampler (built on first use, then shared; it holds no RNG state)."""
+        entry = self._entry(model_version, prob_func, POW, HIT, EYE, player_hbp_rate)
+        if entry[1] is None:
+            entry[1] = AliasEventSampler(entry[0]) # a concurrent first use just builds it twice
+        return dict(entry[0]), entry[1]
+
+    def _entry(self, model_version, prob_func, POW, HIT, EYE, player_hbp_rate):
+        """The [probabilities, sampler or None] entry for the quantized key, evaluated on a miss."""
+        key = (
+            model_version,
+            round(POW / self.attribute_quantum),
+            round(HIT / self.attribute_quantum),
+            round(EYE / self.attribute_quantum),
+            round(player_hbp_rate / self.hbp_quantum) if player_hbp_rate is not None else None,
+        )
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Evaluate outside the lock; a concurrent miss on the same key just computes it twice
+        probabilities = prob_func(
+            key[1] * self.attribute_quantum, key[2] * self.attribute_quantum,
+            key[3] * self.attribute_quantum, key[4] * self.hbp_quantum if key[4] is not None else None,
+        )
+        entry = [probabilities, None]
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        """Drops every entry (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters and size, e.g. for a monitoring endpoint."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "model_version": self.model_version,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
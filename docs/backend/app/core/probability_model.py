@@ -1,25 +1,10 @@
 import math
-from .game_constants import (
-    ATTR_EFFECT_MIDPOINT, SOFT_CAP_ATTRIBUTE_VALUE,
 
-    HR_S_CURVE_POW_ANCHORS, ABSOLUTE_MAX_HR_RATE_CAP,
-    HR_EYE_MODIFIER_MIDPOINT, HR_EYE_MODIFIER_SCALE, HR_EYE_MODIFIER_MAX_IMPACT,
-    HR_HIT_MODIFIER_MIDPOINT, HR_HIT_MODIFIER_SCALE, HR_HIT_MODIFIER_MAX_IMPACT,
+import numpy as np
 
-    BABIP_S_CURVE_HIT_ANCHORS, MIN_BABIP_RATE_CAP, MAX_BABIP_RATE_CAP,
-    BB_S_CURVE_EYE_ANCHORS, MIN_BB_RATE_CAP, MAX_BB_RATE_CAP,
-
-    K_EYE_EFFECTIVENESS_S_CURVE_ANCHORS,
-    K_RATE_HIT_WEIGHT, K_RATE_EYE_WEIGHT,
-    K_HIT_EFFECT_MIDPOINT, K_HIT_EFFECT_SCALE,
-    AVG_K_RATE_AT_MIDPOINT, MIN_K_RATE_CAP, MAX_K_RATE_CAP,
-
-    AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT, MIN_2B_PER_HIT_BIP_NOT_HR, MAX_2B_PER_HIT_BIP_NOT_HR,
-    EXTRABASE_POW_EFFECT_MIDPOINT, EXTRABASE_POW_EFFECT_SCALE,
-    EXTRABASE_HIT_EFFECT_MIDPOINT, EXTRABASE_HIT_EFFECT_SCALE,
-    EXTRABASE_POW_WEIGHT, EXTRABASE_HIT_WEIGHT,
-    LEAGUE_AVG_HBP_RATE
-)
+from .game_constants import PA_EVENT_TYPES
+from .parameter_set import get_active_parameter_set
+from .s_curve import compile_s_curve
 
 # --- Helper Functions (scale_attribute_to_effectiveness, get_rate_from_effectiveness, interpolate_s_curve) ---
 # (這些輔助函數與上一版相同，此處省略以節省空間，實際使用時需保留)
@@ -52,64 +37,52 @@ def interpolate_s_curve(value, anchors):
     """
     Performs linear interpolation for an S-curve defined by anchor points.
     Anchors should be a list of (x, y) tuples, sorted by x.
+    The anchor list is compiled into an SCurve on first use (see s_curve.py).
     """
     if not anchors:
         return 0.0
-    
-    capped_value = min(value, SOFT_CAP_ATTRIBUTE_VALUE * 1.1) # Apply a cap before interpolation
-    # capped_value = max(capped_value, 0) # Ensure non-negative for safety
-
-    if capped_value <= anchors[0][0]:
-        return anchors[0][1]
-    if capped_value >= anchors[-1][0]:
-        # For values beyond the last anchor, extrapolate linearly from the last two points
-        # or simply return the last anchor's y-value if extrapolation is not desired.
-        # Here, we'll return the last y-value to represent a soft cap.
-        return anchors[-1][1]
-
-
-    for i in range(len(anchors) - 1):
-        x1, y1 = anchors[i]
-        x2, y2 = anchors[i+1]
-        if x1 <= capped_value < x2:
-            if (x2 - x1) == 0: 
-                return y1 
-            return y1 + (y2 - y1) * (capped_value - x1) / (x2 - x1)
-    
-    return anchors[-1][1] # Fallback, should be covered by boundary checks
+    return compile_s_curve(anchors)(value)
 
 # --- Rate Calculation Functions using S-Curves ---
 
-def calculate_hr_rate_from_pow_s_curve(POW):
+def calculate_hr_rate_from_pow_s_curve(POW, params=None):
     """Calculates the base HR rate (per PA) using an S-curve based on POW."""
-    return interpolate_s_curve(POW, HR_S_CURVE_POW_ANCHORS)
+    if params is None:
+        params = get_active_parameter_set()
+    return params.curve("HR_S_CURVE_POW_ANCHORS")(POW)
 
-def calculate_babip_from_hit_s_curve(HIT):
+def calculate_babip_from_hit_s_curve(HIT, params=None):
     """Calculates BABIP using an S-curve based on HIT."""
-    babip = interpolate_s_curve(HIT, BABIP_S_CURVE_HIT_ANCHORS)
-    return max(MIN_BABIP_RATE_CAP, min(MAX_BABIP_RATE_CAP, babip))
+    if params is None:
+        params = get_active_parameter_set()
+    babip = params.curve("BABIP_S_CURVE_HIT_ANCHORS")(HIT)
+    return max(params.MIN_BABIP_RATE_CAP, min(params.MAX_BABIP_RATE_CAP, babip))
 
-def calculate_bb_rate_from_eye_s_curve(EYE):
+def calculate_bb_rate_from_eye_s_curve(EYE, params=None):
     """Calculates BB rate (per PA) using an S-curve based on EYE."""
-    bb_rate = interpolate_s_curve(EYE, BB_S_CURVE_EYE_ANCHORS)
-    return max(MIN_BB_RATE_CAP, min(MAX_BB_RATE_CAP, bb_rate))
+    if params is None:
+        params = get_active_parameter_set()
+    bb_rate = params.curve("BB_S_CURVE_EYE_ANCHORS")(EYE)
+    return max(params.MIN_BB_RATE_CAP, min(params.MAX_BB_RATE_CAP, bb_rate))
 
-def calculate_k_rate_combined(EYE, HIT):
+def calculate_k_rate_combined(EYE, HIT, params=None):
     """
     Calculates K rate based on EYE (S-curve effectiveness) and HIT (tanh effectiveness).
     """
+    if params is None:
+        params = get_active_parameter_set()
     # EYE's contribution to K effectiveness (S-curve, -1 to +1, negative is better for K%)
-    eye_k_effectiveness = interpolate_s_curve(EYE, K_EYE_EFFECTIVENESS_S_CURVE_ANCHORS)
+    eye_k_effectiveness = params.curve("K_EYE_EFFECTIVENESS_S_CURVE_ANCHORS")(EYE)
     
     # HIT's contribution to K effectiveness (tanh, -1 to +1, negative is better for K%)
     # For K_Rate, higher HIT is good (reduces K), so effect_is_positive=False for scale_attribute
-    hit_k_effectiveness = scale_attribute_to_effectiveness(HIT, K_HIT_EFFECT_MIDPOINT, K_HIT_EFFECT_SCALE, effect_is_positive=False)
+    hit_k_effectiveness = scale_attribute_to_effectiveness(HIT, params.K_HIT_EFFECT_MIDPOINT, params.K_HIT_EFFECT_SCALE, effect_is_positive=False)
     
     # Weighted combined effectiveness.
     # Positive effectiveness here means K-rate goes towards MAX_K_RATE (bad).
     # Negative effectiveness means K-rate goes towards MIN_K_RATE (good).
-    combined_k_effectiveness = (K_RATE_EYE_WEIGHT * eye_k_effectiveness +
-                                K_RATE_HIT_WEIGHT * hit_k_effectiveness)
+    combined_k_effectiveness = (params.K_RATE_EYE_WEIGHT * eye_k_effectiveness +
+                                params.K_RATE_HIT_WEIGHT * hit_k_effectiveness)
 
     # Ensure combined_k_effectiveness is within [-1, 1] if weights could make it exceed.
     # (Not strictly necessary if weights sum to 1 and individual factors are in [-1,1])
@@ -119,33 +92,44 @@ def calculate_k_rate_combined(EYE, HIT):
     # Note: AVG_K_RATE_AT_MIDPOINT is the K-rate when combined_k_effectiveness is 0.
     # MIN_K_RATE_CAP is when combined_k_effectiveness is -1 (best case for K).
     # MAX_K_RATE_CAP is when combined_k_effectiveness is +1 (worst case for K).
-    k_rate = get_rate_from_effectiveness(AVG_K_RATE_AT_MIDPOINT, MIN_K_RATE_CAP, MAX_K_RATE_CAP, combined_k_effectiveness)
-    return max(MIN_K_RATE_CAP, min(MAX_K_RATE_CAP, k_rate))
+    k_rate = get_rate_from_effectiveness(params.AVG_K_RATE_AT_MIDPOINT, params.MIN_K_RATE_CAP, params.MAX_K_RATE_CAP, combined_k_effectiveness)
+    return max(params.MIN_K_RATE_CAP, min(params.MAX_K_RATE_CAP, k_rate))
 
 
 # --- Main Probability Calculation ---
-def get_pa_event_probabilities(POW, HIT, EYE, player_hbp_rate):
+MAX_HBP_RATE = 0.05
+
+
+def clamp_hbp_rate(player_hbp_rate, league_avg_hbp_rate):
+    """HBP rate the model uses: the player's rate (league average when None), clamped to [0, MAX_HBP_RATE]."""
+    return max(0.0, min(MAX_HBP_RATE, player_hbp_rate if player_hbp_rate is not None else league_avg_hbp_rate))
+
+
+def get_pa_event_probabilities(POW, HIT, EYE, player_hbp_rate, params=None):
     """
     Calculates the probabilities of different plate appearance outcomes
     using S-curves for primary rates and modifiers for HR.
+    params: ParameterSet to evaluate with (default: the active set, see parameter_set.py).
     """
+    if params is None:
+        params = get_active_parameter_set()
     # 1. Calculate K%, BB%, HBP%
-    p_k = calculate_k_rate_combined(EYE, HIT)
-    p_bb = calculate_bb_rate_from_eye_s_curve(EYE)
-    p_hbp = max(0.0, min(0.05, player_hbp_rate if player_hbp_rate is not None else LEAGUE_AVG_HBP_RATE))
+    p_k = calculate_k_rate_combined(EYE, HIT, params)
+    p_bb = calculate_bb_rate_from_eye_s_curve(EYE, params)
+    p_hbp = clamp_hbp_rate(player_hbp_rate, params.LEAGUE_AVG_HBP_RATE)
 
     # 2. Calculate base P(HR) from POW S-curve
-    base_p_hr_pa = calculate_hr_rate_from_pow_s_curve(POW)
+    base_p_hr_pa = calculate_hr_rate_from_pow_s_curve(POW, params)
 
     # Apply EYE and HIT modifiers to base HR rate
-    eye_eff_hr_mod = scale_attribute_to_effectiveness(EYE, HR_EYE_MODIFIER_MIDPOINT, HR_EYE_MODIFIER_SCALE, True)
-    eye_modifier = 1.0 + (eye_eff_hr_mod * HR_EYE_MODIFIER_MAX_IMPACT)
+    eye_eff_hr_mod = scale_attribute_to_effectiveness(EYE, params.HR_EYE_MODIFIER_MIDPOINT, params.HR_EYE_MODIFIER_SCALE, True)
+    eye_modifier = 1.0 + (eye_eff_hr_mod * params.HR_EYE_MODIFIER_MAX_IMPACT)
 
-    hit_eff_hr_mod = scale_attribute_to_effectiveness(HIT, HR_HIT_MODIFIER_MIDPOINT, HR_HIT_MODIFIER_SCALE, True)
-    hit_modifier = 1.0 + (hit_eff_hr_mod * HR_HIT_MODIFIER_MAX_IMPACT)
+    hit_eff_hr_mod = scale_attribute_to_effectiveness(HIT, params.HR_HIT_MODIFIER_MIDPOINT, params.HR_HIT_MODIFIER_SCALE, True)
+    hit_modifier = 1.0 + (hit_eff_hr_mod * params.HR_HIT_MODIFIER_MAX_IMPACT)
 
     p_hr = base_p_hr_pa * eye_modifier * hit_modifier
-    p_hr = max(0.0, min(p_hr, ABSOLUTE_MAX_HR_RATE_CAP))
+    p_hr = max(0.0, min(p_hr, params.ABSOLUTE_MAX_HR_RATE_CAP))
 
     # 3. Calculate remaining probability for other BIP outcomes
     prob_sum_non_bip_plus_hr = p_k + p_bb + p_hbp + p_hr
@@ -163,7 +147,7 @@ def get_pa_event_probabilities(POW, HIT, EYE, player_hbp_rate):
         p_bip_for_other_outcomes = 1.0 - prob_sum_non_bip_plus_hr
 
         # 4. Calculate BABIP for these remaining BIP events using HIT S-curve
-        p_hit_given_bip_remaining = calculate_babip_from_hit_s_curve(HIT)
+        p_hit_given_bip_remaining = calculate_babip_from_hit_s_curve(HIT, params)
 
         # 5. Calculate P(Total Hits on these BIPs) and P(IPO on these BIPs)
         p_total_hits_on_remaining_bip = p_bip_for_other_outcomes * p_hit_given_bip_remaining
@@ -172,17 +156,17 @@ def get_pa_event_probabilities(POW, HIT, EYE, player_hbp_rate):
 
         # 6. Distribute p_total_hits_on_remaining_bip into P(1B) and P(2B)
         if p_total_hits_on_remaining_bip > 0:
-            pow_eff_xbh = scale_attribute_to_effectiveness(POW, EXTRABASE_POW_EFFECT_MIDPOINT, EXTRABASE_POW_EFFECT_SCALE, True)
-            hit_eff_xbh = scale_attribute_to_effectiveness(HIT, EXTRABASE_HIT_EFFECT_MIDPOINT, EXTRABASE_HIT_EFFECT_SCALE, True)
-            combined_eff_xbh = EXTRABASE_POW_WEIGHT * pow_eff_xbh + EXTRABASE_HIT_WEIGHT * hit_eff_xbh
+            pow_eff_xbh = scale_attribute_to_effectiveness(POW, params.EXTRABASE_POW_EFFECT_MIDPOINT, params.EXTRABASE_POW_EFFECT_SCALE, True)
+            hit_eff_xbh = scale_attribute_to_effectiveness(HIT, params.EXTRABASE_HIT_EFFECT_MIDPOINT, params.EXTRABASE_HIT_EFFECT_SCALE, True)
+            combined_eff_xbh = params.EXTRABASE_POW_WEIGHT * pow_eff_xbh + params.EXTRABASE_HIT_WEIGHT * hit_eff_xbh
             
             p_2b_given_hit_bip_not_hr = get_rate_from_effectiveness(
-                AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT, 
-                MIN_2B_PER_HIT_BIP_NOT_HR, 
-                MAX_2B_PER_HIT_BIP_NOT_HR, 
+                params.AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT, 
+                params.MIN_2B_PER_HIT_BIP_NOT_HR, 
+                params.MAX_2B_PER_HIT_BIP_NOT_HR, 
                 combined_eff_xbh
             )
-            p_2b_given_hit_bip_not_hr = max(MIN_2B_PER_HIT_BIP_NOT_HR, min(MAX_2B_PER_HIT_BIP_NOT_HR, p_2b_given_hit_bip_not_hr))
+            p_2b_given_hit_bip_not_hr = max(params.MIN_2B_PER_HIT_BIP_NOT_HR, min(params.MAX_2B_PER_HIT_BIP_NOT_HR, p_2b_given_hit_bip_not_hr))
             
             p_2b = p_total_hits_on_remaining_bip * p_2b_given_hit_bip_not_hr
             p_1b = p_total_hits_on_remaining_bip * (1.0 - p_2b_given_hit_bip_not_hr)
@@ -207,3 +191,86 @@ def get_pa_event_probabilities(POW, HIT, EYE, player_hbp_rate):
     normalized_events = {key: value * norm_factor for key, value in temp_events.items()}
     
     return normalized_events
+
+
+# --- Vectorized Probability Calculation ---
+def _scale_attribute_to_effectiveness_array(values, midpoint, scale, effect_is_positive=True):
+    if scale == 0:
+        return np.zeros_like(values)
+    tanh_val = np.tanh((values - midpoint) / scale)
+    return tanh_val if effect_is_positive else -tanh_val
+
+
+def _get_rate_from_effectiveness_array(base_rate_at_midpoint, min_rate, max_rate, effectiveness_factor):
+    return np.where(
+        effectiveness_factor >= 0,
+        base_rate_at_midpoint + effectiveness_factor * (max_rate - base_rate_at_midpoint),
+        base_rate_at_midpoint + effectiveness_factor * (base_rate_at_midpoint - min_rate),
+    )
+
+
+def get_pa_event_probabilities_array(POW, HIT, EYE, player_hbp_rate, params=None):
+    """
+    Vectorized get_pa_event_probabilities.
+    POW, HIT, EYE and player_hbp_rate may be scalars or arrays (broadcast together; a None HBP rate
+    means LEAGUE_AVG_HBP_RATE). Returns a float64 array of shape (..., 7) whose last axis follows
+    PA_EVENT_TYPES, e.g. (N, 7) for length-N inputs. Capping and renormalization match the scalar model.
+    params: ParameterSet to evaluate with (default: the active set).
+    """
+    if params is None:
+        params = get_active_parameter_set()
+    if player_hbp_rate is None:
+        player_hbp_rate = params.LEAGUE_AVG_HBP_RATE
+    POW, HIT, EYE, hbp_rate = np.broadcast_arrays(*(np.asarray(values, dtype=np.float64)
+                                                     for values in (POW, HIT, EYE, player_hbp_rate)))
+
+    # 1. K%, BB%, HBP%
+    eye_k_effectiveness = params.curve("K_EYE_EFFECTIVENESS_S_CURVE_ANCHORS").evaluate_array(EYE)
+    hit_k_effectiveness = _scale_attribute_to_effectiveness_array(HIT, params.K_HIT_EFFECT_MIDPOINT, params.K_HIT_EFFECT_SCALE, effect_is_positive=False)
+    combined_k_effectiveness = params.K_RATE_EYE_WEIGHT * eye_k_effectiveness + params.K_RATE_HIT_WEIGHT * hit_k_effectiveness
+    p_k = np.clip(_get_rate_from_effectiveness_array(params.AVG_K_RATE_AT_MIDPOINT, params.MIN_K_RATE_CAP, params.MAX_K_RATE_CAP, combined_k_effectiveness),
+                  params.MIN_K_RATE_CAP, params.MAX_K_RATE_CAP)
+    p_bb = np.clip(params.curve("BB_S_CURVE_EYE_ANCHORS").evaluate_array(EYE), params.MIN_BB_RATE_CAP, params.MAX_BB_RATE_CAP)
+    p_hbp = np.clip(hbp_rate, 0.0, MAX_HBP_RATE)
+
+    # 2. HR% from the POW S-curve with EYE and HIT modifiers
+    base_p_hr_pa = params.curve("HR_S_CURVE_POW_ANCHORS").evaluate_array(POW)
+    eye_modifier = 1.0 + _scale_attribute_to_effectiveness_array(EYE, params.HR_EYE_MODIFIER_MIDPOINT, params.HR_EYE_MODIFIER_SCALE) * params.HR_EYE_MODIFIER_MAX_IMPACT
+    hit_modifier = 1.0 + _scale_attribute_to_effectiveness_array(HIT, params.HR_HIT_MODIFIER_MIDPOINT, params.HR_HIT_MODIFIER_SCALE) * params.HR_HIT_MODIFIER_MAX_IMPACT
+    p_hr = np.clip(base_p_hr_pa * eye_modifier * hit_modifier, 0.0, params.ABSOLUTE_MAX_HR_RATE_CAP)
+
+    # 3. Over-full rows: scale K/BB/HBP down, HR takes the remainder, no balls in play
+    prob_sum_non_bip_plus_hr = p_k + p_bb + p_hbp + p_hr
+    overflow = prob_sum_non_bip_plus_hr >= 1.0
+    if np.any(overflow):
+        scale_down = np.where(overflow, 1.0 / np.where(overflow, prob_sum_non_bip_plus_hr, 1.0), 1.0)
+        p_k, p_bb, p_hbp = p_k * scale_down, p_bb * scale_down, p_hbp * scale_down
+        p_hr = np.where(overflow, np.maximum(0.0, 1.0 - (p_k + p_bb + p_hbp)), p_hr)
+    p_bip_for_other_outcomes = np.where(overflow, 0.0, 1.0 - prob_sum_non_bip_plus_hr)
+
+    # 4-5. BABIP splits the remaining balls in play into hits and IPO
+    p_hit_given_bip_remaining = np.clip(params.curve("BABIP_S_CURVE_HIT_ANCHORS").evaluate_array(HIT), params.MIN_BABIP_RATE_CAP, params.MAX_BABIP_RATE_CAP)
+    p_total_hits_on_remaining_bip = p_bip_for_other_outcomes * p_hit_given_bip_remaining
+    p_ipo = np.maximum(0.0, p_bip_for_other_outcomes * (1.0 - p_hit_given_bip_remaining))
+
+    # 6. Hits split into 1B and 2B
+    pow_eff_xbh = _scale_attribute_to_effectiveness_array(POW, params.EXTRABASE_POW_EFFECT_MIDPOINT, params.EXTRABASE_POW_EFFECT_SCALE)
+    hit_eff_xbh = _scale_attribute_to_effectiveness_array(HIT, params.EXTRABASE_HIT_EFFECT_MIDPOINT, params.EXTRABASE_HIT_EFFECT_SCALE)
+    combined_eff_xbh = params.EXTRABASE_POW_WEIGHT * pow_eff_xbh + params.EXTRABASE_HIT_WEIGHT * hit_eff_xbh
+    p_2b_given_hit_bip_not_hr = np.clip(
+        _get_rate_from_effectiveness_array(params.AVG_2B_PER_HIT_BIP_NOT_HR_AT_MIDPOINT, params.MIN_2B_PER_HIT_BIP_NOT_HR, params.MAX_2B_PER_HIT_BIP_NOT_HR, combined_eff_xbh),
+        params.MIN_2B_PER_HIT_BIP_NOT_HR, params.MAX_2B_PER_HIT_BIP_NOT_HR
+    )
+    p_2b = np.maximum(0.0, p_total_hits_on_remaining_bip * p_2b_given_hit_bip_not_hr)
+    p_1b = np.maximum(0.0, p_total_hits_on_remaining_bip * (1.0 - p_2b_given_hit_bip_not_hr))
+
+    # Stack in PA_EVENT_TYPES order, clamp negatives and renormalize
+    events = {"HR": p_hr, "2B": p_2b, "1B": p_1b, "BB": p_bb, "HBP": p_hbp, "K": p_k, "IPO": p_ipo}
+    prob_matrix = np.maximum(0.0, np.stack([events[event_type] for event_type in PA_EVENT_TYPES], axis=-1))
+    totals = prob_matrix.sum(axis=-1, keepdims=True)
+    empty_rows = totals[..., 0] == 0
+    if np.any(empty_rows):
+        prob_matrix[empty_rows] = 0.0
+        prob_matrix[empty_rows, PA_EVENT_TYPES.index("IPO")] = 1.0
+        totals[empty_rows] = 1.0
+    return prob_matrix / totals
@@ -0,0 +1,229 @@
+# probability_table.py
+import json
+import math
+import os
+
+import numpy as np
+
+from .game_constants import (
+    PA_EVENT_TYPES,
+    PROBABILITY_TABLE_MAX_ATTRIBUTE,
+    PROBABILITY_TABLE_STEP,
+)
+from .parameter_set import ParameterSet, get_active_parameter_set
+from .probability_model import clamp_hbp_rate, get_pa_event_probabilities_array
+
+# Generated by `python -m backend.app.core.probability_table`; not checked in
+PROBABILITY_TABLE_DIR = os.environ.get(
+    "PROBABILITY_TABLE_DIR",
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")),
+)
+
+_HBP_INDEX = PA_EVENT_TYPES.index("HBP")
+# Ball-in-play outcomes that absorb the HBP share (see get_pa_event_probabilities, step 3)
+_BIP_INDICES = [PA_EVENT_TYPES.index(event_type) for event_type in ("2B", "1B", "IPO")]
+
+
+def _grid_size(step, max_attribute=PROBABILITY_TABLE_MAX_ATTRIBUTE):
+    """Number of grid points per axis; the last point is the first multiple of step >= max_attribute."""
+    return int(math.ceil(max_attribute / step - 1e-9)) + 1
+
+
+def probability_table_path(params=None):
+    """Where the table for a parameter set lives; the file name carries the set's content hash."""
+    if params is None:
+        params = get_active_parameter_set()
+    return os.path.join(PROBABILITY_TABLE_DIR, f"pa_probability_table_{params.short_hash}.npy")
+
+
+def build_probability_table(step=PROBABILITY_TABLE_STEP, max_attribute=PROBABILITY_TABLE_MAX_ATTRIBUTE, params=None):
+    """
+    Tabulates get_pa_event_probabilities (via its vectorized twin) over the POW x HIT x EYE grid at HBP rate 0.
+    Returns a float32 array of shape (n, n, n, len(PA_EVENT_TYPES)), axes ordered (POW, HIT, EYE).
+    """
+    if params is None:
+        params = get_active_parameter_set()
+    grid = np.arange(_grid_size(step, max_attribute)) * step
+    table = np.empty((len(grid), len(grid), len(grid), len(PA_EVENT_TYPES)), dtype=np.float32)
+    hit_values, eye_values = np.meshgrid(grid, grid, indexing="ij")
+    for i, pow_value in enumerate(grid): # one POW slice at a time keeps the float64 temporaries small
+        table[i] = get_pa_event_probabilities_array(pow_value, hit_values, eye_values, 0.0, params)
+    return table
+
+
+def save_probability_table(table, step, path=None, params=None):
+    """Writes the table as .npy plus a small JSON sidecar (<path>.json) describing the grid and parameter set."""
+    if params is None:
+        params = get_active_parameter_set()
+    if path is None:
+        path = probability_table_path(params)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.save(path, table)
+    metadata = {
+        "step": step, "grid_size": table.shape[0], "events": PA_EVENT_TYPES, "hbp_rate": 0.0,
+        "params_name": params.name, "params_hash": params.content_hash,
+        "league_avg_hbp_rate": params.LEAGUE_AVG_HBP_RATE,
+    }
+    with open(path + ".json", "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file, indent=2)
+
+
+class ProbabilityTable:
+    """
+    Trilinear lookup into a precomputed POW x HIT x EYE probability grid.
+
+    The grid is stored at HBP rate 0. A non-zero HBP rate only shrinks the ball-in-play share
+    (K, BB and HR do not depend on it), so the 2B/1B/IPO entries are rescaled by (B0 - hbp) / B0
+    where B0 is their total at HBP 0. Attributes are clamped to [0, grid max]; the reference model
+    is flat beyond SOFT_CAP_ATTRIBUTE_VALUE * 1.1 for the S-curves, but not for the tanh terms,
+    so inputs outside the grid are an approximation.
+
+    At the default PROBABILITY_TABLE_STEP the lookup matches get_pa_event_probabilities to within
+    PROBABILITY_TABLE_TOLERANCE per event (absolute) for any HBP rate; the error comes from S-curve
+    anchors that fall between grid points, so a smaller step tightens it.
+    """
+
+    def __init__(self, table, step, params_hash=None, league_avg_hbp_rate=None):
+        table = np.asarray(table)
+        if table.ndim != 4 or table.shape[3] != len(PA_EVENT_TYPES) or len(set(table.shape[:3])) != 1:
+            raise ValueError(f"table must have shape (n, n, n, {len(PA_EVENT_TYPES)}), got {table.shape}")
+        self.table = table
+        self.step = float(step)
+        self.max_index = table.shape[0] - 1
+        self.max_attribute = self.max_index * self.step
+        self.params_hash = params_hash
+        self.league_avg_hbp_rate = (league_avg_hbp_rate if league_avg_hbp_rate is not None
+                                    else get_active_parameter_set().LEAGUE_AVG_HBP_RATE)
+
+    @classmethod
+    def load(cls, path, mmap=True, expected_hash=None):
+        """
+        Loads a table written by save_probability_table. With mmap=True the array is a read-only
+        memory map, so every process that loads the same file shares its pages.
+        expected_hash guards against a table built from a different parameter set.
+        """
+        with open(path + ".json", encoding="utf-8") as metadata_file:
+            metadata = json.load(metadata_file)
+        if metadata.get("events") != PA_EVENT_TYPES:
+            raise ValueError(f"{path} was built for events {metadata.get('events')}, expected {PA_EVENT_TYPES}")
+        if expected_hash is not None and metadata.get("params_hash") != expected_hash:
+            raise ValueError(f"{path} was built for parameter set {metadata.get('params_hash')}, expected {expected_hash}")
+        return cls(np.load(path, mmap_mode="r" if mmap else None), metadata["step"],
+                   params_hash=metadata.get("params_hash"), league_avg_hbp_rate=metadata.get("league_avg_hbp_rate"))
+
+    def _cell(self, value):
+        """Lower grid index and fractional offset of one attribute value."""
+        position = min(max(float(value), 0.0), self.max_attribute) / self.step
+        index = min(int(position), self.max_index - 1)
+        return index, position - index
+
+    def _interpolate(self, POW, HIT, EYE):
+        """Trilinear interpolation at one point; returns 7 floats (HBP rate 0, not renormalized)."""
+        i, fi = self._cell(POW)
+        j, fj = self._cell(HIT)
+        k, fk = self._cell(EYE)
+        gi, gj, gk = 1.0 - fi, 1.0 - fj, 1.0 - fk
+        # Corner order matches the C-order reshape of the (2, 2, 2, 7) block
+        weights = np.array([gi * gj * gk, gi * gj * fk, gi * fj * gk, gi * fj * fk,
+                            fi * gj * gk, fi * gj * fk, fi * fj * gk, fi * fj * fk])
+        block = self.table[i:i + 2, j:j + 2, k:k + 2].reshape(8, len(PA_EVENT_TYPES))
+        return (weights @ block).tolist()
+
+    def lookup_vector(self, POW, HIT, EYE, player_hbp_rate):
+        """Event probabilities as a float64 vector ordered like PA_EVENT_TYPES."""
+        return np.array(self._apply_hbp_scalar(self._interpolate(POW, HIT, EYE), player_hbp_rate))
+
+    def lookup_many(self, POW, HIT, EYE, player_hbp_rate):
+        """Vectorized lookup for arrays of attributes (broadcast together); returns shape (..., 7)."""
+        pow_values, hit_values, eye_values = np.broadcast_arrays(
+            np.asarray(POW, dtype=np.float64), np.asarray(HIT, dtype=np.float64), np.asarray(EYE, dtype=np.float64)
+        )
+        result_shape = pow_values.shape
+        positions = [np.clip(values.ravel(), 0.0, self.max_attribute) / self.step
+                     for values in (pow_values, hit_values, eye_values)]
+        indices = [np.minimum(position.astype(np.intp), self.max_index - 1) for position in positions]
+        fractions = [(position - index)[:, np.newaxis] for position, index in zip(positions, indices)]
+
+        prob_vectors = np.zeros((positions[0].shape[0], len(PA_EVENT_TYPES)), dtype=np.float64)
+        for di in (0, 1):
+            weight_i = fractions[0] if di else 1.0 - fractions[0]
+            for dj in (0, 1):
+                weight_j = fractions[1] if dj else 1.0 - fractions[1]
+                for dk in (0, 1):
+                    weight_k = fractions[2] if dk else 1.0 - fractions[2]
+                    corner = self.table[indices[0] + di, indices[1] + dj, indices[2] + dk]
+                    prob_vectors += weight_i * weight_j * weight_k * corner
+        return self._apply_hbp(prob_vectors, player_hbp_rate).reshape(result_shape + (len(PA_EVENT_TYPES),))
+
+    def get_pa_event_probabilities(self, POW, HIT, EYE, player_hbp_rate):
+        """Drop-in replacement for probability_model.get_pa_event_probabilities."""
+        prob_values = self._apply_hbp_scalar(self._interpolate(POW, HIT, EYE), player_hbp_rate)
+        return dict(zip(PA_EVENT_TYPES, prob_values))
+
+    def _clamp_hbp(self, player_hbp_rate):
+        return clamp_hbp_rate(player_hbp_rate, self.league_avg_hbp_rate)
+
+    def _apply_hbp_scalar(self, prob_values, player_hbp_rate):
+        """Plain-float version of _apply_hbp for one point (numpy overhead dominates at this size)."""
+        p_hbp = self._clamp_hbp(player_hbp_rate)
+        norm_factor = 1.0 / sum(prob_values) # undo float32 rounding
+        prob_values = [value * norm_factor for value in prob_values]
+        if p_hbp > 0:
+            bip_total = sum(prob_values[index] for index in _BIP_INDICES)
+            scale = max(bip_total - p_hbp, 0.0) / bip_total if bip_total > 0 else 0.0
+            for index in _BIP_INDICES:
+                prob_values[index] *= scale
+            prob_values[_HBP_INDEX] = p_hbp
+        return prob_values
+
+    def _apply_hbp(self, prob_vectors, player_hbp_rate):
+        p_hbp = self._clamp_hbp(player_hbp_rate)
+        prob_vectors = prob_vectors / prob_vectors.sum(axis=1, keepdims=True) # undo float32 rounding
+        if p_hbp > 0:
+            bip_total = prob_vectors[:, _BIP_INDICES].sum(axis=1, keepdims=True)
+            scale = np.zeros_like(bip_total)
+            np.divide(np.maximum(bip_total - p_hbp, 0.0), bip_total, out=scale, where=bip_total > 0)
+            prob_vectors[:, _BIP_INDICES] *= scale
+            prob_vectors[:, _HBP_INDEX] = p_hbp
+        return prob_vectors
+
+
+_loaded_tables = {}
+
+
+def get_probability_table(params=None):
+    """
+    The shared memory-mapped table for a parameter set (default: the active set), loaded on
+    first use and cached by content hash. Returns None when that set's table has not been
+    generated, so callers can fall back to probability_model.get_pa_event_probabilities.
+    """
+    if params is None:
+        params = get_active_parameter_set()
+    table = _loaded_tables.get(params.content_hash)
+    if table is None:
+        path = probability_table_path(params)
+        if not (os.path.exists(path) and os.path.exists(path + ".json")):
+            return None
+        table = _loaded_tables[params.content_hash] = ProbabilityTable.load(path, expected_hash=params.content_hash)
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build the POW x HIT x EYE event-probability lookup table")
+    parser.add_argument("--step", type=float, default=PROBABILITY_TABLE_STEP, help="grid spacing in attribute points")
+    parser.add_argument("--params", default=None, help="parameter-set JSON file (default: the active parameter set)")
+    parser.add_argument("--out", default=None, help="output .npy path (default: PROBABILITY_TABLE_DIR, named by parameter hash)")
+    args = parser.parse_args()
+
+    table_params = ParameterSet.load(args.params) if args.params else get_active_parameter_set()
+    out_path = args.out or probability_table_path(table_params)
+    start_time = time.time()
+    built_table = build_probability_table(args.step, params=table_params)
+    save_probability_table(built_table, args.step, out_path, params=table_params)
+    print(f"Wrote {out_path} ({table_params.version}): shape {built_table.shape}, "
+          f"{built_table.nbytes / 1e6:.1f} MB, {time.time() - start_time:.1f} s")
@@ -0,0 +1,33 @@
+# rng.py
+import numpy as np
+
+
+def make_rng(seed=None):
+    """
+    Returns a NumPy Generator for every stochastic code path.
+    seed may be None (fresh OS entropy), an int, a SeedSequence, or an existing Generator
+    (returned unchanged so callers can pass either a seed or a generator).
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+
+def spawn_seed_sequences(seed, count):
+    """
+    Spawns `count` independent child SeedSequences.
+    Children are derived from the parent's entropy and spawn key, so the same seed always
+    yields the same children, and streams never overlap no matter how work is distributed.
+    A Generator contributes 128 bits of entropy drawn from itself, so everything it hands
+    out is determined by its bit_generator.state (which makes it checkpointable).
+    """
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(0, 2**32, size=4).tolist()).spawn(count)
+    if isinstance(seed, np.random.SeedSequence):
+        return seed.spawn(count)
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def spawn_rngs(seed, count):
+    """Spawns `count` independent child Generators (see spawn_seed_sequences)."""
+    return [np.random.default_rng(child) for child in spawn_seed_sequences(seed, count)]
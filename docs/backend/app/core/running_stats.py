@@ -0,0 +1,106 @@
+# running_stats.py
+from statistics import NormalDist
+
+import numpy as np
+
+from .season_batch import SEASON_STAT_KEYS
+
+
+class RunningStats:
+    """
+    Constant-memory accumulator of per-stat count, mean, variance, min and max.
+    Single seasons are folded in with Welford's update; whole SeasonBatches (or other
+    accumulators) are merged with Chan et al.'s parallel combination, so memory does not
+    grow with the number of simulated seasons.
+    """
+
+    def __init__(self, stat_keys=None):
+        self.stat_keys = list(stat_keys) if stat_keys is not None else list(SEASON_STAT_KEYS)
+        self._key_index = {key: i for i, key in enumerate(self.stat_keys)}
+        num_stats = len(self.stat_keys)
+        self.count = 0
+        self._mean = np.zeros(num_stats, dtype=np.float64)
+        self._m2 = np.zeros(num_stats, dtype=np.float64)
+        self._min = np.full(num_stats, np.inf)
+        self._max = np.full(num_stats, -np.inf)
+
+    # --- Updates ---
+    def update(self, season_stats):
+        """Adds one season, given as a calculate_sim_stats-style dict."""
+        values = np.array([season_stats[key] for key in self.stat_keys], dtype=np.float64)
+        self.count += 1
+        delta = values - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (values - self._mean)
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+
+    def update_batch(self, season_batch):
+        """Adds every season of a SeasonBatch without keeping the batch."""
+        if len(season_batch) == 0:
+            return
+        values = np.column_stack([season_batch.stat(key) for key in self.stat_keys]).astype(np.float64)
+        batch_mean = values.mean(axis=0)
+        batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+        self._combine(values.shape[0], batch_mean, batch_m2, values.min(axis=0), values.max(axis=0))
+
+    def merge(self, other):
+        """Folds another RunningStats (e.g. from a parallel worker) into this one."""
+        if other.stat_keys != self.stat_keys:
+            raise ValueError("Cannot merge RunningStats tracking different stats")
+        if other.count:
+            self._combine(other.count, other._mean, other._m2, other._min, other._max)
+
+    def _combine(self, other_count, other_mean, other_m2, other_min, other_max):
+        total = self.count + other_count
+        delta = other_mean - self._mean
+        self._mean = self._mean + delta * (other_count / total)
+        self._m2 = self._m2 + other_m2 + delta**2 * (self.count * other_count / total)
+        self._min = np.minimum(self._min, other_min)
+        self._max = np.maximum(self._max, other_max)
+        self.count = total
+
+    # --- Queries ---
+    def _per_key(self, values, stat_key):
+        if stat_key is None:
+            return {key: float(values[i]) for i, key in enumerate(self.stat_keys)}
+        return float(values[self._key_index[stat_key]])
+
+    def mean(self, stat_key=None):
+        return self._per_key(self._mean, stat_key)
+
+    def variance(self, stat_key=None, ddof=1):
+        if self.count <= ddof:
+            return self._per_key(np.zeros_like(self._m2), stat_key)
+        return self._per_key(self._m2 / (self.count - ddof), stat_key)
+
+    def std(self, stat_key=None, ddof=1):
+        if self.count <= ddof:
+            return self._per_key(np.zeros_like(self._m2), stat_key)
+        return self._per_key(np.sqrt(self._m2 / (self.count - ddof)), stat_key)
+
+    def min(self, stat_key=None):
+        return self._per_key(self._min, stat_key)
+
+    def max(self, stat_key=None):
+        return self._per_key(self._max, stat_key)
+
+    def std_error(self, stat_key=None):
+        """Standard error of the mean (sample std / sqrt(n))."""
+        if self.count < 2:
+            return self._per_key(np.full_like(self._m2, np.inf), stat_key)
+        return self._per_key(np.sqrt(self._m2 / (self.count - 1) / self.count), stat_key)
+
+    def half_width(self, stat_key=None, confidence=0.95):
+        """Half-width of the normal-approximation confidence interval for the mean."""
+        z_value = NormalDist().inv_cdf(0.5 + confidence / 2)
+        std_errors = self.std_error(stat_key)
+        if stat_key is None:
+            return {key: z_value * value for key, value in std_errors.items()}
+        return z_value * std_errors
+
+    def confidence_interval(self, stat_key, confidence=0.95):
+        """(low, high) confidence interval for the mean of one stat."""
+        center = self.mean(stat_key)
+        half = self.half_width(stat_key, confidence)
+        return center - half, center + half
@@ -0,0 +1,81 @@
+# s_curve.py
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .game_constants import SOFT_CAP_ATTRIBUTE_VALUE
+
+# Inputs are capped here before interpolation (same cap as interpolate_s_curve)
+S_CURVE_INPUT_CAP = SOFT_CAP_ATTRIBUTE_VALUE * 1.1
+
+
+class SCurve:
+    """
+    Piecewise-linear S-curve compiled once from an anchor list [(x, y), ...] sorted by x.
+    Segment slopes are cached and the segment is found by binary search, so evaluation is
+    O(log k) with no per-call slope arithmetic. Values are capped at input_cap, and the curve
+    is flat (first / last y) outside the anchor range, exactly like interpolate_s_curve.
+    """
+
+    def __init__(self, anchors, input_cap=S_CURVE_INPUT_CAP):
+        anchors = list(anchors)
+        if not anchors:
+            raise ValueError("SCurve needs at least one anchor")
+        self.xs = [float(x) for x, _ in anchors]
+        self.ys = [float(y) for _, y in anchors]
+        # Zero-width segments get slope 0 (interpolate_s_curve returns y1 for them)
+        self.slopes = [
+            (y2 - y1) / (x2 - x1) if x2 != x1 else 0.0
+            for x1, y1, x2, y2 in zip(self.xs, self.ys, self.xs[1:], self.ys[1:])
+        ]
+        self.input_cap = input_cap
+        self._xs_array = np.array(self.xs)
+        self._ys_array = np.array(self.ys)
+        self._slopes_array = np.array(self.slopes + [0.0]) # padded so the last index is valid
+
+    def __call__(self, value):
+        """Evaluates the curve at one value."""
+        capped_value = min(value, self.input_cap)
+        if capped_value <= self.xs[0]:
+            return self.ys[0]
+        if capped_value >= self.xs[-1]:
+            return self.ys[-1]
+        segment = bisect_right(self.xs, capped_value) - 1
+        return self.ys[segment] + self.slopes[segment] * (capped_value - self.xs[segment])
+
+    def evaluate_array(self, values):
+        """Evaluates the curve element-wise over an array; returns float64 of the same shape."""
+        capped_values = np.minimum(np.asarray(values, dtype=np.float64), self.input_cap)
+        segments = np.clip(np.searchsorted(self._xs_array, capped_values, side="right") - 1, 0, len(self.xs) - 1)
+        result = self._ys_array[segments] + self._slopes_array[segments] * (capped_values - self._xs_array[segments])
+        result = np.where(capped_values <= self.xs[0], self.ys[0], result)
+        return np.where(capped_values >= self.xs[-1], self.ys[-1], result)
+
+    def invert(self, target):
+        """
+        Smallest x in [xs[0], xs[-1]] with curve(x) == target, for a monotone (non-decreasing or
+        non-increasing) curve. Targets beyond the curve's range map to the end that comes closest.
+        """
+        increasing = self.ys[-1] >= self.ys[0]
+        ys = self.ys if increasing else [-y for y in self.ys]
+        if any(y2 < y1 for y1, y2 in zip(ys, ys[1:])):
+            raise ValueError("SCurve.invert needs a monotone curve")
+        target = float(target) if increasing else -float(target)
+        if target <= ys[0]:
+            return self.xs[0]
+        if target >= ys[-1]:
+            return self.xs[bisect_left(ys, ys[-1])]
+        segment = bisect_left(ys, target) - 1 # ys[segment] < target <= ys[segment + 1]
+        return self.xs[segment] + (target - ys[segment]) / (ys[segment + 1] - ys[segment]) * (self.xs[segment + 1] - self.xs[segment])
+
+
+_compiled_curves = {}
+
+
+def compile_s_curve(anchors):
+    """Returns the SCurve for an anchor list, compiling it on first use."""
+    key = tuple((x, y) for x, y in anchors)
+    curve = _compiled_curves.get(key)
+    if curve is None:
+        curve = _compiled_curves[key] = SCurve(key)
+    return curve
@@ -0,0 +1,147 @@
+# season_batch.py
+import numpy as np
+
+from .game_constants import PA_EVENT_TYPES
+
+_EVENT_INDEX = {event_type: i for i, event_type in enumerate(PA_EVENT_TYPES)}
+
+# Keys produced by calculate_sim_stats, in the same order
+SEASON_STAT_KEYS = [
+    "BA", "OBP", "SLG", "OPS", "K_rate", "BB_rate",
+    "HR_count", "BB_count", "K_count", "H_count", "AB_count", "PA_count",
+    "_1B_count", "_2B_count", "OUT_count",
+]
+
+
+def _safe_ratio(numerator, denominator):
+    """Element-wise numerator / denominator, 0 where the denominator is 0 (same rule as calculate_sim_stats)."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    result = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+class SeasonBatch:
+    """
+    Columnar container for many simulated seasons.
+    Stores one int32 column per PA_EVENT_TYPES event (28 bytes per season) and computes every
+    calculate_sim_stats stat as a vectorized array on demand.
+    """
+
+    def __init__(self, event_counts):
+        event_counts = np.asarray(event_counts, dtype=np.int32)
+        if event_counts.ndim == 1:
+            event_counts = event_counts.reshape(1, -1)
+        if event_counts.ndim != 2 or event_counts.shape[1] != len(PA_EVENT_TYPES):
+            raise ValueError(f"event_counts must have shape (num_seasons, {len(PA_EVENT_TYPES)}), got {event_counts.shape}")
+        self.event_counts = np.ascontiguousarray(event_counts)
+
+    @classmethod
+    def from_outcomes(cls, outcomes_list):
+        """Builds a batch from simulate_season() outcome dicts."""
+        return cls([[outcomes.get(event_type, 0) for event_type in PA_EVENT_TYPES] for outcomes in outcomes_list])
+
+    @classmethod
+    def concatenate(cls, batches):
+        """Stacks several batches into one."""
+        batches = list(batches)
+        if not batches:
+            return cls(np.zeros((0, len(PA_EVENT_TYPES)), dtype=np.int32))
+        return cls(np.concatenate([batch.event_counts for batch in batches], axis=0))
+
+    def __len__(self):
+        return self.event_counts.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.event_counts.nbytes
+
+    # --- Event-count columns ---
+    def counts(self, event_type):
+        """Per-season count of one PA_EVENT_TYPES event, e.g. counts("HR")."""
+        return self.event_counts[:, _EVENT_INDEX[event_type]]
+
+    @property
+    def H(self):
+        return self.counts("HR") + self.counts("2B") + self.counts("1B")
+
+    @property
+    def OUT(self):
+        return self.counts("K") + self.counts("IPO")
+
+    @property
+    def AB(self):
+        return self.H + self.OUT
+
+    @property
+    def PA(self):
+        return self.event_counts.sum(axis=1)
+
+    @property
+    def TB(self):
+        # Triples are not modeled (see calculate_sim_stats)
+        return self.counts("1B") + 2 * self.counts("2B") + 4 * self.counts("HR")
+
+    # --- Rate stats (vectorized calculate_sim_stats) ---
+    @property
+    def BA(self):
+        return _safe_ratio(self.H, self.AB)
+
+    @property
+    def OBP(self):
+        return _safe_ratio(self.H + self.counts("BB") + self.counts("HBP"), self.PA)
+
+    @property
+    def SLG(self):
+        return _safe_ratio(self.TB, self.AB)
+
+    @property
+    def OPS(self):
+        return self.OBP + self.SLG
+
+    @property
+    def K_rate(self):
+        return _safe_ratio(self.counts("K"), self.PA)
+
+    @property
+    def BB_rate(self):
+        return _safe_ratio(self.counts("BB"), self.PA)
+
+    def stat(self, stat_key):
+        """Per-season values of any calculate_sim_stats key, e.g. stat("SLG") or stat("HR_count")."""
+        if stat_key in ("BA", "OBP", "SLG", "OPS", "K_rate", "BB_rate"):
+            return getattr(self, stat_key)
+        if stat_key == "_1B_count":
+            return self.counts("1B")
+        if stat_key == "_2B_count":
+            return self.counts("2B")
+        if stat_key.endswith("_count"):
+            base_key = stat_key[:-len("_count")]
+            if base_key in _EVENT_INDEX:
+                return self.counts(base_key)
+            if base_key in ("H", "AB", "PA", "OUT"):
+                return getattr(self, base_key)
+        raise KeyError(stat_key)
+
+    def season_stats(self, season_index):
+        """The calculate_sim_stats dict for a single season."""
+        row = SeasonBatch(self.event_counts[season_index])
+        return {key: row.stat(key)[0].item() for key in SEASON_STAT_KEYS}
+
+    # --- Reducers ---
+    def mean(self, stat_key=None):
+        """Mean of one stat, or a dict of means for every calculate_sim_stats key."""
+        if stat_key is None:
+            return {key: self.mean(key) for key in SEASON_STAT_KEYS}
+        return float(np.mean(self.stat(stat_key))) if len(self) else 0.0
+
+    def std(self, stat_key=None, ddof=0):
+        """Standard deviation of one stat, or a dict for every calculate_sim_stats key."""
+        if stat_key is None:
+            return {key: self.std(key, ddof) for key in SEASON_STAT_KEYS}
+        return float(np.std(self.stat(stat_key), ddof=ddof)) if len(self) > ddof else 0.0
+
+    def percentile(self, stat_key, q):
+        """Percentile(s) q (0-100) of one stat across the seasons."""
+        return np.percentile(self.stat(stat_key), q)
@@ -1,33 +1,32 @@
 # simulation_engine.py
 import random
 
-def simulate_season(num_pa, probabilities):
+import numpy as np
+
+from .game_constants import (
+    PA_EVENT_TYPES,
+    ADAPTIVE_SIM_STAT_KEYS, ADAPTIVE_SIM_CONFIDENCE,
+    ADAPTIVE_SIM_BATCH_SEASONS, ADAPTIVE_SIM_MIN_SEASONS, ADAPTIVE_SIM_MAX_SEASONS
+)
+from .event_sampler import AliasEventSampler, probabilities_to_vector
+from .season_batch import SeasonBatch
+from .running_stats import RunningStats
+from .rng import make_rng
+
+def simulate_season(num_pa, probabilities, rng=None):
+    # rng: np.random.Generator (see core/rng.py) for reproducible runs; None uses the global `random` module
     # Event types from probability_model: "HR", "2B", "1B", "BB", "HBP", "K", "IPO"
     outcomes = {
         "HR": 0, "2B": 0, "1B": 0, "BB": 0, "HBP": 0, "K": 0, "IPO": 0,
         "H": 0, "AB": 0, "PA": 0, "OUT": 0 # Aggregate OUT for convenience if needed
     }
-    # Define the order for resolving random outcomes based on cumulative probability
-    # HBP and BB are often resolved first by some models, but here order matters for cumulative sum.
-    # Make sure all keys in 'probabilities' are in event_order.
-    event_order = ["HR", "2B", "1B", "BB", "HBP", "K", "IPO"]
-    # Verify probabilities sum to ~1.0 (can add a check here if needed)
+    # Build the alias table once per season (or reuse a prebuilt one); each PA is then
+    # an O(1) draw instead of a cumulative-sum scan over the event order.
+    sampler = probabilities if isinstance(probabilities, AliasEventSampler) else AliasEventSampler(probabilities)
 
     for _ in range(num_pa):
         outcomes["PA"] += 1
-        rand_val = random.random()
-        cumulative_prob = 0.0
-        chosen_event = None # Should always be set
-
-        for event_type in event_order:
-            prob = probabilities.get(event_type, 0)
-            cumulative_prob += prob
-            if rand_val < cumulative_prob:
-                chosen_event = event_type
-                break
-        
-        if chosen_event is None: # Fallback if something went wrong with probabilities
-            chosen_event = "IPO" # Default to an out
+        chosen_event = sampler.draw(rng if rng is not None else random)
 
         outcomes[chosen_event] += 1
 
@@ -45,6 +44,142 @@ def simulate_season(num_pa, probabilities):
 
     return outcomes
 
+def simulate_seasons(num_seasons, num_pa, probabilities, rng=None):
+    """
+    Simulates many seasons at once.
+    Each season's event counts follow Multinomial(num_pa, p), which is exactly the distribution
+    produced by drawing the plate appearances one by one as simulate_season does.
+    Returns an int32 array of shape (num_seasons, len(PA_EVENT_TYPES)), columns in PA_EVENT_TYPES order.
+    Use event_counts_to_outcomes() to turn a row into the dict expected by calculate_sim_stats.
+    """
+    rng = make_rng(rng)
+    prob_vector = probabilities_to_vector(probabilities)
+    return rng.multinomial(num_pa, prob_vector, size=num_seasons).astype(np.int32)
+
+class CommonRandomSeasons:
+    """
+    A fixed block of uniform draws, shape (num_seasons, num_pa), shared by every candidate
+    probability vector it is asked about (common random numbers). Each PA's uniform is mapped
+    to an event by inverse CDF in PA_EVENT_TYPES order, so nearby probability vectors produce
+    nearly identical seasons and differences between candidates carry little simulation noise.
+    Each candidate's seasons are still exactly Multinomial(num_pa, p) on their own.
+
+    Every row is sorted once and shifted by its row index, which makes the flattened block
+    globally sorted; event_counts() is then one searchsorted call per candidate.
+    """
+
+    def __init__(self, num_seasons, num_pa, rng=None):
+        rng = make_rng(rng)
+        self.num_seasons = num_seasons
+        self.num_pa = num_pa
+        self._row_offsets = np.arange(num_seasons, dtype=np.float64)[:, np.newaxis]
+        sorted_uniforms = np.sort(rng.random((num_seasons, num_pa)), axis=1)
+        self._shifted_uniforms = (sorted_uniforms + self._row_offsets).ravel()
+        row_starts = np.arange(num_seasons, dtype=np.intp)[:, np.newaxis] * num_pa
+        self._row_bounds = (row_starts, row_starts + num_pa)
+
+    def event_counts(self, probabilities):
+        """Event counts of the shared seasons under one probability dict/vector; same layout as simulate_seasons()."""
+        prob_vector = probabilities_to_vector(probabilities)
+        # Inner CDF boundaries only: the last event takes the rest of the row, so each season has exactly num_pa PA
+        cdf = np.clip(np.cumsum(prob_vector[:-1]), 0.0, 1.0)
+        thresholds = (cdf[np.newaxis, :] + self._row_offsets).ravel()
+        boundaries = np.searchsorted(self._shifted_uniforms, thresholds).reshape(self.num_seasons, len(cdf))
+        row_starts, row_ends = self._row_bounds
+        return np.diff(np.hstack([row_starts, boundaries, row_ends]), axis=1).astype(np.int32)
+
+# Events whose share shrinks when the HBP rate grows (see get_pa_event_probabilities, step 3)
+_BALL_IN_PLAY_INDICES = [PA_EVENT_TYPES.index(event_type) for event_type in ("2B", "1B", "IPO")]
+_HBP_INDEX = PA_EVENT_TYPES.index("HBP")
+
+
+def derive_season_counts(reference_counts, num_pa, hbp_thinning_probability, rng=None):
+    """
+    Turns seasons simulated at HBP rate 0 into seasons with fewer PA and a positive HBP rate,
+    without simulating again.
+    reference_counts: int array (..., len(PA_EVENT_TYPES)) of seasons with the same PA total each.
+    The first num_pa PA of a season are a uniform subsample of its PA, so their event counts are
+    multivariate hypergeometric given the row (drawn one event at a time). A positive HBP rate h
+    only scales the ball-in-play events by (B0 - h) / B0, where B0 is their share at HBP 0, so
+    turning each ball in play into an HBP with probability h / B0 (hbp_thinning_probability,
+    a scalar or one value per leading index) gives exactly the seasons at rate h.
+    Returns an int32 array of the same shape with num_pa PA per season.
+    """
+    rng = make_rng(rng)
+    reference_counts = np.asarray(reference_counts, dtype=np.int64)
+    leading_shape = reference_counts.shape[:-1]
+    rows = reference_counts.reshape(-1, len(PA_EVENT_TYPES))
+    reference_pa = rows.sum(axis=1)
+    if np.any(reference_pa < num_pa):
+        raise ValueError(f"reference seasons have fewer than {num_pa} PA")
+
+    derived = np.empty_like(rows)
+    remaining_pa, remaining_draws = reference_pa.copy(), np.full(len(rows), num_pa, dtype=np.int64)
+    for event_index in range(len(PA_EVENT_TYPES) - 1):
+        event_counts = rows[:, event_index]
+        derived[:, event_index] = rng.hypergeometric(event_counts, remaining_pa - event_counts, remaining_draws)
+        remaining_pa -= event_counts
+        remaining_draws -= derived[:, event_index]
+    derived[:, -1] = remaining_draws # the last event takes the rest, so every season keeps num_pa PA
+
+    thinning = np.broadcast_to(np.clip(hbp_thinning_probability, 0.0, 1.0), leading_shape).reshape(-1)
+    if np.any(thinning > 0):
+        for event_index in _BALL_IN_PLAY_INDICES:
+            hit_by_pitch = rng.binomial(derived[:, event_index], thinning)
+            derived[:, event_index] -= hit_by_pitch
+            derived[:, _HBP_INDEX] += hit_by_pitch
+    return derived.reshape(reference_counts.shape).astype(np.int32)
+
+
+def simulate_until_precise(num_pa, probabilities, tolerance,
+                           batch_seasons=ADAPTIVE_SIM_BATCH_SEASONS,
+                           min_seasons=ADAPTIVE_SIM_MIN_SEASONS,
+                           max_seasons=ADAPTIVE_SIM_MAX_SEASONS,
+                           confidence=ADAPTIVE_SIM_CONFIDENCE,
+                           rng=None,
+                           season_simulator_func=simulate_seasons,
+                           stats_calculator_func=SeasonBatch):
+    """
+    Simulates seasons in batches until the confidence-interval half-width of every tracked stat
+    is below its tolerance, or max_seasons is reached.
+    tolerance is either a float applied to ADAPTIVE_SIM_STAT_KEYS or a dict {stat_key: tolerance}
+    (absolute, in the stat's own units, e.g. {"SLG": 0.01, "HR_count": 1.0}).
+    Each batch comes from season_simulator_func(batch_size, num_pa, probabilities, rng=rng) and is
+    summarized by stats_calculator_func, as in the fixed-count evaluation.
+    Returns (running_stats, seasons_used, converged).
+    """
+    if isinstance(tolerance, dict):
+        tolerances = dict(tolerance)
+    else:
+        tolerances = {stat_key: tolerance for stat_key in ADAPTIVE_SIM_STAT_KEYS}
+    rng = make_rng(rng)
+
+    running_stats = RunningStats()
+    converged = False
+    while running_stats.count < max_seasons:
+        batch_size = min(batch_seasons, max_seasons - running_stats.count)
+        if running_stats.count < min_seasons:
+            batch_size = max(batch_size, min(min_seasons, max_seasons) - running_stats.count)
+        running_stats.update_batch(stats_calculator_func(season_simulator_func(batch_size, num_pa, probabilities, rng=rng)))
+        if running_stats.count >= min_seasons and all(
+            running_stats.half_width(stat_key, confidence) <= stat_tolerance
+            for stat_key, stat_tolerance in tolerances.items()
+        ):
+            converged = True
+            break
+    return running_stats, running_stats.count, converged
+
+def event_counts_to_outcomes(event_counts):
+    """
+    Expands one row of simulate_seasons() output into the outcomes dict produced by simulate_season.
+    """
+    outcomes = {event_type: int(count) for event_type, count in zip(PA_EVENT_TYPES, event_counts)}
+    outcomes["H"] = outcomes["HR"] + outcomes["2B"] + outcomes["1B"]
+    outcomes["OUT"] = outcomes["K"] + outcomes["IPO"]
+    outcomes["AB"] = outcomes["H"] + outcomes["OUT"]
+    outcomes["PA"] = sum(outcomes[event_type] for event_type in PA_EVENT_TYPES)
+    return outcomes
+
 def calculate_sim_stats(sim_results):
     stats = {}
     ab = sim_results.get("AB",0); h = sim_results.get("H",0); bb = sim_results.get("BB",0)
@@ -79,4 +214,110 @@ def calculate_sim_stats(sim_results):
     # Simulated OUT is K + IPO. The sum K+IPO should match PA_sim - H_sim - BB_sim - HBP_sim.
     stats["OUT_count"] = sim_results.get("OUT",0) # This is K + IPO
 
-    return stats
\ No newline at end of file
+    return stats
+
+# Per-event weights (PA_EVENT_TYPES order: HR, 2B, 1B, BB, HBP, K, IPO) for the count totals used by the stats.
+_HIT_WEIGHTS = np.array([1, 1, 1, 0, 0, 0, 0], dtype=np.float64)
+_AB_WEIGHTS = np.array([1, 1, 1, 0, 0, 1, 1], dtype=np.float64)
+_ON_BASE_WEIGHTS = np.array([1, 1, 1, 1, 1, 0, 0], dtype=np.float64)
+_TOTAL_BASES_WEIGHTS = np.array([4, 2, 1, 0, 0, 0, 0], dtype=np.float64)
+
+def _multinomial_variance(num_pa, prob_vector, weights):
+    """Variance of sum_i weights[i] * N_i for N ~ Multinomial(num_pa, prob_vector)."""
+    mean_weight = weights @ prob_vector
+    return num_pa * max(0.0, (weights * weights) @ prob_vector - mean_weight * mean_weight)
+
+def _multinomial_covariance(num_pa, prob_vector, weights_x, weights_y):
+    """Covariance of two linear event-count totals under Multinomial(num_pa, prob_vector)."""
+    return num_pa * ((weights_x * weights_y) @ prob_vector - (weights_x @ prob_vector) * (weights_y @ prob_vector))
+
+def _expected_ratio(num_pa, prob_vector, weights_x, weights_y):
+    """
+    Second-order (ratio-estimator) approximation of E[X/Y] for two event-count totals:
+    E[X/Y] ~= mu_x/mu_y - Cov(X,Y)/mu_y^2 + mu_x*Var(Y)/mu_y^3.
+    The first-order term alone is biased for small AB totals.
+    """
+    mu_x = num_pa * (weights_x @ prob_vector)
+    mu_y = num_pa * (weights_y @ prob_vector)
+    if mu_y <= 0:
+        return 0.0
+    cov_xy = _multinomial_covariance(num_pa, prob_vector, weights_x, weights_y)
+    var_y = _multinomial_variance(num_pa, prob_vector, weights_y)
+    return mu_x / mu_y - cov_xy / mu_y**2 + mu_x * var_y / mu_y**3
+
+def _ratio_gradient(num_pa, prob_vector, weights_x, weights_y):
+    """Per-event gradient of X/Y around its mean (delta method), or None when E[Y] is 0."""
+    mu_y = num_pa * (weights_y @ prob_vector)
+    if mu_y <= 0:
+        return None
+    ratio = (weights_x @ prob_vector) / (weights_y @ prob_vector)
+    return (weights_x - ratio * weights_y) / mu_y
+
+def expected_sim_stats(probabilities, num_pa, return_std_errors=False, num_seasons=1):
+    """
+    Closed-form counterpart of calculate_sim_stats(simulate_season(num_pa, probabilities)).
+    Season event counts are Multinomial(num_pa, p), so count stats are exact expectations and
+    BA/SLG (ratios over the random AB total) use the second-order ratio-estimator correction.
+    Returns a dict with the same keys as calculate_sim_stats. With return_std_errors=True,
+    also returns a second dict with the (delta-method) standard error of the average of each
+    stat over num_seasons simulated seasons.
+    """
+    prob_vector = probabilities_to_vector(probabilities)
+    n = float(num_pa)
+    event_means = n * prob_vector
+    hr, dbl, sgl, bb, hbp, k, ipo = event_means
+
+    stats = {}
+    stats["BA"] = _expected_ratio(n, prob_vector, _HIT_WEIGHTS, _AB_WEIGHTS)
+    stats["OBP"] = (_ON_BASE_WEIGHTS @ prob_vector) if n > 0 else 0
+    stats["SLG"] = _expected_ratio(n, prob_vector, _TOTAL_BASES_WEIGHTS, _AB_WEIGHTS)
+    stats["OPS"] = stats["OBP"] + stats["SLG"]
+    stats["K_rate"] = prob_vector[PA_EVENT_TYPES.index("K")] if n > 0 else 0
+    stats["BB_rate"] = prob_vector[PA_EVENT_TYPES.index("BB")] if n > 0 else 0
+
+    stats["HR_count"] = hr
+    stats["BB_count"] = bb
+    stats["K_count"] = k
+    stats["H_count"] = hr + dbl + sgl
+    stats["AB_count"] = hr + dbl + sgl + k + ipo
+    stats["PA_count"] = n
+    stats["_1B_count"] = sgl
+    stats["_2B_count"] = dbl
+    stats["OUT_count"] = k + ipo
+    stats = {key: float(value) for key, value in stats.items()}
+
+    if not return_std_errors:
+        return stats
+
+    def linear_std(weights):
+        return _multinomial_variance(n, prob_vector, weights) ** 0.5
+
+    def event_std(event_type):
+        weights = np.zeros(len(PA_EVENT_TYPES))
+        weights[PA_EVENT_TYPES.index(event_type)] = 1.0
+        return linear_std(weights)
+
+    ba_gradient = _ratio_gradient(n, prob_vector, _HIT_WEIGHTS, _AB_WEIGHTS)
+    slg_gradient = _ratio_gradient(n, prob_vector, _TOTAL_BASES_WEIGHTS, _AB_WEIGHTS)
+    obp_gradient = _ON_BASE_WEIGHTS / n if n > 0 else None
+
+    std_devs = {
+        "BA": linear_std(ba_gradient) if ba_gradient is not None else 0.0,
+        "OBP": linear_std(obp_gradient) if obp_gradient is not None else 0.0,
+        "SLG": linear_std(slg_gradient) if slg_gradient is not None else 0.0,
+        "OPS": linear_std(obp_gradient + slg_gradient) if slg_gradient is not None else 0.0,
+        "K_rate": event_std("K") / n if n > 0 else 0.0,
+        "BB_rate": event_std("BB") / n if n > 0 else 0.0,
+        "HR_count": event_std("HR"),
+        "BB_count": event_std("BB"),
+        "K_count": event_std("K"),
+        "H_count": linear_std(_HIT_WEIGHTS),
+        "AB_count": linear_std(_AB_WEIGHTS),
+        "PA_count": 0.0,
+        "_1B_count": event_std("1B"),
+        "_2B_count": event_std("2B"),
+        "OUT_count": linear_std(_AB_WEIGHTS - _HIT_WEIGHTS),
+    }
+    season_scale = max(1, num_seasons) ** 0.5
+    std_errors = {key: float(value) / season_scale for key, value in std_devs.items()}
+    return stats, std_errors
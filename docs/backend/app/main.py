@@ -1,18 +1,68 @@
 # backend/app/main.py
-import random
-from fastapi import FastAPI
+import asyncio
+import contextlib
+import functools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware # 確保導入
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
 # 假設您的 Pydantic 模型和核心邏輯檔案在正確的路徑
 # (請確保這些導入路徑是正確的，根據您目前的檔案結構)
-from .models.simulation_models import BatterAttributes, AtBatResult
+from .models.simulation_models import (
+    BatterAttributes, AtBatResult, AtBatBatchRequest, AtBatBatchResult, AtBatBatchItem,
+    GameRequest, GameSimulationResult, SeriesRequest, GameSessionStart, GameSessionNext,
+    ProbabilityCacheStats, ModelParametersInfo, TargetLine, InvertedAttributes
+)
 from .core.probability_model import get_pa_event_probabilities
+from .core.game_constants import (
+    PA_EVENT_TYPES, MAX_AT_BATS_PER_REQUEST, MAX_GAMES_PER_REQUEST,
+    MAX_SERIES_GAMES, GAME_SERIES_CHUNK_SIZE, GAME_SERIES_MAX_IN_FLIGHT_PER_WORKER,
+    GAME_SOCKET_MAX_PLAYS_PER_MESSAGE, GAME_SOCKET_IDLE_TIMEOUT_SECONDS
+)
+from .core.game_engine import GameSimulator, build_team, simulate_game, simulate_game_chunk
+from .core.event_sampler import probabilities_to_vector, draw_grouped_event_indices
+from .core.inverse_model import invert_target_line
+from .core.rng import make_rng, spawn_seed_sequences
+from .core.probability_table import get_probability_table
+from .core.probability_cache import ProbabilityCache
+from .core.parameter_set import (
+    ParameterSet, MODEL_PARAMETERS_PATH_ENV, get_active_parameter_set, set_active_parameter_set
+)
+
+# 系列賽模擬的行程池 (第一次使用時建立)；工作行程數可由環境變數 GAME_SIMULATION_WORKERS 設定
+GAME_SIMULATION_WORKERS = int(os.environ.get("GAME_SIMULATION_WORKERS") or os.cpu_count() or 1)
+_game_pool = None
+
+
+def get_game_pool():
+    global _game_pool
+    if _game_pool is None:
+        _game_pool = ProcessPoolExecutor(max_workers=GAME_SIMULATION_WORKERS)
+    return _game_pool
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _game_pool
+    yield
+    if _game_pool is not None: # 關閉服務時取消尚未開始的工作；重新啟動時再建立新的行程池
+        _game_pool.shutdown(wait=False, cancel_futures=True)
+        _game_pool = None
+
 
 # 創建 FastAPI 應用實例
 app = FastAPI(
     title="Baseball Simulation API",
     description="提供棒球比賽打席模擬的核心 API 服務。",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- 配置 CORS (跨域資源共享) ---
@@ -31,6 +81,50 @@ app.add_middleware(
 )
 # --- CORS 配置結束 ---
 
+# 服務層級的亂數產生器；設定環境變數 SIMULATION_RNG_SEED 可讓整個服務的抽樣序列可重現
+_seed_env = os.environ.get("SIMULATION_RNG_SEED")
+app_rng = make_rng(int(_seed_env) if _seed_env else None)
+
+
+class ModelState(NamedTuple):
+    """目前服務使用的模型：參數組、機率函數與快取版本鍵。整組一次替換，請求只讀取一次參照。"""
+    params: ParameterSet
+    prob_func: object
+    model_version: str
+    uses_table: bool
+
+
+def build_model_state(params):
+    # 若已為此參數組產生機率查表 (python -m backend.app.core.probability_table)，改用查表 (記憶體映射，所有 worker 共用分頁)
+    probability_table = get_probability_table(params)
+    if probability_table is not None:
+        return ModelState(params, probability_table.get_pa_event_probabilities, params.version + "-table", True)
+    return ModelState(params, functools.partial(get_pa_event_probabilities, params=params), params.version, False)
+
+
+model_state = build_model_state(get_active_parameter_set())
+# 前方再加一層 LRU 快取：固定陣容每個打席都送相同屬性，重複查詢只需一次 dict 查找。
+# 快取鍵包含參數雜湊，熱替換後舊參數的項目自然被 LRU 淘汰，換回舊參數時仍可命中
+probability_cache = ProbabilityCache(params=model_state.params)
+
+
+def pa_event_probabilities_func(POW, HIT, EYE, player_hbp_rate):
+    state = model_state # 讀取一次，熱替換期間也不會混用新舊參數
+    return probability_cache.lookup(state.model_version, state.prob_func, POW, HIT, EYE, player_hbp_rate)
+
+
+def pa_event_sampler(POW, HIT, EYE, player_hbp_rate):
+    """(機率, AliasEventSampler)；抽樣器與快取項目一起保存，同一組屬性的重複請求不必重建 alias 表。"""
+    state = model_state
+    return probability_cache.lookup_sampler(state.model_version, state.prob_func, POW, HIT, EYE, player_hbp_rate)
+
+
+def model_parameters_info(state):
+    return ModelParametersInfo(
+        name=state.params.name, content_hash=state.params.content_hash, version=state.model_version,
+        uses_table=state.uses_table, parameters=state.params.to_dict()["parameters"],
+    )
+
 
 
 @app.post("/api/v1/simulate_at_bat", response_model=AtBatResult)
@@ -42,8 +136,8 @@ async def simulate_single_at_bat(attributes: BatterAttributes):
     接收打者的 POW, HIT, EYE 屬性，回傳打席結果。
     """
     # 1. 從核心模型獲取各事件的發生機率
-    # 注意：確保 get_pa_event_probabilities 函數的參數與 BatterAttributes 一致
-    event_probabilities = get_pa_event_probabilities(
+    # 注意：確保 get_pa_event_probabilities 函數的參數與 BatterAttributes 一致 (查表版本參數相同)
+    event_probabilities, sampler = pa_event_sampler(
         POW=attributes.pow,
         HIT=attributes.hit,
         EYE=attributes.eye,
@@ -53,23 +147,230 @@ async def simulate_single_at_bat(attributes: BatterAttributes):
 
 
     # 2. 從計算出的機率中，隨機抽出一個實際發生的事件
-    # (這段邏輯類似您 simulation_engine.py 中的 simulate_season 但只處理一次事件)
-    event_order = ["HR", "2B", "1B", "BB", "HBP", "K", "IPO"] # 確保順序與機率計算時的期望一致
-    rand_val = random.random()
-    cumulative_prob = 0.0
-    chosen_event = "IPO"  # 預設結果為界內球出局
-
-    for event_type in event_order:
-        prob = event_probabilities.get(event_type, 0.0)
-        cumulative_prob += prob
-        if rand_val < cumulative_prob:
-            chosen_event = event_type
-            break
+    # (與 simulation_engine.simulate_season 共用同一個 alias 抽樣器，O(1) 抽樣；抽樣器隨快取項目保存，只建一次)
+    # 請求帶 seed 時使用專屬串流 (結果可重現)，否則使用服務層級的產生器
+    rng = make_rng(attributes.seed) if attributes.seed is not None else app_rng
+    chosen_event = sampler.draw(rng)
 
     print(f"[Backend] Chosen event: {chosen_event}") # <--- 加入這行
             
     return AtBatResult(outcome=chosen_event, probabilities=event_probabilities)
 
+@app.post("/api/v1/simulate_at_bats", response_model=AtBatBatchResult)
+def simulate_at_bats(request: AtBatBatchRequest):
+    """
+    一次模擬多組打者的多個打席 (例如整場比賽兩隊打線的預抽結果)。
+    每組屬性只計算一次機率，所有打席以向量化的反累積分布抽樣一次抽出。
+    (一般 def 端點: 最多 MAX_AT_BATS_PER_REQUEST 個打席的抽樣在執行緒池中進行，不阻塞 WebSocket 與串流回應)
+    """
+    total_at_bats = sum(at_bat.count for at_bat in request.at_bats)
+    if total_at_bats > MAX_AT_BATS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"打席總數 {total_at_bats} 超過上限 {MAX_AT_BATS_PER_REQUEST}")
+
+    event_probabilities_list = [
+        pa_event_probabilities_func(POW=at_bat.pow, HIT=at_bat.hit, EYE=at_bat.eye, player_hbp_rate=at_bat.hbp_rate)
+        for at_bat in request.at_bats
+    ]
+    rng = make_rng(request.seed) if request.seed is not None else app_rng
+    counts = [at_bat.count for at_bat in request.at_bats]
+    event_indices = draw_grouped_event_indices(
+        np.array([probabilities_to_vector(probabilities) for probabilities in event_probabilities_list]).reshape(-1, len(PA_EVENT_TYPES)),
+        counts, rng
+    ).tolist()
+
+    results = []
+    start = 0
+    for count, probabilities in zip(counts, event_probabilities_list):
+        results.append(AtBatBatchItem(
+            outcomes=[PA_EVENT_TYPES[index] for index in event_indices[start:start + count]],
+            probabilities=probabilities if request.include_probabilities else None,
+        ))
+        start += count
+    return AtBatBatchResult(results=results)
+
+@app.post("/api/v1/simulate_game", response_model=GameSimulationResult)
+def simulate_games(request: GameRequest):
+    """
+    在伺服器端模擬完整比賽 (局數、出局、壘上跑者、速度推進、投手體力與換投，規則與前端 gameLogic.js 相同)，
+    一場比賽一個請求即可，不需每個打席往返一次。num_games > 1 時以相同陣容連續模擬多場。
+    (一般 def 端點: FastAPI 在執行緒池中執行，CPU 計算不會阻塞事件迴圈)
+    """
+    if request.num_games > MAX_GAMES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"比賽數 {request.num_games} 超過上限 {MAX_GAMES_PER_REQUEST}")
+    # 每場比賽各自由種子衍生亂數串流 (與 /api/v1/simulate_series 相同)，相同種子的第 i 場在兩個端點結果一致
+    seed_sequences = spawn_seed_sequences(request.seed if request.seed is not None else app_rng, request.num_games)
+    away_data, home_data = request.away.model_dump(), request.home.model_dump()
+    games = [
+        simulate_game(away_data, home_data, np.random.default_rng(seed_sequence), pa_event_probabilities_func,
+                      record_plays=request.include_play_by_play)
+        for seed_sequence in seed_sequences
+    ]
+    return GameSimulationResult(
+        games=games,
+        away_wins=sum(game["winner"] == "away" for game in games),
+        home_wins=sum(game["winner"] == "home" for game in games),
+        ties=sum(game["winner"] is None for game in games),
+    )
+
+async def series_results_stream(request, series_request):
+    """
+    以行程池分批模擬比賽，每完成一批就逐場輸出 NDJSON (依完成順序，每行帶場次 "game")，最後輸出一行勝負統計。
+    同時排隊的工作數有上限，伺服器記憶體用量與比賽總數無關；用戶端中斷連線時取消尚未開始的工作並停止。
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_game_pool()
+    seed_sequences = spawn_seed_sequences(series_request.seed if series_request.seed is not None else app_rng,
+                                          series_request.num_games)
+    away_data, home_data = series_request.away.model_dump(), series_request.home.model_dump()
+    state = model_state # 工作行程依此重建與 pa_event_probabilities_func 相同的機率函數 (查表 + 快取量化)
+    chunk_args = [
+        (away_data, home_data, (state.params, state.uses_table, state.model_version), first_index,
+         seed_sequences[first_index:first_index + GAME_SERIES_CHUNK_SIZE], series_request.include_play_by_play)
+        for first_index in range(0, series_request.num_games, GAME_SERIES_CHUNK_SIZE)
+    ]
+    max_in_flight = GAME_SIMULATION_WORKERS * GAME_SERIES_MAX_IN_FLIGHT_PER_WORKER
+    tally = {"away_wins": 0, "home_wins": 0, "ties": 0}
+    pending, next_chunk, games_sent = set(), 0, 0
+    try:
+        while next_chunk < len(chunk_args) or pending:
+            while next_chunk < len(chunk_args) and len(pending) < max_in_flight:
+                pending.add(loop.run_in_executor(pool, simulate_game_chunk, chunk_args[next_chunk]))
+                next_chunk += 1
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                for game_index, result in future.result():
+                    tally["ties" if result["winner"] is None else f"{result['winner']}_wins"] += 1
+                    games_sent += 1
+                    yield json.dumps({"type": "game", "game": game_index, **result}, ensure_ascii=False) + "\n"
+            if await request.is_disconnected():
+                print(f"[Backend] Series cancelled by client after {games_sent}/{series_request.num_games} games")
+                return
+        yield json.dumps({"type": "summary", "games": games_sent, **tally}) + "\n"
+    finally:
+        for future in pending: # 中斷或出錯時: 尚未開始的工作直接取消，執行中的工作結果捨棄
+            future.cancel()
+
+
+@app.post("/api/v1/simulate_series")
+async def simulate_series(request: Request, series_request: SeriesRequest):
+    """
+    系列賽 / 賽季模擬，回傳 application/x-ndjson 串流：每場比賽完成即送出一行
+    {"type": "game", "game": 場次, ...比賽結果 (與 /api/v1/simulate_game 相同)}，
+    全部完成後送出 {"type": "summary", "games", "away_wins", "home_wins", "ties"}。
+    比賽在行程池中平行模擬；用戶端中斷連線即取消剩餘比賽。
+    """
+    if series_request.num_games > MAX_SERIES_GAMES:
+        raise HTTPException(status_code=400, detail=f"比賽數 {series_request.num_games} 超過上限 {MAX_SERIES_GAMES}")
+    return StreamingResponse(series_results_stream(request, series_request), media_type="application/x-ndjson")
+
+@app.websocket("/api/v1/ws/game")
+async def game_play_by_play(websocket: WebSocket):
+    """
+    逐打席互動模式的 WebSocket 工作階段：比賽狀態 (GameSimulator) 與每位打者預先計算的事件機率保存在伺服器端，
+    每一步只需傳一則小訊息，不必重送打者屬性、重新驗證或重算機率。
+    用戶端訊息:
+      {"type": "start", "away": ..., "home": ..., "seed": ...}  開新比賽 (取代目前的比賽)，回覆 {"type": "started", ...局面}
+      {"type": "next", "count": n}                               推進 n 個打席，每個打席推送一則 {"type": "play", ...}；
+                                                                 比賽結束時再推送 {"type": "game_over", ...比賽結果}
+      {"type": "result"}                                         回覆目前的比賽結果 {"type": "result", ...}
+    錯誤以 {"type": "error", "detail": ...} 回覆，連線保持開啟；閒置超過 GAME_SOCKET_IDLE_TIMEOUT_SECONDS 秒由伺服器關閉。
+    """
+    await websocket.accept()
+    simulator = None
+
+    async def send_error(detail):
+        await websocket.send_json({"type": "error", "detail": detail})
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive_json(), GAME_SOCKET_IDLE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000, reason="idle timeout")
+                return
+            except ValueError:
+                await send_error("訊息必須是 JSON")
+                continue
+            message_type = message.get("type") if isinstance(message, dict) else None
+
+            try:
+                if message_type == "start":
+                    start = GameSessionStart.model_validate(message)
+                    rng = make_rng(start.seed) if start.seed is not None else app_rng
+                    simulator = GameSimulator(build_team(start.away.model_dump(), pa_event_probabilities_func),
+                                              build_team(start.home.model_dump(), pa_event_probabilities_func), rng)
+                    await websocket.send_json({"type": "started", **simulator.state()})
+                elif message_type == "next":
+                    step = GameSessionNext.model_validate(message)
+                    if simulator is None:
+                        await send_error("尚未開始比賽，請先送出 start 訊息")
+                    elif simulator.game_over:
+                        await send_error("比賽已結束")
+                    elif step.count > GAME_SOCKET_MAX_PLAYS_PER_MESSAGE:
+                        await send_error(f"打席數 {step.count} 超過上限 {GAME_SOCKET_MAX_PLAYS_PER_MESSAGE}")
+                    else:
+                        for _ in range(step.count):
+                            await websocket.send_json({"type": "play", **simulator.play_plate_appearance()})
+                            if simulator.game_over:
+                                await websocket.send_json({"type": "game_over", **simulator.result()})
+                                break
+                elif message_type == "result":
+                    if simulator is None:
+                        await send_error("尚未開始比賽，請先送出 start 訊息")
+                    else:
+                        await websocket.send_json({"type": "result", **simulator.result()})
+                else:
+                    await send_error(f"未知的訊息類型: {message_type}")
+            except ValidationError as e:
+                await send_error(e.errors(include_url=False, include_context=False))
+    except WebSocketDisconnect:
+        print("[Backend] Play-by-play session closed by client")
+
+@app.get("/api/v1/probability_cache_stats", response_model=ProbabilityCacheStats)
+async def get_probability_cache_stats():
+    """事件機率快取的命中/未命中/淘汰計數，供監控使用。"""
+    return ProbabilityCacheStats(**{**probability_cache.stats(), "model_version": model_state.model_version})
+
+
+@app.get("/api/v1/model_parameters", response_model=ModelParametersInfo)
+async def get_model_parameters():
+    """目前使用中的模型參數組 (名稱、內容雜湊與全部參數)。"""
+    return model_parameters_info(model_state)
+
+
+@app.post("/api/v1/model_parameters/reload", response_model=ModelParametersInfo)
+async def reload_model_parameters():
+    """
+    重新讀取環境變數 MODEL_PARAMETERS_PATH 指定的參數檔並原子性替換，不需重新部署。
+    新參數組在完整載入 (含查表) 後才一次替換；讀取或驗證失敗時保留原參數組。
+    """
+    global model_state
+    path = os.environ.get(MODEL_PARAMETERS_PATH_ENV)
+    if not path:
+        raise HTTPException(status_code=400, detail=f"未設定 {MODEL_PARAMETERS_PATH_ENV}，無參數檔可重新載入")
+    try:
+        new_state = build_model_state(ParameterSet.load(path))
+    except (OSError, ValueError, KeyError, TypeError) as error:
+        raise HTTPException(status_code=400, detail=f"參數檔載入失敗: {error}")
+    model_state = new_state
+    set_active_parameter_set(new_state.params)
+    print(f"[Backend] Model parameters swapped to {new_state.model_version}")
+    return model_parameters_info(new_state)
+
+@app.post("/api/v1/invert_target_line", response_model=InvertedAttributes)
+async def invert_target_line_endpoint(target_line: TargetLine):
+    """
+    由目標數據直接反推 POW / HIT / EYE (反解 S 型曲線，不需搜索)，可用於依請求建立球員。
+    """
+    try:
+        attributes, details = invert_target_line(
+            target_line.target_ratios, target_line.target_counts, target_line.hbp_rate,
+            params=model_state.params, return_details=True
+        )
+    except (ValueError, KeyError, ZeroDivisionError) as error:
+        raise HTTPException(status_code=400, detail=f"無法反推屬性: {error}")
+    return InvertedAttributes(pow=attributes["POW"], hit=attributes["HIT"], eye=attributes["EYE"], **details)
+
 # 您可以在這裡加入其他 API 端點，例如獲取球員資料等
 
 # 測試用的根路徑
@@ -1,12 +1,17 @@
 # main_simulation.py
-import random
+import argparse
+import functools
+import json
 import math
+import os
 
 from backend.app.core.game_constants import (
     NUM_PA_PER_SEASON_ARCHETYPE,
     NUM_SEASONS_FOR_FINAL_RUN,
+    SIMULATION_BATCH_SEASONS,
     # ERROR_WEIGHTS, DEVIATION_PENALTY_WEIGHT, # 這些現在在 optimization_utils 內部處理
-    ATTRIBUTE_SEARCH_RANGE_DELTA
+    ATTRIBUTE_SEARCH_RANGE_DELTA,
+    ADAPTIVE_SIM_TOLERANCE
 )
 from backend.app.core.player_data import (
     get_judge_anchor_abilities, get_judge_target_data,
@@ -14,111 +19,173 @@ from backend.app.core.player_data import (
     get_arcia_anchor_abilities, get_arcia_target_data,
     get_ohtani_anchor_abilities, get_ohtani_target_data,
     get_freeman_anchor_abilities, get_freeman_target_data,
-    ARCHETYPES_DATA
+    ARCHETYPES_DATA,
+    calculate_player_game_attributes
 )
 from backend.app.core.probability_model import get_pa_event_probabilities
-from backend.app.core.simulation_engine import simulate_season, calculate_sim_stats 
-from backend.app.utils.optimization_utils import find_best_attributes_two_stage_search # 新的兩階段搜索函數
+from backend.app.core.simulation_engine import simulate_seasons, simulate_until_precise, expected_sim_stats
+from backend.app.core.season_batch import SeasonBatch
+from backend.app.core.running_stats import RunningStats
+from backend.app.core.rng import make_rng
+from backend.app.core.probability_table import get_probability_table
+from backend.app.core.probability_cache import ProbabilityCache
+from backend.app.core.parameter_set import get_active_parameter_set
+from backend.app.utils.optimization_utils import ( # 新的兩階段搜索函數
+    find_best_attributes_two_stage_search, find_best_attributes_surrogate, find_best_attributes_racing_search,
+    find_best_attributes_batch
+)
+from backend.app.utils.parallel_runner import run_tasks_in_pool
 
 PRINT_EVENT_PROBABILITIES = True
 
+# 球員屬性最佳化模式 -> 標題顯示名稱
+OPTIMIZER_MODES = {"two-stage": "Two-Stage", "surrogate": "Surrogate", "racing": "Racing"}
+
+
+def simulate_seasons_streaming(num_seasons, num_pa, event_probs, progress_label, rng=None):
+    """
+    以固定大小的批次模擬 num_seasons 個賽季，逐批併入 RunningStats (記憶體用量固定，不保留逐季結果)。
+    rng: np.random.Generator 或種子 (見 core/rng.py)。
+    """
+    rng = make_rng(rng)
+    running_stats = RunningStats()
+    print_interval = max(1, num_seasons // 4)
+    next_print_at = print_interval
+    seasons_done = 0
+    while seasons_done < num_seasons:
+        batch_size = min(SIMULATION_BATCH_SEASONS, num_seasons - seasons_done)
+        running_stats.update_batch(SeasonBatch(simulate_seasons(batch_size, num_pa, event_probs, rng)))
+        seasons_done += batch_size
+        if seasons_done >= next_print_at or seasons_done == num_seasons:
+            print(f"  {progress_label}: 已完成 {seasons_done}/{num_seasons} 個賽季...")
+            while next_print_at <= seasons_done:
+                next_print_at += print_interval
+    return running_stats
+
+
+def get_probability_cache(use_probability_table=False):
+    """
+    最佳化用的機率快取 (LRU)。階段一在小範圍偶數格點上抽樣，同一組屬性會被重複評估。
+    use_probability_table 時快取背後改用預先計算的查表 (需先產生查表檔案)。
+    參數組取自目前啟用的參數 (環境變數 MODEL_PARAMETERS_PATH 可指定檔案)，快取與查表皆以其雜湊區分。
+    """
+    params = get_active_parameter_set()
+    if not use_probability_table:
+        return ProbabilityCache(params=params)
+    probability_table = get_probability_table(params)
+    if probability_table is None:
+        raise FileNotFoundError(f"找不到參數組 {params.version} 的機率查表，請先執行: python -m backend.app.core.probability_table")
+    return ProbabilityCache(prob_func=probability_table.get_pa_event_probabilities, model_version=params.version + "-table")
+
+
+def format_spread(running_stats, stat_key):
+    """標準差與平均值的 95% 信賴區間，供比率表格顯示。"""
+    ci_low, ci_high = running_stats.confidence_interval(stat_key)
+    return f"{running_stats.std(stat_key):<8.3f} | [{ci_low:.4f}, {ci_high:.4f}]"
+
+def run_single_archetype_calibration(archetype_name, data, rng=None):
+    """單一原型球員的校準模擬 (可獨立於其他原型平行執行)。"""
+    player_pow = data["POW"]
+    player_hit = data["HIT"]
+    player_eye = data["EYE"]
+    player_hbp_rate = data["HBP_rate"]
+    target_rates = data["Target_Rate"]
+    target_counts_main = data["Target_Count"]
+
+    event_probs = get_pa_event_probabilities(
+        player_pow, player_hit, player_eye, player_hbp_rate
+    )
+    
+    if PRINT_EVENT_PROBABILITIES:
+        print(f"\n{archetype_name} - 模擬用 PA 事件機率:")
+        prob_sum_check = sum(event_probs.values())
+        for event, prob in event_probs.items(): print(f"  P({event}): {prob:.5f}")
+        print(f"  機率總和: {prob_sum_check:.5f}")
+        if abs(prob_sum_check - 1.0) > 1e-5:
+            print(f"  警告: 機率總和 ({prob_sum_check:.5f}) 與 1.0 偏差過大！")
+
+    # 解析期望值 (不需模擬)，供快速比對校準方向
+    expected_stats_archetype = expected_sim_stats(
+        event_probs, target_counts_main.get('PA', NUM_PA_PER_SEASON_ARCHETYPE)
+    )
+    print(f"\n{archetype_name} - 解析期望值: "
+          f"BA={expected_stats_archetype['BA']:.3f}, OBP={expected_stats_archetype['OBP']:.3f}, "
+          f"SLG={expected_stats_archetype['SLG']:.3f}, OPS={expected_stats_archetype['OPS']:.3f}, "
+          f"HR={expected_stats_archetype['HR_count']:.1f}")
+
+    # 原型校準時使用 NUM_SEASONS_FOR_FINAL_RUN 以獲得穩定結果
+    num_seasons_for_archetype_calib = NUM_SEASONS_FOR_FINAL_RUN 
+    num_pa_archetype = target_counts_main.get('PA', NUM_PA_PER_SEASON_ARCHETYPE)
+
+    print(f"\n正在為 {archetype_name} (POW={player_pow}, HIT={player_hit}, EYE={player_eye}) 模擬 {num_seasons_for_archetype_calib} 個賽季...")
+    season_stats_archetype = simulate_seasons_streaming(
+        num_seasons_for_archetype_calib, num_pa_archetype, event_probs, archetype_name, rng=rng
+    )
+
+    avg_BA_archetype = season_stats_archetype.mean('BA')
+    avg_OBP_archetype = season_stats_archetype.mean('OBP')
+    avg_SLG_archetype = season_stats_archetype.mean('SLG')
+    avg_OPS_archetype = season_stats_archetype.mean('OPS') # OPS
+    avg_K_rate_archetype = season_stats_archetype.mean('K_rate')
+    avg_BB_rate_archetype = season_stats_archetype.mean('BB_rate')
+
+    avg_counts_archetype = {
+        stat_key_internal: season_stats_archetype.mean(stat_key_internal+"_count")
+        for stat_key_internal in ["HR", "BB", "K", "H", "AB", "PA", "_1B", "_2B", "OUT"]
+    }
+    print(f"{archetype_name} 模擬完成！")
+
+    print(f"\n--- {archetype_name}：{num_seasons_for_archetype_calib} 次模擬平均結果 vs 目標數據 ---")
+    print(f"使用的遊戲屬性: POW={player_pow}, HIT={player_hit}, EYE={player_eye}")
+    
+    print(f"\n平均計數數據比較:")
+    print(f"{'事件':<9} | {'平均模擬值':<12} | {'目標值':<17}")
+    print("---------|--------------|------------------")
+    
+    key_stats_to_print = [("HR", "HR"), ("K", "K_target"), ("PA", "PA"), ("BB", "BB_target")] # HR目標也改為HR
+    for stat_print, target_key in key_stats_to_print:
+        sim_val_key = stat_print 
+        sim_display_val = avg_counts_archetype.get(sim_val_key, 'N/A')
+        # 原型球員的目標HR在Target_Count下的鍵就是"HR"
+        target_display_val = target_counts_main.get(target_key if target_key else stat_print, 'N/A') 
+        sim_display_str = f"{sim_display_val:<12.1f}" if isinstance(sim_display_val, (int,float)) else f"{str(sim_display_val):<12}"
+        target_display_str = str(target_display_val) if target_display_val != 'N/A' else 'N/A  ' 
+        print(f"{stat_print:<9} | {sim_display_str} | {target_display_str:<6}")
+
+    print("\n平均比率數據比較:")
+    print(f"{'比率':<9} | {'平均模擬值':<12} | {'目標值':<8} | {'標準差':<8} | {'95% 信賴區間':<17}")
+    print("---------|--------------|----------|----------|------------------")
+    rate_stats_to_print = [("BA", "BA"), ("OBP", "OBP"), ("SLG", "SLG"), ("OPS", "OPS"), ("K_rate", "K_rate"), ("BB_rate", "BB_rate")]
+    for rate_print, target_key_rate in rate_stats_to_print:
+        avg_val_to_print = locals().get(f"avg_{rate_print}_archetype", -1)
+        if avg_val_to_print == -1 and rate_print == "OPS": 
+             avg_val_to_print = avg_OBP_archetype + avg_SLG_archetype
+        
+        target_val = target_rates.get(target_key_rate, 'N/A')
+        target_val_str = f"{target_val:.3f}" if isinstance(target_val, (int, float)) else str(target_val)
+        print(f"{rate_print:<9} | {avg_val_to_print:<12.3f} | {target_val_str:<8} | {format_spread(season_stats_archetype, rate_print)}")
+
+
 # run_archetype_calibration() 函數保持不變 (此處省略以節省空間)
-def run_archetype_calibration():
+def run_archetype_calibration_header(rng=None): # rng 僅為與其他工作介面一致，未使用
     print("\n--- 開始原型球員校準測試 (使用S型曲線模型 v3) ---") # 更新標題
-    for archetype_name, data in ARCHETYPES_DATA.items():
-        player_pow = data["POW"]
-        player_hit = data["HIT"]
-        player_eye = data["EYE"]
-        player_hbp_rate = data["HBP_rate"]
-        target_rates = data["Target_Rate"]
-        target_counts_main = data["Target_Count"]
-
-        event_probs = get_pa_event_probabilities(
-            player_pow, player_hit, player_eye, player_hbp_rate
-        )
-        
-        if PRINT_EVENT_PROBABILITIES:
-            print(f"\n{archetype_name} - 模擬用 PA 事件機率:")
-            prob_sum_check = sum(event_probs.values())
-            for event, prob in event_probs.items(): print(f"  P({event}): {prob:.5f}")
-            print(f"  機率總和: {prob_sum_check:.5f}")
-            if abs(prob_sum_check - 1.0) > 1e-5:
-                print(f"  警告: 機率總和 ({prob_sum_check:.5f}) 與 1.0 偏差過大！")
-
-        all_sim_stats_list_archetype = []
-        # 原型校準時使用 NUM_SEASONS_FOR_FINAL_RUN 以獲得穩定結果
-        num_seasons_for_archetype_calib = NUM_SEASONS_FOR_FINAL_RUN 
-        num_pa_archetype = target_counts_main.get('PA', NUM_PA_PER_SEASON_ARCHETYPE)
-
-        print(f"\n正在為 {archetype_name} (POW={player_pow}, HIT={player_hit}, EYE={player_eye}) 模擬 {num_seasons_for_archetype_calib} 個賽季...")
-        print_interval = num_seasons_for_archetype_calib // 4 
-        if print_interval == 0: print_interval = 1 
-
-        for i in range(num_seasons_for_archetype_calib):
-            if (i + 1) % print_interval == 0 or (i + 1) == num_seasons_for_archetype_calib:
-                print(f"  {archetype_name}: 已完成 {i + 1}/{num_seasons_for_archetype_calib} 個賽季...")
-            single_season_outcomes = simulate_season(num_pa_archetype, event_probs)
-            all_sim_stats_list_archetype.append(calculate_sim_stats(single_season_outcomes))
-        
-        avg_BA_archetype = sum(s['BA'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-        avg_OBP_archetype = sum(s['OBP'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-        avg_SLG_archetype = sum(s['SLG'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-        avg_OPS_archetype = sum(s['OPS'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib # OPS
-        avg_K_rate_archetype = sum(s['K_rate'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-        avg_BB_rate_archetype = sum(s['BB_rate'] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-
-        avg_counts_archetype = {
-            stat_key_internal: sum(s[stat_key_internal+"_count"] for s in all_sim_stats_list_archetype) / num_seasons_for_archetype_calib
-            for stat_key_internal in ["HR", "BB", "K", "H", "AB", "PA", "_1B", "_2B", "OUT"]
-        }
-        print(f"{archetype_name} 模擬完成！")
-
-        print(f"\n--- {archetype_name}：{num_seasons_for_archetype_calib} 次模擬平均結果 vs 目標數據 ---")
-        print(f"使用的遊戲屬性: POW={player_pow}, HIT={player_hit}, EYE={player_eye}")
-        
-        print(f"\n平均計數數據比較:")
-        print(f"{'事件':<9} | {'平均模擬值':<12} | {'目標值':<17}")
-        print("---------|--------------|------------------")
-        
-        key_stats_to_print = [("HR", "HR"), ("K", "K_target"), ("PA", "PA"), ("BB", "BB_target")] # HR目標也改為HR
-        for stat_print, target_key in key_stats_to_print:
-            sim_val_key = stat_print 
-            sim_display_val = avg_counts_archetype.get(sim_val_key, 'N/A')
-            # 原型球員的目標HR在Target_Count下的鍵就是"HR"
-            target_display_val = target_counts_main.get(target_key if target_key else stat_print, 'N/A') 
-            sim_display_str = f"{sim_display_val:<12.1f}" if isinstance(sim_display_val, (int,float)) else f"{str(sim_display_val):<12}"
-            target_display_str = str(target_display_val) if target_display_val != 'N/A' else 'N/A  ' 
-            print(f"{stat_print:<9} | {sim_display_str} | {target_display_str:<6}")
-
-        print("\n平均比率數據比較:")
-        print(f"{'比率':<9} | {'平均模擬值':<12} | {'目標值':<17}")
-        print("---------|--------------|------------------")
-        rate_stats_to_print = [("BA", "BA"), ("OBP", "OBP"), ("SLG", "SLG"), ("OPS", "OPS"), ("K_rate", "K_rate"), ("BB_rate", "BB_rate")]
-        for rate_print, target_key_rate in rate_stats_to_print:
-            avg_val_to_print = locals().get(f"avg_{rate_print}_archetype", -1)
-            if avg_val_to_print == -1 and rate_print == "OPS": 
-                 avg_val_to_print = avg_OBP_archetype + avg_SLG_archetype
-            
-            target_val = target_rates.get(target_key_rate, 'N/A')
-            target_val_str = f"{target_val:.3f}" if isinstance(target_val, (int, float)) else str(target_val)
-            print(f"{rate_print:<9} | {avg_val_to_print:<12.3f} | {target_val_str}")
 
+
+def run_archetype_calibration_footer(rng=None):
     print("\n--- 原型球員校準測試結束 ---")
     print("如果原型不符合預期，請調整 game_constants.py 中的S型曲線錨點或修正因子參數，然後重新運行此校準測試。")
 
 
-def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, target_data_func): # 移除 custom_error_weights
-    anchor_abilities = anchor_abilities_func()
-    target_pa, target_counts, target_ratios, player_hbp_rate = target_data_func()
+def run_archetype_calibration(rng=None):
+    rng = make_rng(rng)
+    run_archetype_calibration_header()
+    for archetype_name, data in ARCHETYPES_DATA.items():
+        run_single_archetype_calibration(archetype_name, data, rng=rng)
+    run_archetype_calibration_footer()
 
-    print(f"\n===== {player_name} Optimization (Two-Stage) =====")
-    # 誤差權重現在由 optimization_utils 內部根據階段處理
-        
-    print(f"{player_name} 的錨點能力值 (基於x-stats轉換):")
-    print(f"  POW_anchor: {anchor_abilities['POW']:.2f}")
-    print(f"  HIT_anchor: {anchor_abilities['HIT']:.2f}")
-    print(f"  EYE_anchor: {anchor_abilities['EYE']:.2f}")
-    
+
+def attribute_search_ranges(anchor_abilities):
+    """錨點周圍 ±ATTRIBUTE_SEARCH_RANGE_DELTA 的 (POW, HIT, EYE) 搜索範圍，限制在 1~150。"""
     pow_range = (max(1, anchor_abilities['POW'] - ATTRIBUTE_SEARCH_RANGE_DELTA), 
                  min(150, anchor_abilities['POW'] + ATTRIBUTE_SEARCH_RANGE_DELTA)) # 允許上限到150
     hit_range = (max(1, anchor_abilities['HIT'] - ATTRIBUTE_SEARCH_RANGE_DELTA), 
@@ -129,6 +196,29 @@ def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, ta
     pow_range = (pow_range[0], max(pow_range[0] + 1, pow_range[1])) # 至少有1的範圍
     hit_range = (hit_range[0], max(hit_range[0] + 1, hit_range[1]))
     eye_range = (eye_range[0], max(eye_range[0] + 1, eye_range[1]))
+    return pow_range, hit_range, eye_range
+
+
+def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, target_data_func, adaptive_tolerance=None, executor=None, rng=None,
+                                          use_probability_table=False, common_random_numbers=False, optimizer="two-stage",
+                                          checkpoint_path=None): # 移除 custom_error_weights
+    rng = make_rng(rng)
+    anchor_abilities = anchor_abilities_func()
+    target_pa, target_counts, target_ratios, player_hbp_rate = target_data_func()
+
+    if optimizer not in OPTIMIZER_MODES:
+        raise ValueError(f"未知的最佳化模式: {optimizer} (可用: {OPTIMIZER_MODES})")
+    if checkpoint_path is not None and optimizer != "two-stage":
+        raise ValueError("檢查點目前僅支援 two-stage 最佳化")
+    print(f"\n===== {player_name} Optimization ({OPTIMIZER_MODES[optimizer]}) =====")
+    # 誤差權重現在由 optimization_utils 內部根據階段處理
+        
+    print(f"{player_name} 的錨點能力值 (基於x-stats轉換):")
+    print(f"  POW_anchor: {anchor_abilities['POW']:.2f}")
+    print(f"  HIT_anchor: {anchor_abilities['HIT']:.2f}")
+    print(f"  EYE_anchor: {anchor_abilities['EYE']:.2f}")
+    
+    pow_range, hit_range, eye_range = attribute_search_ranges(anchor_abilities)
 
 
     if PRINT_EVENT_PROBABILITIES: # 可以移到 optimization_utils 內部，如果需要分階段打印
@@ -136,24 +226,79 @@ def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, ta
         print(f"{player_name} HIT 搜索範圍: ({hit_range[0]:.2f}, {hit_range[1]:.2f})")
         print(f"{player_name} EYE 搜索範圍: ({eye_range[0]:.2f}, {eye_range[1]:.2f})")
     
-    # 調用新的兩階段搜索函數
-    best_attrs, min_err = find_best_attributes_two_stage_search(
-        player_name=player_name,
-        anchor_abilities=anchor_abilities,
-        target_pa=target_pa,
-        target_counts=target_counts,
-        target_ratios=target_ratios,
-        player_hbp_rate=player_hbp_rate,
-        # error_weights 和 deviation_penalty_weight 由函數內部處理
-        prob_calculator_func=get_pa_event_probabilities,
-        season_simulator_func=simulate_season,
-        stats_calculator_func=calculate_sim_stats,
-        pow_search_range=pow_range,
-        hit_search_range=hit_range,
-        eye_search_range=eye_range
-        # num_iterations 和 num_seasons_per_eval 也由函數內部常量控制
-    )
+    # 調用新的兩階段搜索函數 (或代理最佳化 / 競賽搜索)
+    probability_cache = get_probability_cache(use_probability_table)
+    if optimizer == "surrogate":
+        # 代理最佳化在連續空間移動單形，直接使用未量化的模型 (或查表)：經過快取會把屬性取整到
+        # PROBABILITY_CACHE_ATTRIBUTE_QUANTUM，目標函數變成與收斂容差同寬的平台，且每個點都只用一次
+        best_attrs, min_err = find_best_attributes_surrogate(
+            player_name=player_name,
+            anchor_abilities=anchor_abilities,
+            target_pa=target_pa,
+            target_counts=target_counts,
+            target_ratios=target_ratios,
+            player_hbp_rate=player_hbp_rate,
+            prob_calculator_func=probability_cache.prob_func,
+            pow_search_range=pow_range,
+            hit_search_range=hit_range,
+            eye_search_range=eye_range,
+            season_simulator_func=simulate_seasons,
+            stats_calculator_func=SeasonBatch,
+            rng=rng
+        )
+    elif optimizer == "racing":
+        best_attrs, min_err = find_best_attributes_racing_search(
+            player_name=player_name,
+            anchor_abilities=anchor_abilities,
+            target_pa=target_pa,
+            target_counts=target_counts,
+            target_ratios=target_ratios,
+            player_hbp_rate=player_hbp_rate,
+            prob_calculator_func=probability_cache.get_pa_event_probabilities,
+            season_simulator_func=simulate_seasons,
+            pow_search_range=pow_range,
+            hit_search_range=hit_range,
+            eye_search_range=eye_range,
+            rng=rng,
+            executor=executor
+        )
+    else:
+        best_attrs, min_err = find_best_attributes_two_stage_search(
+            player_name=player_name,
+            anchor_abilities=anchor_abilities,
+            target_pa=target_pa,
+            target_counts=target_counts,
+            target_ratios=target_ratios,
+            player_hbp_rate=player_hbp_rate,
+            # error_weights 和 deviation_penalty_weight 由函數內部處理
+            prob_calculator_func=probability_cache.get_pa_event_probabilities,
+            season_simulator_func=simulate_seasons,
+            stats_calculator_func=SeasonBatch,
+            pow_search_range=pow_range,
+            hit_search_range=hit_range,
+            eye_search_range=eye_range,
+            adaptive_tolerance=adaptive_tolerance,
+            rng=rng,
+            common_random_numbers=common_random_numbers,
+            executor=executor, # 傳入行程池時候選者分批平行評估 (結果與依序執行相同)
+            checkpoint_path=checkpoint_path,
+            model_version=probability_cache.model_version # 參數組雜湊 (查表時加 "-table")，檢查點只在相同模型下續用
+            # num_iterations 和 num_seasons_per_eval 也由函數內部常量控制
+        )
+
+    cache_stats = probability_cache.stats()
+    if cache_stats["hits"] + cache_stats["misses"] > 0:
+        print(f"機率快取: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} "
+              f"(命中率 {cache_stats['hit_rate']:.1%})，淘汰 {cache_stats['evictions']}")
+
+    run_final_simulation_comparison(player_name, best_attrs, target_pa, target_counts, target_ratios, player_hbp_rate,
+                                    rng=rng)
+    return best_attrs, min_err
 
+
+def run_final_simulation_comparison(player_name, best_attrs, target_pa, target_counts, target_ratios, player_hbp_rate,
+                                    rng=None):
+    """以最佳屬性模擬 NUM_SEASONS_FOR_FINAL_RUN 個賽季，並印出模擬值與真實值的比較。"""
     # --- Final Simulation (與之前類似) ---
     print(f"\n--- {player_name}: 最終模擬確認 ({NUM_SEASONS_FOR_FINAL_RUN}個賽季) ---")
     # ... (最終模擬和打印結果的代碼與 v3 版本基本相同，此處省略以節省空間) ...
@@ -162,26 +307,20 @@ def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, ta
         best_attrs['POW'], best_attrs['HIT'], best_attrs['EYE'], player_hbp_rate
     )
     
-    final_all_sim_stats_list = []
     print(f"正在為 {player_name} (POW={best_attrs['POW']:.2f}, HIT={best_attrs['HIT']:.2f}, EYE={best_attrs['EYE']:.2f}) 模擬 {NUM_SEASONS_FOR_FINAL_RUN} 個賽季...")
-    print_interval_final = NUM_SEASONS_FOR_FINAL_RUN // 4
-    if print_interval_final == 0: print_interval_final = 1
-
-    for i in range(NUM_SEASONS_FOR_FINAL_RUN):
-        if (i + 1) % print_interval_final == 0 or (i + 1) == NUM_SEASONS_FOR_FINAL_RUN:
-            print(f"  {player_name} 確認模擬: 已完成 {i + 1}/{NUM_SEASONS_FOR_FINAL_RUN} 個賽季...")
-        ss_outcomes = simulate_season(target_pa, final_event_probs)
-        final_all_sim_stats_list.append(calculate_sim_stats(ss_outcomes))
-
-    avg_final_BA = sum(s['BA'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
-    avg_final_OBP = sum(s['OBP'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
-    avg_final_SLG = sum(s['SLG'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
-    avg_final_OPS = sum(s['OPS'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN # OPS
-    avg_final_K_rate = sum(s['K_rate'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
-    avg_final_BB_rate = sum(s['BB_rate'] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
+    final_season_stats = simulate_seasons_streaming(
+        NUM_SEASONS_FOR_FINAL_RUN, target_pa, final_event_probs, f"{player_name} 確認模擬", rng=rng
+    )
+
+    avg_final_BA = final_season_stats.mean('BA')
+    avg_final_OBP = final_season_stats.mean('OBP')
+    avg_final_SLG = final_season_stats.mean('SLG')
+    avg_final_OPS = final_season_stats.mean('OPS') # OPS
+    avg_final_K_rate = final_season_stats.mean('K_rate')
+    avg_final_BB_rate = final_season_stats.mean('BB_rate')
 
     avg_final_counts = {
-        stat_key_internal: sum(s[stat_key_internal+"_count"] for s in final_all_sim_stats_list) / NUM_SEASONS_FOR_FINAL_RUN
+        stat_key_internal: final_season_stats.mean(stat_key_internal+"_count")
         for stat_key_internal in ["HR", "BB", "K", "H", "AB", "PA", "_1B", "_2B", "OUT"]
     }
     print(f"{player_name} 最終確認模擬完成！")
@@ -213,18 +352,23 @@ def run_player_optimization_and_final_sim(player_name, anchor_abilities_func, ta
         print(f"{disp_name:<9} | {sim_val:<12.1f} | {target_val_str:<6}")
 
     print("\n平均比率數據比較:")
-    print(f"{'比率':<9} | {'平均模擬值':<12} | {'真實值':<17}")
-    print(f"---------|--------------|------------------")
-    print(f"{'BA':<9} | {avg_final_BA:<12.3f} | {target_ratios.get('BA',0):.3f}")
-    print(f"{'OBP':<9} | {avg_final_OBP:<12.3f} | {target_ratios.get('OBP',0):.3f}")
-    print(f"{'SLG':<9} | {avg_final_SLG:<12.3f} | {target_ratios.get('SLG',0):.3f}")
-    print(f"{'OPS':<9} | {avg_final_OPS:<12.3f} | {target_ratios.get('OPS',0):.3f}")
-    print(f"{'K_rate':<9} | {avg_final_K_rate:<12.3f} | {target_ratios.get('K_rate',0):.3f}")
-    print(f"{'BB_rate':<9} | {avg_final_BB_rate:<12.3f} | {target_ratios.get('BB_rate',0):.3f}")
+    print(f"{'比率':<9} | {'平均模擬值':<12} | {'真實值':<8} | {'標準差':<8} | {'95% 信賴區間':<17}")
+    print(f"---------|--------------|----------|----------|------------------")
+    print(f"{'BA':<9} | {avg_final_BA:<12.3f} | {target_ratios.get('BA',0):<8.3f} | {format_spread(final_season_stats, 'BA')}")
+    print(f"{'OBP':<9} | {avg_final_OBP:<12.3f} | {target_ratios.get('OBP',0):<8.3f} | {format_spread(final_season_stats, 'OBP')}")
+    print(f"{'SLG':<9} | {avg_final_SLG:<12.3f} | {target_ratios.get('SLG',0):<8.3f} | {format_spread(final_season_stats, 'SLG')}")
+    print(f"{'OPS':<9} | {avg_final_OPS:<12.3f} | {target_ratios.get('OPS',0):<8.3f} | {format_spread(final_season_stats, 'OPS')}")
+    print(f"{'K_rate':<9} | {avg_final_K_rate:<12.3f} | {target_ratios.get('K_rate',0):<8.3f} | {format_spread(final_season_stats, 'K_rate')}")
+    print(f"{'BB_rate':<9} | {avg_final_BB_rate:<12.3f} | {target_ratios.get('BB_rate',0):<8.3f} | {format_spread(final_season_stats, 'BB_rate')}")
 
 
 # run_player_direct_simulation() 函數保持不變 (此處省略)
-def run_player_direct_simulation(player_name, anchor_abilities_func, target_data_func, num_seasons=NUM_SEASONS_FOR_FINAL_RUN):
+def run_player_direct_simulation(player_name, anchor_abilities_func, target_data_func, num_seasons=NUM_SEASONS_FOR_FINAL_RUN, tolerance=None, rng=None):
+    """
+    以錨點能力值直接模擬。tolerance 設定時改為精度導向模式:
+    模擬到所有追蹤統計量的信賴區間半寬 <= tolerance 為止，num_seasons 作為上限。
+    """
+    rng = make_rng(rng)
     print(f"\n===== {player_name} Direct Simulation Test =====")
     anchor_abilities = anchor_abilities_func()
     target_pa, target_counts, target_ratios, player_hbp_rate = target_data_func()
@@ -246,26 +390,27 @@ def run_player_direct_simulation(player_name, anchor_abilities_func, target_data
         if abs(prob_sum_check - 1.0) > 1e-5:
             print(f"  警告: 機率總和 ({prob_sum_check:.5f}) 與 1.0 偏差過大！")
 
-    all_direct_sim_stats_list = []
     print(f"正在為 {player_name} (POW={anchor_abilities['POW']:.2f}, HIT={anchor_abilities['HIT']:.2f}, EYE={anchor_abilities['EYE']:.2f}) 模擬 {num_seasons} 個賽季...")
-    print_interval_direct = num_seasons // 4
-    if print_interval_direct == 0: print_interval_direct = 1
-    
-    for i in range(num_seasons):
-        if (i + 1) % print_interval_direct == 0 or (i + 1) == num_seasons:
-            print(f"  {player_name} 直接模擬: 已完成 {i + 1}/{num_seasons} 個賽季...")
-        ss_outcomes = simulate_season(target_pa, direct_event_probs)
-        all_direct_sim_stats_list.append(calculate_sim_stats(ss_outcomes))
-
-    avg_direct_BA = sum(s['BA'] for s in all_direct_sim_stats_list) / num_seasons
-    avg_direct_OBP = sum(s['OBP'] for s in all_direct_sim_stats_list) / num_seasons
-    avg_direct_SLG = sum(s['SLG'] for s in all_direct_sim_stats_list) / num_seasons
-    avg_direct_OPS = sum(s['OPS'] for s in all_direct_sim_stats_list) / num_seasons
-    avg_direct_K_rate = sum(s['K_rate'] for s in all_direct_sim_stats_list) / num_seasons
-    avg_direct_BB_rate = sum(s['BB_rate'] for s in all_direct_sim_stats_list) / num_seasons
+    if tolerance is not None:
+        direct_season_stats, seasons_used, converged = simulate_until_precise(
+            target_pa, direct_event_probs, tolerance, max_seasons=num_seasons, rng=rng
+        )
+        status_text = "已達精度" if converged else "已達上限"
+        print(f"  {player_name} 直接模擬: {status_text}，共使用 {seasons_used}/{num_seasons} 個賽季。")
+    else:
+        direct_season_stats = simulate_seasons_streaming(
+            num_seasons, target_pa, direct_event_probs, f"{player_name} 直接模擬", rng=rng
+        )
+
+    avg_direct_BA = direct_season_stats.mean('BA')
+    avg_direct_OBP = direct_season_stats.mean('OBP')
+    avg_direct_SLG = direct_season_stats.mean('SLG')
+    avg_direct_OPS = direct_season_stats.mean('OPS')
+    avg_direct_K_rate = direct_season_stats.mean('K_rate')
+    avg_direct_BB_rate = direct_season_stats.mean('BB_rate')
 
     avg_direct_counts = {
-        stat_key_internal: sum(s[stat_key_internal+"_count"] for s in all_direct_sim_stats_list) / num_seasons
+        stat_key_internal: direct_season_stats.mean(stat_key_internal+"_count")
         for stat_key_internal in ["HR", "BB", "K", "H", "AB", "PA", "_1B", "_2B", "OUT"]
     }
     print(f"{player_name} 直接模擬完成！")
@@ -297,56 +442,172 @@ def run_player_direct_simulation(player_name, anchor_abilities_func, target_data
         print(f"{disp_name:<9} | {sim_val:<12.1f} | {target_val_str:<6}")
 
     print("\n平均比率數據比較:")
-    print(f"{'比率':<9} | {'平均模擬值':<12} | {'真實值':<17}")
-    print(f"---------|--------------|------------------")
-    print(f"{'BA':<9} | {avg_direct_BA:<12.3f} | {target_ratios.get('BA',0):.3f}")
-    print(f"{'OBP':<9} | {avg_direct_OBP:<12.3f} | {target_ratios.get('OBP',0):.3f}")
-    print(f"{'SLG':<9} | {avg_direct_SLG:<12.3f} | {target_ratios.get('SLG',0):.3f}")
-    print(f"{'OPS':<9} | {avg_direct_OPS:<12.3f} | {target_ratios.get('OPS',0):.3f}")
-    print(f"{'K_rate':<9} | {avg_direct_K_rate:<12.3f} | {target_ratios.get('K_rate',0):.3f}")
-    print(f"{'BB_rate':<9} | {avg_direct_BB_rate:<12.3f} | {target_ratios.get('BB_rate',0):.3f}")
+    print(f"{'比率':<9} | {'平均模擬值':<12} | {'真實值':<8} | {'標準差':<8} | {'95% 信賴區間':<17}")
+    print(f"---------|--------------|----------|----------|------------------")
+    print(f"{'BA':<9} | {avg_direct_BA:<12.3f} | {target_ratios.get('BA',0):<8.3f} | {format_spread(direct_season_stats, 'BA')}")
+    print(f"{'OBP':<9} | {avg_direct_OBP:<12.3f} | {target_ratios.get('OBP',0):<8.3f} | {format_spread(direct_season_stats, 'OBP')}")
+    print(f"{'SLG':<9} | {avg_direct_SLG:<12.3f} | {target_ratios.get('SLG',0):<8.3f} | {format_spread(direct_season_stats, 'SLG')}")
+    print(f"{'OPS':<9} | {avg_direct_OPS:<12.3f} | {target_ratios.get('OPS',0):<8.3f} | {format_spread(direct_season_stats, 'OPS')}")
+    print(f"{'K_rate':<9} | {avg_direct_K_rate:<12.3f} | {target_ratios.get('K_rate',0):<8.3f} | {format_spread(direct_season_stats, 'K_rate')}")
+    print(f"{'BB_rate':<9} | {avg_direct_BB_rate:<12.3f} | {target_ratios.get('BB_rate',0):<8.3f} | {format_spread(direct_season_stats, 'BB_rate')}")
     print("="*50)
 
 
-if __name__ == "__main__":
-    run_archetype_calibration()
-    
-    # 順序調整：先跑直接模擬，再跑最佳化
-    run_player_direct_simulation( 
-        player_name="Shohei Ohtani (2024 Anchor)",
-        anchor_abilities_func=get_ohtani_anchor_abilities,
-        target_data_func=get_ohtani_target_data
-    )
-    run_player_direct_simulation(
-        player_name="Freddie Freeman (2023 Anchor)",
-        anchor_abilities_func=get_freeman_anchor_abilities,
-        target_data_func=get_freeman_target_data
+# 直接模擬與最佳化的球員清單 (依序執行順序)
+DIRECT_SIMULATION_PLAYERS = [
+    ("Shohei Ohtani (2024 Anchor)", get_ohtani_anchor_abilities, get_ohtani_target_data),
+    ("Freddie Freeman (2023 Anchor)", get_freeman_anchor_abilities, get_freeman_target_data),
+]
+OPTIMIZATION_PLAYERS = [
+    ("Aaron Judge", get_judge_anchor_abilities, get_judge_target_data),
+    ("Paul Goldschmidt", get_goldschmidt_anchor_abilities, get_goldschmidt_target_data),
+    ("Shohei Ohtani", get_ohtani_anchor_abilities, get_ohtani_target_data),
+    ("Freddie Freeman", get_freeman_anchor_abilities, get_freeman_target_data),
+]
+
+
+def _constant(value):
+    return value
+
+
+def load_players_file(path):
+    """
+    從 JSON 檔讀取要最佳化的球員清單，格式與 OPTIMIZATION_PLAYERS 相同 (名稱, 錨點函數, 目標數據函數)。
+    每位球員: {"name", "anchor_abilities": {"POW", "HIT", "EYE"} 或 "xstats": {"xBA", "xSLG", "xwOBA"},
+    "target_pa", "target_counts", "target_ratios", "hbp_rate" (可省略，預設 HBP_target / target_pa)}；
+    鍵名與 core/player_data.py 相同。函數以 functools.partial 包裝，可傳入行程池。
+    """
+    with open(path, encoding="utf-8") as players_file:
+        entries = json.load(players_file)
+    players = []
+    for entry in entries:
+        if "anchor_abilities" in entry:
+            anchor_abilities = {key: float(entry["anchor_abilities"][key]) for key in ("POW", "HIT", "EYE")}
+        else:
+            xstats = entry["xstats"]
+            anchor_abilities = calculate_player_game_attributes(xstats["xBA"], xstats["xSLG"], xstats["xwOBA"])
+        target_pa = entry["target_pa"]
+        target_counts = {"PA_target": target_pa, **entry.get("target_counts", {})}
+        hbp_rate = entry.get("hbp_rate", target_counts.get("HBP_target", 0) / target_pa if target_pa > 0 else 0)
+        target_data = (target_pa, target_counts, entry.get("target_ratios", {}), hbp_rate)
+        players.append((entry["name"], functools.partial(_constant, anchor_abilities), functools.partial(_constant, target_data)))
+    return players
+
+
+def run_batch_optimization_and_final_sims(players, executor=None, rng=None, use_probability_table=False):
+    """
+    批次最佳化 (共用評估快取，見 find_best_attributes_batch)，再為每位球員執行最終確認模擬。
+    players: (名稱, 錨點函數, 目標數據函數) 清單。
+    """
+    rng = make_rng(rng)
+    batch_players = []
+    for player_name, anchor_abilities_func, target_data_func in players:
+        anchor_abilities = anchor_abilities_func()
+        target_pa, target_counts, target_ratios, player_hbp_rate = target_data_func()
+        batch_players.append({
+            "player_name": player_name, "anchor_abilities": anchor_abilities, "target_pa": target_pa,
+            "target_counts": target_counts, "target_ratios": target_ratios, "player_hbp_rate": player_hbp_rate,
+            "search_ranges": attribute_search_ranges(anchor_abilities),
+        })
+    probability_cache = get_probability_cache(use_probability_table)
+    results = find_best_attributes_batch(
+        batch_players,
+        prob_calculator_func=probability_cache.get_pa_event_probabilities,
+        season_simulator_func=simulate_seasons,
+        rng=rng,
+        executor=executor,
+        params=get_active_parameter_set() # 與 get_probability_cache 使用的參數組相同
     )
+    for player in batch_players:
+        best_attrs, _ = results[player["player_name"]]
+        run_final_simulation_comparison(
+            player["player_name"], best_attrs, player["target_pa"], player["target_counts"], player["target_ratios"],
+            player["player_hbp_rate"], rng=rng
+        )
+    return results
 
-    print("\n" + "="*30 + " Aaron Judge Optimization " + "="*30)
-    run_player_optimization_and_final_sim(
-        player_name="Aaron Judge",
-        anchor_abilities_func=get_judge_anchor_abilities,
-        target_data_func=get_judge_target_data
-    )
-    
-    print("\n" + "="*30 + " Paul Goldschmidt Optimization " + "="*30)
-    run_player_optimization_and_final_sim(
-        player_name="Paul Goldschmidt",
-        anchor_abilities_func=get_goldschmidt_anchor_abilities,
-        target_data_func=get_goldschmidt_target_data
-    )
-    
-    print("\n" + "="*30 + " Shohei Ohtani Optimization " + "="*30) 
-    run_player_optimization_and_final_sim(
-        player_name="Shohei Ohtani", 
-        anchor_abilities_func=get_ohtani_anchor_abilities,
-        target_data_func=get_ohtani_target_data
-    )
 
-    print("\n" + "="*30 + " Freddie Freeman Optimization " + "="*30)
-    run_player_optimization_and_final_sim(
-        player_name="Freddie Freeman",
-        anchor_abilities_func=get_freeman_anchor_abilities,
-        target_data_func=get_freeman_target_data
+def print_optimization_banner(player_name):
+    print("\n" + "="*30 + f" {player_name} Optimization " + "="*30)
+
+
+def run_optimization_task(player_name, anchor_abilities_func, target_data_func, rng=None, use_probability_table=False,
+                          common_random_numbers=False, optimizer="two-stage", checkpoint_dir=None, adaptive_tolerance=None):
+    """行程池工作單位: 印出標題後執行單一球員最佳化。設定 checkpoint_dir 時每位球員各有一個檢查點檔案。"""
+    print_optimization_banner(player_name)
+    return run_player_optimization_and_final_sim(
+        player_name=player_name,
+        anchor_abilities_func=anchor_abilities_func,
+        target_data_func=target_data_func,
+        adaptive_tolerance=adaptive_tolerance,
+        rng=rng,
+        use_probability_table=use_probability_table,
+        common_random_numbers=common_random_numbers,
+        optimizer=optimizer,
+        checkpoint_path=(os.path.join(checkpoint_dir, f"{player_name.replace(' ', '_')}.pkl")
+                         if checkpoint_dir is not None else None)
     )
+
+
+def run_full_job_parallel(max_workers=None, seed=None, use_probability_table=False, common_random_numbers=False,
+                          optimizer="two-stage", checkpoint_dir=None, batch=False, players=None, tolerance=None):
+    """
+    以行程池平行執行完整工作 (原型校準 + 直接模擬 + 球員最佳化)。
+    每個原型/球員是一個獨立工作，各自使用由 seed 依工作位置衍生的亂數串流；輸出依原本的順序印出。
+    串流只取決於工作位置，因此相同 seed 在 max_workers=1 (行程內依序執行) 與任意行程數下結果完全相同。
+    設定 checkpoint_dir 時球員最佳化會寫入檢查點；以相同 seed 重新執行即從中斷處繼續，已完成的球員不再重新搜索。
+    players 取代預設的 OPTIMIZATION_PLAYERS；batch=True 時所有球員在同一個工作中以共用評估快取一起最佳化。
+    tolerance 設定時直接模擬與兩階段搜索改為精度導向模式 (信賴區間半寬 <= tolerance 即停止)。
+    """
+    players = OPTIMIZATION_PLAYERS if players is None else players
+    tasks = [(run_archetype_calibration_header, {})]
+    tasks += [(run_single_archetype_calibration, {"archetype_name": name, "data": data})
+              for name, data in ARCHETYPES_DATA.items()]
+    tasks.append((run_archetype_calibration_footer, {}))
+    tasks += [(run_player_direct_simulation,
+               {"player_name": name, "anchor_abilities_func": anchor_func, "target_data_func": target_func,
+                "tolerance": tolerance})
+              for name, anchor_func, target_func in DIRECT_SIMULATION_PLAYERS]
+    if batch:
+        tasks.append((run_batch_optimization_and_final_sims,
+                      {"players": players, "use_probability_table": use_probability_table}))
+    else:
+        tasks += [(run_optimization_task,
+                   {"player_name": name, "anchor_abilities_func": anchor_func, "target_data_func": target_func,
+                    "use_probability_table": use_probability_table, "common_random_numbers": common_random_numbers,
+                    "optimizer": optimizer, "checkpoint_dir": checkpoint_dir, "adaptive_tolerance": tolerance})
+                  for name, anchor_func, target_func in players]
+    return run_tasks_in_pool(tasks, max_workers=max_workers, seed=seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="原型校準與球員屬性最佳化")
+    parser.add_argument("--workers", type=int, default=1, help="平行工作行程數 (1 = 依序執行)")
+    parser.add_argument("--seed", type=int, default=None, help="根亂數種子 (相同種子可在任意行程數下重現結果)")
+    parser.add_argument("--prob-table", action="store_true", help="最佳化改用預先計算的機率查表 (見 core/probability_table.py)")
+    parser.add_argument("--crn", action="store_true", help="最佳化時同一階段的候選者共用同一組亂數 (共同亂數，所需賽季數較少)")
+    parser.add_argument("--optimizer", choices=list(OPTIMIZER_MODES), default="two-stage",
+                        help="two-stage: 兩階段隨機搜索; surrogate: 代理最佳化 (解析期望值 + Nelder-Mead，蒙地卡羅僅做最終驗證); "
+                             "racing: 逐次減半競賽搜索")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="球員最佳化檢查點目錄 (僅 two-stage)；以相同 --seed 重新執行即從中斷處繼續")
+    parser.add_argument("--batch", action="store_true",
+                        help="所有球員一起以共用評估快取進行兩階段搜索 (重疊的搜索範圍只模擬一次)")
+    parser.add_argument("--tolerance", type=float, nargs="?", const=ADAPTIVE_SIM_TOLERANCE, default=None,
+                        help=f"精度導向模擬: 直接模擬與兩階段搜索的每次評估模擬到信賴區間半寬 <= 此值為止 "
+                             f"(只寫 --tolerance 時為 {ADAPTIVE_SIM_TOLERANCE})")
+    parser.add_argument("--players-file", default=None,
+                        help="要最佳化的球員清單 JSON 檔 (預設為 player_data 中的球員，格式見 load_players_file)")
+    args = parser.parse_args()
+    if args.checkpoint_dir is not None and args.optimizer != "two-stage":
+        parser.error("--checkpoint-dir 僅支援 --optimizer two-stage")
+    if args.batch and (args.optimizer != "two-stage" or args.crn or args.checkpoint_dir is not None):
+        parser.error("--batch 不可與 --optimizer、--crn 或 --checkpoint-dir 一起使用")
+    if args.tolerance is not None and (args.optimizer != "two-stage" or args.crn or args.batch):
+        parser.error("--tolerance 僅支援 --optimizer two-stage，且不可與 --crn 或 --batch 一起使用")
+
+    # 順序：原型校準 → 直接模擬 → 最佳化；--workers 1 時在本行程依序執行
+    run_full_job_parallel(max_workers=args.workers, seed=args.seed, use_probability_table=args.prob_table,
+                          common_random_numbers=args.crn, optimizer=args.optimizer,
+                          checkpoint_dir=args.checkpoint_dir, batch=args.batch, tolerance=args.tolerance,
+                          players=load_players_file(args.players_file) if args.players_file else None)
@@ -1,5 +1,5 @@
 # backend/app/models/simulation_models.py
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 class BatterAttributes(BaseModel):
@@ -10,6 +10,7 @@ class BatterAttributes(BaseModel):
     hit: float = Field(..., example=70.0, description="打者的打擊技巧值 (Hit Tool)")
     eye: float = Field(..., example=70.0, description="打者的選球能力值 (Plate Discipline/Eye)")
     hbp_rate: Optional[float] = Field(0.010, example=0.010, description="球員的觸身球率 (可選，有預設值)")
+    seed: Optional[int] = Field(None, ge=0, example=12345, description="(可選) 亂數種子；提供時相同請求會得到相同結果，便於重現")
     # 未來可以擴展加入投手屬性等
     # pitcher_pow: Optional[float] = Field(None, example=70.0)
 
@@ -18,4 +19,190 @@ class AtBatResult(BaseModel):
     定義後端模擬完一次打席後，回傳給前端的結果。
     """
     outcome: str = Field(..., example="1B", description="打席的最終結果 (例如: HR, 2B, 1B, BB, K, IPO)")
-    probabilities: Optional[Dict[str, float]] = Field(None, description="(可選) 各事件發生的詳細機率，供調試或前端進階處理")
\ No newline at end of file
+    probabilities: Optional[Dict[str, float]] = Field(None, description="(可選) 各事件發生的詳細機率，供調試或前端進階處理")
+
+class AtBatRequest(BaseModel):
+    """
+    批次打席中的一組打者屬性與要模擬的打席數。
+    """
+    pow: float = Field(..., example=70.0, description="打者的力量值 (Power)")
+    hit: float = Field(..., example=70.0, description="打者的打擊技巧值 (Hit Tool)")
+    eye: float = Field(..., example=70.0, description="打者的選球能力值 (Plate Discipline/Eye)")
+    hbp_rate: Optional[float] = Field(0.010, example=0.010, description="球員的觸身球率 (可選，有預設值)")
+    count: int = Field(1, ge=0, example=20, description="此打者要模擬的打席數")
+
+class AtBatBatchRequest(BaseModel):
+    """
+    批次打席請求 (POST /api/v1/simulate_at_bats)：一次送出多組打者屬性，避免每個打席一次 HTTP 往返。
+    """
+    at_bats: List[AtBatRequest] = Field(..., description="打者屬性與打席數清單，結果依相同順序回傳")
+    seed: Optional[int] = Field(None, ge=0, example=12345, description="(可選) 亂數種子；提供時相同請求會得到相同結果")
+    include_probabilities: bool = Field(False, description="是否回傳各組的事件機率")
+
+class AtBatBatchItem(BaseModel):
+    """
+    一組打者屬性的批次打席結果。
+    """
+    outcomes: List[str] = Field(..., example=["1B", "K", "IPO"], description="依序抽出的打席結果 (HR, 2B, 1B, BB, HBP, K, IPO)")
+    probabilities: Optional[Dict[str, float]] = Field(None, description="(可選) 此組屬性的事件機率")
+
+class AtBatBatchResult(BaseModel):
+    """
+    批次打席回應，results 與請求的 at_bats 一一對應。
+    """
+    results: List[AtBatBatchItem]
+
+class GameBatterInput(BaseModel):
+    """
+    比賽打線中的一位打者 (屬性為後端尺度)。
+    """
+    name: str = Field(..., example="Aaron Judge")
+    pow: float = Field(70.0, example=120.0, description="力量值")
+    hit: float = Field(70.0, example=66.0, description="打擊技巧值")
+    eye: float = Field(70.0, example=140.0, description="選球能力值")
+    hbp_rate: Optional[float] = Field(0.010, example=0.010, description="觸身球率")
+    speed: float = Field(5, example=6, description="速度 (1-10，與前端相同；> 5 與 > 7 時可多推進壘包)")
+
+class GamePitcherInput(BaseModel):
+    """
+    比賽中的一位投手。
+    """
+    name: str = Field(..., example="Gerrit Cole")
+    role: Optional[str] = Field(None, example="Starter", description="Starter / Reliever / Closer (省略時依欄位決定)")
+    max_stamina: float = Field(100.0, example=100.0, description="體力上限")
+
+class GameTeamInput(BaseModel):
+    """
+    一支球隊：打線 (依棒次) 與投手群。
+    """
+    name: str = Field(..., example="Yankees")
+    batters: List[GameBatterInput] = Field(..., min_length=1, description="打線，依棒次排列")
+    starter: GamePitcherInput = Field(..., description="先發投手")
+    reliever: Optional[GamePitcherInput] = Field(None, description="(可選) 中繼投手")
+    closer: Optional[GamePitcherInput] = Field(None, description="(可選) 終結者")
+
+class GameRequest(BaseModel):
+    """
+    整場比賽模擬請求 (POST /api/v1/simulate_game)。
+    """
+    away: GameTeamInput
+    home: GameTeamInput
+    num_games: int = Field(1, ge=1, example=1, description="以相同陣容模擬的比賽數")
+    seed: Optional[int] = Field(None, ge=0, example=12345, description="(可選) 亂數種子；提供時相同請求會得到相同結果")
+    include_play_by_play: bool = Field(False, description="是否回傳逐打席紀錄")
+
+class SeriesRequest(BaseModel):
+    """
+    系列賽 / 賽季模擬請求 (POST /api/v1/simulate_series)，結果以 NDJSON 串流回傳。
+    """
+    away: GameTeamInput
+    home: GameTeamInput
+    num_games: int = Field(162, ge=1, example=162, description="比賽數")
+    seed: Optional[int] = Field(None, ge=0, example=12345, description="(可選) 亂數種子；每場比賽的結果只取決於種子與場次，與完成順序無關")
+    include_play_by_play: bool = Field(False, description="是否在每場結果中附上逐打席紀錄")
+
+class GameSessionStart(BaseModel):
+    """
+    WebSocket 逐打席工作階段 (/api/v1/ws/game) 的開賽訊息: {"type": "start", "away": ..., "home": ..., "seed": ...}。
+    """
+    away: GameTeamInput
+    home: GameTeamInput
+    seed: Optional[int] = Field(None, ge=0, example=12345, description="(可選) 亂數種子；提供時整場比賽可重現")
+
+class GameSessionNext(BaseModel):
+    """
+    WebSocket 逐打席工作階段的推進訊息: {"type": "next", "count": n}，伺服器逐一推送 n 個打席 (比賽結束即停止)。
+    """
+    count: int = Field(1, ge=1, example=1, description="要推進的打席數 (長按連續模擬時可一次要求多個)")
+
+class PlayEvent(BaseModel):
+    """
+    一個打席的結果與打席後的局面。
+    """
+    inning: int
+    half: str = Field(..., description="top / bottom")
+    batter: str
+    pitcher: str
+    pitching_change: Optional[str] = Field(None, description="此打席前換上的投手")
+    event: str = Field(..., description="HR, 2B, 1B, BB, HBP, K, IPO")
+    runs: int
+    rbi: int
+    outs: int = Field(..., description="打席後的出局數 (換局後為 0)")
+    bases: List[Optional[str]] = Field(..., description="打席後一、二、三壘上的跑者")
+    away_runs: int
+    home_runs: int
+    game_over: bool
+
+class TeamGameResult(BaseModel):
+    """
+    一支球隊的比賽結果與個人成績。
+    """
+    name: str
+    runs: int
+    hits: int
+    line_score: List[int] = Field(..., description="每半局得分；主隊未進行的下半局不列出")
+    batting: List[Dict[str, Any]] = Field(..., description="打者成績 (PA, AB, H, HR, 2B, 1B, BB, HBP, K, R, RBI)")
+    pitching: List[Dict[str, Any]] = Field(..., description="登板投手成績 (BF, OUTS, K, BB, H, HR, R)")
+
+class GameResult(BaseModel):
+    """
+    一場比賽的結果。
+    """
+    away: TeamGameResult
+    home: TeamGameResult
+    winner: Optional[str] = Field(None, description="away / home；和局為 null")
+    innings: int
+    game_over: bool
+    plays: Optional[List[PlayEvent]] = Field(None, description="(可選) 逐打席紀錄")
+
+class GameSimulationResult(BaseModel):
+    """
+    整場比賽模擬回應：各場結果與勝負統計。
+    """
+    games: List[GameResult]
+    away_wins: int
+    home_wins: int
+    ties: int
+
+class ProbabilityCacheStats(BaseModel):
+    """
+    事件機率快取的統計資料 (GET /api/v1/probability_cache_stats)。
+    """
+    model_version: str = Field(..., description="快取鍵使用的模型參數版本")
+    size: int = Field(..., description="目前快取的項目數")
+    max_entries: int = Field(..., description="快取上限 (LRU 淘汰)")
+    hits: int = Field(..., description="命中次數")
+    misses: int = Field(..., description="未命中次數 (需完整計算模型)")
+    evictions: int = Field(..., description="因超過上限而淘汰的項目數")
+    hit_rate: float = Field(..., description="命中率 hits / (hits + misses)")
+
+class ModelParametersInfo(BaseModel):
+    """
+    目前使用中的模型參數組 (GET /api/v1/model_parameters)。
+    """
+    name: str = Field(..., description="參數組名稱")
+    content_hash: str = Field(..., description="參數內容的 SHA-256 雜湊；快取與查表以此區分版本")
+    version: str = Field(..., description="快取鍵使用的版本字串")
+    uses_table: bool = Field(..., description="是否使用預先計算的機率查表")
+    parameters: Dict[str, Any] = Field(..., description="全部模型參數")
+
+class TargetLine(BaseModel):
+    """
+    反推屬性的目標數據 (POST /api/v1/invert_target_line)，鍵與 core/player_data.py 相同。
+    有 PA_target 時優先使用計數；否則以比率 (BB_rate, K_rate, OBP/BA, SLG) 推算。
+    """
+    target_counts: Dict[str, float] = Field(default_factory=dict, example={"PA_target": 600, "HR_target": 30, "BB_target": 60, "K_target": 120, "H_target": 150, "_2B_target": 30, "AB_target": 530}, description="目標計數 (PA_target, HR_target, BB_target, K_target, H_target, _2B_target, AB_target ...)")
+    target_ratios: Dict[str, float] = Field(default_factory=dict, example={"BA": 0.283, "OBP": 0.360, "SLG": 0.500}, description="目標比率 (BA, OBP, SLG, K_rate, BB_rate ...)")
+    hbp_rate: Optional[float] = Field(0.010, example=0.010, description="球員的觸身球率")
+
+class InvertedAttributes(BaseModel):
+    """
+    解析反推的屬性與診斷資料。
+    """
+    pow: float = Field(..., description="反推的力量值")
+    hit: float = Field(..., description="反推的打擊技巧值")
+    eye: float = Field(..., description="反推的選球能力值")
+    iterations: int = Field(..., description="HR / 2B 耦合項的定點迭代次數")
+    converged: bool = Field(..., description="定點迭代是否收斂")
+    target_rates: Dict[str, float] = Field(..., description="目標數據換算的每打席比率")
+    model_rates: Dict[str, float] = Field(..., description="反推屬性下模型的每打席事件機率 (K 率不另外擬合，可比較差異)")
@@ -6,11 +6,14 @@ import time # To track execution time
 import os # For creating directories
 
 # Assuming your project files are in the same directory or accessible via PYTHONPATH
-from backend.app.core.probability_model import get_pa_event_probabilities
-from backend.app.core.simulation_engine import simulate_season, calculate_sim_stats
+from backend.app.core.probability_model import get_pa_event_probabilities_array
+from backend.app.core.simulation_engine import simulate_seasons
+from backend.app.core.season_batch import SeasonBatch
+from backend.app.core.rng import make_rng
 from backend.app.core.game_constants import (
     NUM_PA_PER_SEASON_ARCHETYPE,
-    LEAGUE_AVG_HBP_RATE
+    LEAGUE_AVG_HBP_RATE,
+    PA_EVENT_TYPES
 )
 
 # --- Configuration ---
@@ -21,6 +24,7 @@ NUM_SEASONS_PER_POINT = 100 # Reduced for faster chart generation, increase for
 NUM_PA_PER_SEASON = NUM_PA_PER_SEASON_ARCHETYPE
 PLAYER_HBP_RATE = LEAGUE_AVG_HBP_RATE
 REPORT_DIR = "reports" # Directory to save generated charts
+REPORT_RNG_SEED = 20240601 # Fixed seed so regenerated charts are identical; None for fresh randomness
 
 # --- Helper Functions ---
 
@@ -30,30 +34,26 @@ def ensure_report_dir_exists():
         os.makedirs(REPORT_DIR)
         print(f"已創建資料夾: {REPORT_DIR}")
 
-def run_simulations_for_attribute_point(pow_val, hit_val, eye_val):
+def run_simulations_for_attribute_point(event_probs, rng=None):
     """
-    Runs simulations for a single combination of POW, HIT, EYE
+    Runs simulations for a single combination of POW, HIT, EYE (given as its event probabilities)
     and returns the average calculated stats.
     """
-    event_probs = get_pa_event_probabilities(pow_val, hit_val, eye_val, PLAYER_HBP_RATE)
-    
-    all_season_stats_list = []
-    for _ in range(NUM_SEASONS_PER_POINT):
-        single_season_outcomes = simulate_season(NUM_PA_PER_SEASON, event_probs)
-        all_season_stats_list.append(calculate_sim_stats(single_season_outcomes))
+    season_batch = SeasonBatch(simulate_seasons(NUM_SEASONS_PER_POINT, NUM_PA_PER_SEASON, event_probs, rng))
     
     avg_stats = {
-        stat_key: sum(s[stat_key] for s in all_season_stats_list) / NUM_SEASONS_PER_POINT
+        stat_key: season_batch.mean(stat_key)
         for stat_key in ["BA", "OBP", "SLG", "OPS", "K_rate", "BB_rate"]
     }
     # Calculate HR count specifically for HR plot
-    avg_stats["HR_count"] = sum(s["HR_count"] for s in all_season_stats_list) / NUM_SEASONS_PER_POINT
+    avg_stats["HR_count"] = season_batch.mean("HR_count")
     return avg_stats
 
-def generate_impact_data(varying_attr_name):
+def generate_impact_data(varying_attr_name, rng=None):
     """
     Generates data for how KPIs change as one attribute varies.
     """
+    rng = make_rng(rng)
     print(f"正在為變動屬性生成數據: {varying_attr_name} (固定其他屬性為 {FIXED_ATTRIBUTE_VALUE})...")
     attribute_values = list(range(VARYING_ATTRIBUTE_MIN, VARYING_ATTRIBUTE_MAX + 1))
     results = {
@@ -65,16 +65,15 @@ def generate_impact_data(varying_attr_name):
     total_points = len(attribute_values)
     start_time = time.time()
 
+    # All points' event probabilities in one vectorized call
+    varying_values = np.array(attribute_values, dtype=np.float64)
+    attributes = {name: varying_values if name == varying_attr_name else FIXED_ATTRIBUTE_VALUE
+                  for name in ("POW", "HIT", "EYE")}
+    prob_matrix = get_pa_event_probabilities_array(attributes["POW"], attributes["HIT"], attributes["EYE"], PLAYER_HBP_RATE)
+
     for i, val in enumerate(attribute_values):
-        current_pow, current_hit, current_eye = 0, 0, 0
-        if varying_attr_name == "POW":
-            current_pow, current_hit, current_eye = val, FIXED_ATTRIBUTE_VALUE, FIXED_ATTRIBUTE_VALUE
-        elif varying_attr_name == "HIT":
-            current_pow, current_hit, current_eye = FIXED_ATTRIBUTE_VALUE, val, FIXED_ATTRIBUTE_VALUE
-        elif varying_attr_name == "EYE":
-            current_pow, current_hit, current_eye = FIXED_ATTRIBUTE_VALUE, FIXED_ATTRIBUTE_VALUE, val
-        
-        avg_sim_stats = run_simulations_for_attribute_point(current_pow, current_hit, current_eye)
+        event_probs = dict(zip(PA_EVENT_TYPES, prob_matrix[i]))
+        avg_sim_stats = run_simulations_for_attribute_point(event_probs, rng)
         
         results["HR_count"].append(avg_sim_stats["HR_count"])
         results["BA"].append(avg_sim_stats["BA"])
@@ -187,17 +186,18 @@ if __name__ == "__main__":
 
     # 確保報告資料夾存在 (在繪圖前再次確認，雖然 plot_impact_charts 內部也會檢查)
     ensure_report_dir_exists()
+    report_rng = make_rng(REPORT_RNG_SEED)
     
     # 1. POW 變化 (HIT, EYE 固定)
-    pow_impact_data = generate_impact_data("POW")
+    pow_impact_data = generate_impact_data("POW", report_rng)
     plot_impact_charts("POW", pow_impact_data, FIXED_ATTRIBUTE_VALUE, "pow_impact")
 
     # 2. HIT 變化 (POW, EYE 固定)
-    hit_impact_data = generate_impact_data("HIT")
+    hit_impact_data = generate_impact_data("HIT", report_rng)
     plot_impact_charts("HIT", hit_impact_data, FIXED_ATTRIBUTE_VALUE, "hit_impact")
 
     # 3. EYE 變化 (POW, HIT 固定)
-    eye_impact_data = generate_impact_data("EYE")
+    eye_impact_data = generate_impact_data("EYE", report_rng)
     plot_impact_charts("EYE", eye_impact_data, FIXED_ATTRIBUTE_VALUE, "eye_impact")
 
     print("\n所有圖表生成完畢。")
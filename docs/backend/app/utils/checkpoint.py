@@ -0,0 +1,41 @@
+# checkpoint.py
+import os
+import pickle
+import tempfile
+
+# Bumped whenever the layout of a saved state changes; older files are rejected
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+def save_checkpoint(path, state):
+    """
+    Pickles `state` to `path` atomically: the data goes to a temporary file in the same
+    directory, is fsynced, and then replaces `path` in one rename. A crash or preemption
+    mid-write leaves the previous checkpoint intact.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as checkpoint_file:
+            pickle.dump({"format_version": CHECKPOINT_FORMAT_VERSION, "state": state},
+                        checkpoint_file, protocol=pickle.HIGHEST_PROTOCOL)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def load_checkpoint(path):
+    """Returns the state saved by save_checkpoint, or None when `path` does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as checkpoint_file:
+        payload = pickle.load(checkpoint_file)
+    if payload.get("format_version") != CHECKPOINT_FORMAT_VERSION:
+        raise ValueError(f"{path} has checkpoint format {payload.get('format_version')}, "
+                         f"expected {CHECKPOINT_FORMAT_VERSION}; delete it to start over")
+    return payload["state"]
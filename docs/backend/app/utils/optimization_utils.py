@@ -1,16 +1,35 @@
 # optimization_utils.py
 import math
-import random
 import time
 import heapq
+import itertools
+from statistics import NormalDist
+
+import numpy as np
 
 from backend.app.core.game_constants import (
     NUM_ITERATIONS_STAGE_ONE, NUM_SEASONS_PER_EVAL_STAGE_ONE,
     TOP_N_CANDIDATES_FROM_STAGE_ONE,
     NUM_SEASONS_PER_EVAL_STAGE_TWO,
     ERROR_WEIGHTS_STAGE_ONE, DEVIATION_PENALTY_WEIGHT_STAGE_ONE,
-    ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
+    ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO,
+    ADAPTIVE_SIM_MAX_SEASONS,
+    CRN_SEASONS_PER_EVAL_STAGE_ONE, CRN_SEASONS_PER_EVAL_STAGE_TWO,
+    OPTIMIZER_CANDIDATE_CHUNK_SIZE, OPTIMIZER_CHECKPOINT_INTERVAL,
+    RACING_INITIAL_SEASONS, RACING_MAX_SEASONS, RACING_CONFIDENCE,
+    NUM_SEASONS_PER_EVAL_STAGE_THREE,
+    SURROGATE_START_OFFSET, SURROGATE_INITIAL_STEP, SURROGATE_MAX_EVALUATIONS,
+    SURROGATE_ERROR_TOLERANCE, SURROGATE_ATTRIBUTE_TOLERANCE
+)
+from backend.app.core.inverse_model import invert_target_line
+from backend.app.core.parameter_set import get_active_parameter_set
+from backend.app.core.probability_model import clamp_hbp_rate
+from backend.app.core.simulation_engine import (
+    simulate_until_precise, CommonRandomSeasons, expected_sim_stats, derive_season_counts
 )
+from backend.app.core.season_batch import SeasonBatch, SEASON_STAT_KEYS
+from backend.app.core.rng import make_rng, spawn_seed_sequences
+from backend.app.utils.checkpoint import save_checkpoint, load_checkpoint
 
 # calculate_error_with_anchor 函數與上一版本相同，此處省略
 def calculate_error_with_anchor(sim_stats,
@@ -62,9 +81,10 @@ def calculate_error_with_anchor(sim_stats,
     return total_error
 
 
-def get_random_even_integer_in_range(low, high):
+def get_random_even_integer_in_range(low, high, rng=None):
     """
     Generates a random even integer within the specified float range [low, high].
+    rng: np.random.Generator (see core/rng.py); None draws from fresh OS entropy.
     """
     min_val = math.ceil(low)
     max_val = math.floor(high)
@@ -91,8 +111,67 @@ def get_random_even_integer_in_range(low, high):
         if max_val % 2 == 0 and max_val >= min_val : return max_val
         return start_even if start_even <= max_val else end_even # 盡可能返回一個值
 
-    # random.randrange 的停止點是獨占的，所以 end_even + 2
-    return random.randrange(start_even, end_even + 2, 2)
+    # 在 start_even..end_even 的偶數中均勻抽取
+    rng = make_rng(rng)
+    return start_even + 2 * int(rng.integers(0, (end_even - start_even) // 2 + 1))
+
+
+def _evaluate_candidate_chunk(chunk_args):
+    """
+    Worker: simulates one chunk of candidates and returns [(mean stats, seasons used), ...] in chunk order.
+    Each candidate carries its own SeedSequence (or shares common_seasons), so the result does not
+    depend on how candidates are grouped into chunks or which process runs them.
+    """
+    (num_seasons, target_pa, season_simulator_func, stats_calculator_func,
+     adaptive_tolerance, common_seasons, candidates) = chunk_args
+    results = []
+    for event_probs, seed_sequence in candidates:
+        if common_seasons is not None:
+            results.append((stats_calculator_func(common_seasons.event_counts(event_probs)).mean(), num_seasons))
+        elif adaptive_tolerance is not None:
+            season_stats, seasons_used, _ = simulate_until_precise(
+                target_pa, event_probs, adaptive_tolerance, rng=np.random.default_rng(seed_sequence),
+                season_simulator_func=season_simulator_func, stats_calculator_func=stats_calculator_func
+            )
+            results.append((season_stats.mean(), seasons_used))
+        else:
+            season_counts = season_simulator_func(num_seasons, target_pa, event_probs, rng=np.random.default_rng(seed_sequence))
+            results.append((stats_calculator_func(season_counts).mean(), num_seasons))
+    return results
+
+
+def get_even_integers_in_range(low, high):
+    """
+    All even integers in [low, high], i.e. the values get_random_even_integer_in_range draws from.
+    For a range without an even integer, returns the single fallback value that function returns.
+    """
+    min_val = math.ceil(low)
+    max_val = math.floor(high)
+    start_even = min_val if min_val % 2 == 0 else min_val + 1
+    end_even = max_val if max_val % 2 == 0 else max_val - 1
+    if min_val > max_val or start_even > end_even:
+        return [get_random_even_integer_in_range(low, high)] # 退化範圍不會用到亂數
+    return list(range(start_even, end_even + 1, 2))
+
+
+def sample_distinct_even_triples(pow_search_range, hit_search_range, eye_search_range, count, rng=None):
+    """
+    Draws up to `count` distinct (POW, HIT, EYE) even-integer triples from the search ranges.
+    When the grid holds no more than `count` triples, every triple is returned once, in grid order;
+    otherwise `count` triples are drawn uniformly without replacement.
+    Returns (triples, exhaustive).
+    """
+    axes = [get_even_integers_in_range(low, high) for low, high in (pow_search_range, hit_search_range, eye_search_range)]
+    grid_shape = tuple(len(axis_values) for axis_values in axes)
+    grid_size = math.prod(grid_shape)
+    if grid_size <= count:
+        return list(itertools.product(*axes)), True
+    rng = make_rng(rng)
+    flat_indices = rng.choice(grid_size, size=count, replace=False)
+    return [
+        tuple(axis_values[index] for axis_values, index in zip(axes, grid_index))
+        for grid_index in zip(*np.unravel_index(flat_indices, grid_shape))
+    ], False
 
 
 def find_best_attributes_two_stage_search(
@@ -103,128 +182,637 @@ def find_best_attributes_two_stage_search(
         target_ratios,
         player_hbp_rate,
         prob_calculator_func,
-        season_simulator_func,
-        stats_calculator_func,
+        season_simulator_func, # 批次模擬: (num_seasons, num_pa, probabilities, rng=...) -> 事件計數陣列 (需可 pickle)
+        stats_calculator_func, # 事件計數陣列 -> SeasonBatch (提供 .mean()，需可 pickle)
         pow_search_range,
         hit_search_range,
-        eye_search_range
+        eye_search_range,
+        adaptive_tolerance=None, # 設定後改用精度導向模擬: 信賴區間半寬達標即停止 (見 simulate_until_precise)
+        rng=None, # np.random.Generator 或種子；相同種子可逐位元重現整個搜索
+        common_random_numbers=False, # 同一階段所有候選者共用同一組賽季亂數 (見 CommonRandomSeasons)，賽季數改用 CRN_SEASONS_PER_EVAL_*
+        executor=None, # concurrent.futures 執行器 (例如行程池)；None 則在本行程依序評估
+        chunk_size=OPTIMIZER_CANDIDATE_CHUNK_SIZE, # 每個平行工作評估的候選者數
+        checkpoint_path=None, # 設定後定期寫入檢查點，檔案已存在時從中斷處繼續 (見 utils/checkpoint.py)
+        model_version=None # prob_calculator_func 的模型版本 (例如 ProbabilityCache.model_version)；寫入檢查點指紋，換模型後不會續用舊檢查點
     ):
-    candidate_heap = []
-
-    print(f"\n===== {player_name}: 最佳化階段一 (廣泛探索 - 偶數取樣) =====")
-    print(f"共 {NUM_ITERATIONS_STAGE_ONE} 次嘗試, 每次模擬 {NUM_SEASONS_PER_EVAL_STAGE_ONE} 個賽季。")
-    print(f"誤差權重 (階段一): {ERROR_WEIGHTS_STAGE_ONE}")
-    print(f"錨點懲罰權重 (階段一): {DEVIATION_PENALTY_WEIGHT_STAGE_ONE}")
-
-    stage_one_start_time = time.time()
-    for i in range(NUM_ITERATIONS_STAGE_ONE):
-        # --- 修改點：階段一使用偶數整數取樣 ---
-        current_pow = get_random_even_integer_in_range(pow_search_range[0], pow_search_range[1])
-        current_hit = get_random_even_integer_in_range(hit_search_range[0], hit_search_range[1])
-        current_eye = get_random_even_integer_in_range(eye_search_range[0], eye_search_range[1])
-        # --- 修改結束 ---
-        current_trial_abilities = {"POW": float(current_pow), "HIT": float(current_hit), "EYE": float(current_eye)} # 確保是浮點數
-
-        current_event_probs = prob_calculator_func(
-            current_trial_abilities["POW"], current_trial_abilities["HIT"], current_trial_abilities["EYE"], player_hbp_rate
+    # 候選者先依序抽出，每個候選者再由 rng 衍生獨立亂數串流 (或共用 CRN 賽季)，
+    # 因此結果、堆積選擇與輸出與 executor、chunk_size 無關。
+    # 搜索狀態 (階段、候選者與其亂數串流、堆積、已評估數、rng 狀態) 都在 search_state 中，即檢查點內容；
+    # rng 之後的所有亂數都由其 bit_generator 狀態決定，因此從檢查點恢復的結果與未中斷時逐位元相同。
+    if common_random_numbers and adaptive_tolerance is not None:
+        raise ValueError("common_random_numbers 與 adaptive_tolerance 不可同時使用")
+    rng = make_rng(rng)
+    if common_random_numbers:
+        stage_num_seasons_config = {1: CRN_SEASONS_PER_EVAL_STAGE_ONE, 2: CRN_SEASONS_PER_EVAL_STAGE_TWO}
+    else:
+        stage_num_seasons_config = {1: NUM_SEASONS_PER_EVAL_STAGE_ONE, 2: NUM_SEASONS_PER_EVAL_STAGE_TWO}
+    search_fingerprint = {
+        "model_version": model_version,
+        "player_name": player_name, "anchor_abilities": dict(anchor_abilities), "target_pa": target_pa,
+        "target_counts": dict(target_counts), "target_ratios": dict(target_ratios), "player_hbp_rate": player_hbp_rate,
+        "search_ranges": [tuple(pow_search_range), tuple(hit_search_range), tuple(eye_search_range)],
+        "adaptive_tolerance": adaptive_tolerance, "common_random_numbers": common_random_numbers,
+        "stage_num_seasons": stage_num_seasons_config, "num_iterations_stage_one": NUM_ITERATIONS_STAGE_ONE,
+        "top_n_candidates": TOP_N_CANDIDATES_FROM_STAGE_ONE,
+    }
+
+    def start_stage(stage, candidate_abilities_list):
+        # 為一個階段抽取所需的亂數 (每個候選者的串流或 CRN 賽季)，並從第 0 個候選者開始
+        search_state["stage"] = stage
+        search_state["candidates"] = candidate_abilities_list
+        search_state["next_index"] = 0
+        if common_random_numbers: # 每階段抽一次，該階段所有候選者共用
+            search_state["common_seasons"] = CommonRandomSeasons(stage_num_seasons_config[stage], target_pa, rng)
+            search_state["candidate_seeds"] = [None] * len(candidate_abilities_list)
+        else:
+            search_state["common_seasons"] = None
+            search_state["candidate_seeds"] = spawn_seed_sequences(rng, len(candidate_abilities_list))
+
+    def save_search_state():
+        if checkpoint_path is not None:
+            search_state["rng_state"] = rng.bit_generator.state
+            save_checkpoint(checkpoint_path, search_state)
+
+    def evaluate_candidates(stage):
+        # 自 next_index 起依候選者順序逐一產生平均統計量；機率在本行程計算 (prob_calculator_func 可能含快取與鎖)
+        first_index = search_state["next_index"]
+        event_probs_list = [
+            prob_calculator_func(abilities["POW"], abilities["HIT"], abilities["EYE"], player_hbp_rate)
+            for abilities in search_state["candidates"][first_index:]
+        ]
+        candidates = list(zip(event_probs_list, search_state["candidate_seeds"][first_index:]))
+        chunk_args = [
+            (stage_num_seasons_config[stage], target_pa, season_simulator_func, stats_calculator_func,
+             adaptive_tolerance, search_state["common_seasons"], candidates[chunk_start:chunk_start + chunk_size])
+            for chunk_start in range(0, len(candidates), chunk_size)
+        ]
+        mapper = executor.map if executor is not None else map
+        for chunk_results in mapper(_evaluate_candidate_chunk, chunk_args): # map 保持原順序
+            for mean_stats, seasons_used in chunk_results:
+                search_state["stage_seasons_used"][stage] += seasons_used
+                yield mean_stats
+
+    def run_stage(stage, process_result):
+        # 依序處理候選者結果；每 OPTIMIZER_CHECKPOINT_INTERVAL 個與中斷 (Ctrl-C) 時寫入檢查點
+        try:
+            for mean_stats in evaluate_candidates(stage):
+                i = search_state["next_index"]
+                process_result(i, search_state["candidates"][i], mean_stats)
+                search_state["next_index"] = i + 1
+                if (i + 1) % OPTIMIZER_CHECKPOINT_INTERVAL == 0:
+                    save_search_state()
+        except KeyboardInterrupt:
+            save_search_state()
+            if checkpoint_path is not None:
+                print(f"\n已中斷，檢查點寫入 {checkpoint_path} (階段{stage}，已完成 {search_state['next_index']}/{len(search_state['candidates'])})。")
+            raise
+
+    search_state = load_checkpoint(checkpoint_path) if checkpoint_path is not None else None
+    if search_state is not None:
+        if search_state["fingerprint"] != search_fingerprint:
+            raise ValueError(f"檢查點 {checkpoint_path} 的搜索設定與本次不同；請刪除檔案後重新開始")
+        rng.bit_generator.state = search_state["rng_state"]
+        if search_state["stage"] == "done":
+            print(f"\n{player_name}: 檢查點 {checkpoint_path} 已記錄完成的搜索結果，略過搜索。")
+        else:
+            print(f"\n{player_name}: 自檢查點 {checkpoint_path} 繼續 (階段{search_state['stage']}，"
+                  f"已完成 {search_state['next_index']}/{len(search_state['candidates'])})。")
+    else:
+        # --- 階段一使用偶數整數取樣：不重放已抽過的組合，格點夠小時直接窮舉 ---
+        stage_one_triples, stage_one_exhaustive = sample_distinct_even_triples(
+            pow_search_range, hit_search_range, eye_search_range, NUM_ITERATIONS_STAGE_ONE, rng
         )
-        
-        all_season_sim_stats_list_s1 = []
-        for _ in range(NUM_SEASONS_PER_EVAL_STAGE_ONE):
-            ss_outcomes = season_simulator_func(target_pa, current_event_probs)
-            all_season_sim_stats_list_s1.append(stats_calculator_func(ss_outcomes))
-        
-        avg_sim_ratios_s1 = {
-            stat: sum(s[stat] for s in all_season_sim_stats_list_s1) / NUM_SEASONS_PER_EVAL_STAGE_ONE
-            for stat in ["BA", "OBP", "SLG", "K_rate", "BB_rate", "OPS"]
-        }
-        avg_sim_counts_s1 = {
-            count_stat: sum(s[count_stat_key] for s in all_season_sim_stats_list_s1) / NUM_SEASONS_PER_EVAL_STAGE_ONE
-            for count_stat, count_stat_key in [
-                ("HR_count", "HR_count"), ("BB_count", "BB_count"), ("K_count", "K_count")
-            ]
+        search_state = {
+            "fingerprint": search_fingerprint,
+            "stage_one_exhaustive": stage_one_exhaustive,
+            "candidate_heap": [],
+            "stage_seasons_used": {1: 0, 2: 0},
+            "best": ({"POW": anchor_abilities['POW'], "HIT": anchor_abilities['HIT'], "EYE": anchor_abilities['EYE']},
+                     float('inf')),
         }
-        sim_stats_for_error_s1 = {**avg_sim_ratios_s1, **avg_sim_counts_s1}
+        start_stage(1, [
+            {"POW": float(current_pow), "HIT": float(current_hit), "EYE": float(current_eye)} # 確保是浮點數
+            for current_pow, current_hit, current_eye in stage_one_triples
+        ])
+    candidate_heap = search_state["candidate_heap"]
+    stage_seasons_used = search_state["stage_seasons_used"]
 
-        current_total_error_s1 = calculate_error_with_anchor(
-            sim_stats_for_error_s1, target_ratios, target_counts,
-            current_trial_abilities, anchor_abilities,
-            ERROR_WEIGHTS_STAGE_ONE, DEVIATION_PENALTY_WEIGHT_STAGE_ONE
-        )
+    if search_state["stage"] == 1:
+        num_stage_one_trials = len(search_state["candidates"])
+        print(f"\n===== {player_name}: 最佳化階段一 (廣泛探索 - 偶數取樣) =====")
+        if search_state["stage_one_exhaustive"]:
+            print(f"搜索範圍內只有 {num_stage_one_trials} 個偶數組合，逐一窮舉。")
+        else:
+            print(f"自搜索範圍內的偶數組合中抽取 {num_stage_one_trials} 個不重複組合。")
+        if adaptive_tolerance is not None:
+            print(f"共 {num_stage_one_trials} 次嘗試, 每次模擬至信賴區間半寬 <= {adaptive_tolerance} (上限 {ADAPTIVE_SIM_MAX_SEASONS} 個賽季)。")
+        else:
+            print(f"共 {num_stage_one_trials} 次嘗試, 每次模擬 {stage_num_seasons_config[1]} 個賽季"
+                  f"{' (共同亂數)' if common_random_numbers else ''}。")
+        print(f"誤差權重 (階段一): {ERROR_WEIGHTS_STAGE_ONE}")
+        print(f"錨點懲罰權重 (階段一): {DEVIATION_PENALTY_WEIGHT_STAGE_ONE}")
 
-        if len(candidate_heap) < TOP_N_CANDIDATES_FROM_STAGE_ONE:
-            heapq.heappush(candidate_heap, (-current_total_error_s1, current_trial_abilities))
-        elif -current_total_error_s1 > candidate_heap[0][0]:
-            heapq.heapreplace(candidate_heap, (-current_total_error_s1, current_trial_abilities))
+        def process_stage_one_result(i, current_trial_abilities, sim_stats_for_error_s1):
+            current_total_error_s1 = calculate_error_with_anchor(
+                sim_stats_for_error_s1, target_ratios, target_counts,
+                current_trial_abilities, anchor_abilities,
+                ERROR_WEIGHTS_STAGE_ONE, DEVIATION_PENALTY_WEIGHT_STAGE_ONE
+            )
 
-        if (i + 1) % (NUM_ITERATIONS_STAGE_ONE // 20 or 1) == 0:
-            current_best_error_in_heap = -max(item[0] for item in candidate_heap) if candidate_heap else float('inf')
-            print(f"  階段一迭代 {i+1}/{NUM_ITERATIONS_STAGE_ONE}: 當前堆中最佳誤差 {current_best_error_in_heap:.4f}")
+            # 以候選者序號打破誤差相同的平手，堆積內容只取決於候選者順序
+            heap_entry = (-current_total_error_s1, i, current_trial_abilities)
+            if len(candidate_heap) < TOP_N_CANDIDATES_FROM_STAGE_ONE:
+                heapq.heappush(candidate_heap, heap_entry)
+            elif heap_entry[:2] > candidate_heap[0][:2]:
+                heapq.heapreplace(candidate_heap, heap_entry)
 
-    stage_one_duration = time.time() - stage_one_start_time
-    print(f"階段一完成。耗時: {stage_one_duration:.2f} 秒。篩選出 {len(candidate_heap)} 個候選者。")
+            if (i + 1) % (num_stage_one_trials // 20 or 1) == 0:
+                current_best_error_in_heap = -max(item[0] for item in candidate_heap) if candidate_heap else float('inf')
+                print(f"  階段一迭代 {i+1}/{num_stage_one_trials}: 當前堆中最佳誤差 {current_best_error_in_heap:.4f}")
 
-    top_candidates_abilities = [item[1] for item in sorted(candidate_heap, key=lambda x: x[0], reverse=True)]
+        stage_one_start_time = time.time()
+        run_stage(1, process_stage_one_result)
+        stage_one_duration = time.time() - stage_one_start_time
+        print(f"階段一完成。耗時: {stage_one_duration:.2f} 秒。篩選出 {len(candidate_heap)} 個候選者。")
+        print(f"階段一共模擬 {stage_seasons_used[1]} 個賽季 (平均每次嘗試 {stage_seasons_used[1] / max(1, num_stage_one_trials):.1f} 個)。")
 
-    print(f"\n===== {player_name}: 最佳化階段二 (精細評估) =====")
-    print(f"對 {len(top_candidates_abilities)} 個候選者進行評估, 每次模擬 {NUM_SEASONS_PER_EVAL_STAGE_TWO} 個賽季。")
-    print(f"誤差權重 (階段二): {ERROR_WEIGHTS_STAGE_TWO}")
-    print(f"錨點懲罰權重 (階段二): {DEVIATION_PENALTY_WEIGHT_STAGE_TWO}")
-    
-    best_pow_final = anchor_abilities['POW']
-    best_hit_final = anchor_abilities['HIT']
-    best_eye_final = anchor_abilities['EYE']
-    min_total_error_final = float('inf')
-    
-    stage_two_start_time = time.time()
-    for i, current_trial_abilities_s2 in enumerate(top_candidates_abilities):
-        current_pow_s2 = current_trial_abilities_s2["POW"]
-        current_hit_s2 = current_trial_abilities_s2["HIT"]
-        current_eye_s2 = current_trial_abilities_s2["EYE"]
-
-        current_event_probs_s2 = prob_calculator_func(
-            current_pow_s2, current_hit_s2, current_eye_s2, player_hbp_rate
-        )
+        start_stage(2, [item[2] for item in sorted(candidate_heap, key=lambda x: x[:2], reverse=True)])
+        save_search_state()
 
-        all_season_sim_stats_list_s2 = []
-        for _ in range(NUM_SEASONS_PER_EVAL_STAGE_TWO):
-            ss_outcomes_s2 = season_simulator_func(target_pa, current_event_probs_s2)
-            all_season_sim_stats_list_s2.append(stats_calculator_func(ss_outcomes_s2))
+    if search_state["stage"] == 2:
+        top_candidates_abilities = search_state["candidates"]
+        print(f"\n===== {player_name}: 最佳化階段二 (精細評估) =====")
+        if adaptive_tolerance is not None:
+            print(f"對 {len(top_candidates_abilities)} 個候選者進行評估, 每次模擬至信賴區間半寬 <= {adaptive_tolerance}。")
+        else:
+            print(f"對 {len(top_candidates_abilities)} 個候選者進行評估, 每次模擬 {stage_num_seasons_config[2]} 個賽季"
+                  f"{' (共同亂數)' if common_random_numbers else ''}。")
+        print(f"誤差權重 (階段二): {ERROR_WEIGHTS_STAGE_TWO}")
+        print(f"錨點懲罰權重 (階段二): {DEVIATION_PENALTY_WEIGHT_STAGE_TWO}")
 
-        avg_sim_ratios_s2 = {
-            stat: sum(s[stat] for s in all_season_sim_stats_list_s2) / NUM_SEASONS_PER_EVAL_STAGE_TWO
-            for stat in ["BA", "OBP", "SLG", "K_rate", "BB_rate", "OPS"]
-        }
-        avg_sim_counts_s2 = {
-            count_stat: sum(s[count_stat_key] for s in all_season_sim_stats_list_s2) / NUM_SEASONS_PER_EVAL_STAGE_TWO
-            for count_stat, count_stat_key in [
-                ("HR_count", "HR_count"), ("BB_count", "BB_count"), ("K_count", "K_count")
-            ]
-        }
-        sim_stats_for_error_s2 = {**avg_sim_ratios_s2, **avg_sim_counts_s2}
+        def process_stage_two_result(i, current_trial_abilities_s2, sim_stats_for_error_s2):
+            current_pow_s2 = current_trial_abilities_s2["POW"]
+            current_hit_s2 = current_trial_abilities_s2["HIT"]
+            current_eye_s2 = current_trial_abilities_s2["EYE"]
 
-        current_total_error_s2 = calculate_error_with_anchor(
-            sim_stats_for_error_s2, target_ratios, target_counts,
-            current_trial_abilities_s2, anchor_abilities,
-            ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
-        )
+            current_total_error_s2 = calculate_error_with_anchor(
+                sim_stats_for_error_s2, target_ratios, target_counts,
+                current_trial_abilities_s2, anchor_abilities,
+                ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
+            )
+
+            if current_total_error_s2 < search_state["best"][1]:
+                search_state["best"] = (dict(current_trial_abilities_s2), current_total_error_s2)
+                print(f"  階段二迭代 {i+1}/{len(top_candidates_abilities)}: 新的最佳誤差 {current_total_error_s2:.4f} (POW:{current_pow_s2:.2f}, HIT:{current_hit_s2:.2f}, EYE:{current_eye_s2:.2f})")
+            elif (i + 1) % (len(top_candidates_abilities) // 10 or 1) == 0 :
+                 print(f"  階段二迭代 {i+1}/{len(top_candidates_abilities)}: 當前誤差 {current_total_error_s2:.4f} (POW:{current_pow_s2:.2f}, HIT:{current_hit_s2:.2f}, EYE:{current_eye_s2:.2f})")
 
-        if current_total_error_s2 < min_total_error_final:
-            min_total_error_final = current_total_error_s2
-            best_pow_final = current_pow_s2
-            best_hit_final = current_hit_s2
-            best_eye_final = current_eye_s2
-            print(f"  階段二迭代 {i+1}/{len(top_candidates_abilities)}: 新的最佳誤差 {min_total_error_final:.4f} (POW:{best_pow_final:.2f}, HIT:{best_hit_final:.2f}, EYE:{best_eye_final:.2f})")
-        elif (i + 1) % (len(top_candidates_abilities) // 10 or 1) == 0 :
-             print(f"  階段二迭代 {i+1}/{len(top_candidates_abilities)}: 當前誤差 {current_total_error_s2:.4f} (POW:{current_pow_s2:.2f}, HIT:{current_hit_s2:.2f}, EYE:{current_eye_s2:.2f})")
-
-    stage_two_duration = time.time() - stage_two_start_time
-    print(f"\n階段二完成。耗時: {stage_two_duration:.2f} 秒。")
+        stage_two_start_time = time.time()
+        run_stage(2, process_stage_two_result)
+        stage_two_duration = time.time() - stage_two_start_time
+        print(f"\n階段二完成。耗時: {stage_two_duration:.2f} 秒。")
+        print(f"階段二共模擬 {stage_seasons_used[2]} 個賽季 (平均每個候選者 {stage_seasons_used[2] / max(1, len(top_candidates_abilities)):.1f} 個)。")
+        search_state["stage"] = "done"
+        search_state["candidates"], search_state["candidate_seeds"], search_state["common_seasons"] = [], [], None
+        save_search_state()
+
+    best_attrs_final, min_total_error_final = search_state["best"]
     print(f"為 {player_name} 自動迭代搜索完成 (兩階段)！")
     print(f"找到的最佳 POW, HIT, EYE 組合為：")
-    print(f"  POW: {best_pow_final:.2f}")
-    print(f"  HIT: {best_hit_final:.2f}")
-    print(f"  EYE: {best_eye_final:.2f}")
+    print(f"  POW: {best_attrs_final['POW']:.2f}")
+    print(f"  HIT: {best_attrs_final['HIT']:.2f}")
+    print(f"  EYE: {best_attrs_final['EYE']:.2f}")
     print(f"  對應的最小總誤差 (階段二): {min_total_error_final:.4f}")
     
-    return {"POW": best_pow_final, "HIT": best_hit_final, "EYE": best_eye_final}, min_total_error_final
+    return dict(best_attrs_final), min_total_error_final
+
+
+def _simulate_candidate_chunk(chunk_args):
+    """Worker: event-count arrays for a chunk of (event_probs, num_seasons, seed_sequence) candidates, in chunk order."""
+    target_pa, season_simulator_func, candidates = chunk_args
+    return [
+        season_simulator_func(num_seasons, target_pa, event_probs, rng=np.random.default_rng(seed_sequence))
+        for event_probs, num_seasons, seed_sequence in candidates
+    ]
+
+
+def _error_with_std_error(season_batch, error_func):
+    """
+    Error at the mean season stats, plus its standard error by the delta method: the error is
+    linearized around the mean with a finite-difference gradient, and the per-season projections
+    on that gradient (which carry the covariance between stats) give the spread.
+    """
+    stat_matrix = np.column_stack([season_batch.stat(stat_key) for stat_key in SEASON_STAT_KEYS]).astype(np.float64)
+    mean_values = stat_matrix.mean(axis=0)
+    error = error_func(dict(zip(SEASON_STAT_KEYS, mean_values.tolist())))
+    if len(season_batch) < 2:
+        return error, float('inf')
+    gradient = np.zeros(len(SEASON_STAT_KEYS))
+    for i, mean_value in enumerate(mean_values):
+        step = 1e-6 * max(1.0, abs(mean_value))
+        perturbed = mean_values.copy()
+        perturbed[i] += step
+        gradient[i] = (error_func(dict(zip(SEASON_STAT_KEYS, perturbed.tolist()))) - error) / step
+    projections = stat_matrix @ gradient
+    return error, float(projections.std(ddof=1) / math.sqrt(len(season_batch)))
+
+
+def find_best_attributes_racing_search(
+        player_name,
+        anchor_abilities,
+        target_pa,
+        target_counts,
+        target_ratios,
+        player_hbp_rate,
+        prob_calculator_func,
+        season_simulator_func, # 批次模擬: (num_seasons, num_pa, probabilities, rng=...) -> 事件計數陣列 (需可 pickle)
+        pow_search_range,
+        hit_search_range,
+        eye_search_range,
+        rng=None,
+        executor=None,
+        chunk_size=OPTIMIZER_CANDIDATE_CHUNK_SIZE,
+        initial_seasons=RACING_INITIAL_SEASONS,
+        max_seasons=RACING_MAX_SEASONS,
+        confidence=RACING_CONFIDENCE
+    ):
+    """
+    逐次減半競賽搜索: 與兩階段搜索相同的不重複偶數候選者，每輪讓存活者的累計賽季數加倍，
+    以階段二權重計算誤差及其信賴區間，下界高於最佳上界者 (明顯較差) 淘汰，其餘最多保留較佳的一半；
+    剩一個候選者或累計賽季數達 max_seasons 時停止。
+    每個候選者有自己的亂數串流 (每輪再衍生子串流)，結果與 executor、chunk_size 無關。
+    回傳 (best_attrs, min_err)，並印出總模擬量 (賽季數與打席數)。
+    """
+    rng = make_rng(rng)
+    z_value = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def candidate_error(stats, abilities):
+        return calculate_error_with_anchor(
+            stats, target_ratios, target_counts, abilities, anchor_abilities,
+            ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
+        )
+
+    triples, exhaustive = sample_distinct_even_triples(
+        pow_search_range, hit_search_range, eye_search_range, NUM_ITERATIONS_STAGE_ONE, rng
+    )
+    candidates = [{"POW": float(pow_value), "HIT": float(hit_value), "EYE": float(eye_value)}
+                  for pow_value, hit_value, eye_value in triples]
+    event_probs_list = [prob_calculator_func(c["POW"], c["HIT"], c["EYE"], player_hbp_rate) for c in candidates]
+    candidate_seeds = spawn_seed_sequences(rng, len(candidates))
+    candidate_batches = [None] * len(candidates)
+
+    print(f"\n===== {player_name}: 逐次減半競賽搜索 =====")
+    print(f"{len(candidates)} 個{'(窮舉) ' if exhaustive else ''}不重複候選者，第一輪每位 {initial_seasons} 個賽季，"
+          f"之後存活者累計賽季數逐輪加倍 (上限 {max_seasons})，信賴水準 {confidence:.0%}。")
+    print(f"誤差權重: {ERROR_WEIGHTS_STAGE_TWO}")
+    print(f"錨點懲罰權重: {DEVIATION_PENALTY_WEIGHT_STAGE_TWO}")
+
+    start_time = time.time()
+    survivors = list(range(len(candidates)))
+    total_seasons = 0
+    round_seasons = initial_seasons # 本輪新增的賽季數 (第一輪之後等於目前累計數，即加倍)
+    round_number = 0
+    estimates = {}
+    mapper = executor.map if executor is not None else map
+    while True:
+        round_number += 1
+        round_candidates = [
+            (event_probs_list[index], round_seasons, candidate_seeds[index].spawn(1)[0]) for index in survivors
+        ]
+        chunk_args = [
+            (target_pa, season_simulator_func, round_candidates[chunk_start:chunk_start + chunk_size])
+            for chunk_start in range(0, len(round_candidates), chunk_size)
+        ]
+        round_counts = [counts for chunk_counts in mapper(_simulate_candidate_chunk, chunk_args) for counts in chunk_counts]
+        for index, counts in zip(survivors, round_counts):
+            new_batch = SeasonBatch(counts)
+            candidate_batches[index] = (new_batch if candidate_batches[index] is None
+                                        else SeasonBatch.concatenate([candidate_batches[index], new_batch]))
+            estimates[index] = _error_with_std_error(
+                candidate_batches[index], lambda stats, abilities=candidates[index]: candidate_error(stats, abilities)
+            )
+        total_seasons += round_seasons * len(survivors)
+        seasons_per_candidate = len(candidate_batches[survivors[0]])
+
+        # 誤差下界高於最佳上界者明顯較差；其餘依誤差排序 (序號打破平手) 最多保留一半
+        best_upper = min(estimates[index][0] + z_value * estimates[index][1] for index in survivors)
+        ci_survivors = [index for index in survivors if estimates[index][0] - z_value * estimates[index][1] <= best_upper]
+        ci_survivors.sort(key=lambda index: (estimates[index][0], index))
+        next_survivors = ci_survivors[:max(1, math.ceil(len(survivors) / 2))]
+        best_index = ci_survivors[0]
+        best_error, best_std_error = estimates[best_index]
+        print(f"  第 {round_number} 輪: {len(survivors)} 個候選者, 每位累計 {seasons_per_candidate} 個賽季, "
+              f"最佳誤差 {best_error:.4f} ± {z_value * best_std_error:.4f} "
+              f"(POW:{candidates[best_index]['POW']:.2f}, HIT:{candidates[best_index]['HIT']:.2f}, EYE:{candidates[best_index]['EYE']:.2f}); "
+              f"信賴區間淘汰 {len(survivors) - len(ci_survivors)}, 減半淘汰 {len(ci_survivors) - len(next_survivors)}")
+
+        if len(next_survivors) == 1 or seasons_per_candidate * 2 > max_seasons:
+            survivors = next_survivors
+            break
+        survivors = next_survivors
+        round_seasons = seasons_per_candidate
+
+    best_index = survivors[0]
+    best_attrs = dict(candidates[best_index])
+    min_error = estimates[best_index][0]
+    fixed_budget_seasons = (NUM_ITERATIONS_STAGE_ONE * NUM_SEASONS_PER_EVAL_STAGE_ONE
+                            + TOP_N_CANDIDATES_FROM_STAGE_ONE * NUM_SEASONS_PER_EVAL_STAGE_TWO)
+    print(f"競賽搜索完成。耗時: {time.time() - start_time:.2f} 秒，共 {round_number} 輪。")
+    print(f"總模擬量: {total_seasons} 個賽季 / {total_seasons * target_pa} 個打席 "
+          f"(兩階段固定預算為 {fixed_budget_seasons} 個賽季，約 {total_seasons / fixed_budget_seasons:.0%})。")
+    print(f"找到的最佳 POW, HIT, EYE 組合為：")
+    print(f"  POW: {best_attrs['POW']:.2f}")
+    print(f"  HIT: {best_attrs['HIT']:.2f}")
+    print(f"  EYE: {best_attrs['EYE']:.2f}")
+    print(f"  對應的誤差: {min_error:.4f} ({len(candidate_batches[best_index])} 個賽季)")
+    return best_attrs, min_error
+
+
+def _grouped_mean_stats(season_counts):
+    """Per-candidate mean stats for stacked seasons of shape (candidates, seasons, events); one SeasonBatch for all."""
+    num_candidates, num_seasons = season_counts.shape[:2]
+    season_batch = SeasonBatch(season_counts.reshape(num_candidates * num_seasons, -1))
+    stat_means = {key: season_batch.stat(key).reshape(num_candidates, num_seasons).mean(axis=1) for key in SEASON_STAT_KEYS}
+    return [{key: float(stat_means[key][i]) for key in SEASON_STAT_KEYS} for i in range(num_candidates)]
+
+
+def _reference_seasons(triples, num_seasons, reference_pa, prob_calculator_func, season_simulator_func,
+                       rng, executor, chunk_size):
+    """
+    Shared evaluation cache entries for a set of (POW, HIT, EYE) triples: num_seasons seasons of
+    reference_pa PA at HBP rate 0 per triple, plus each triple's ball-in-play share at HBP 0
+    (needed to thin balls in play into HBP, see derive_season_counts).
+    Triples are simulated in sorted order, each with its own seed, so the cache does not depend on the executor.
+    """
+    triples = sorted(triples)
+    event_probs_list = [prob_calculator_func(float(p), float(h), float(e), 0.0) for p, h, e in triples]
+    candidates = [(event_probs, num_seasons, seed_sequence)
+                  for event_probs, seed_sequence in zip(event_probs_list, spawn_seed_sequences(rng, len(triples)))]
+    chunk_args = [(reference_pa, season_simulator_func, candidates[chunk_start:chunk_start + chunk_size])
+                  for chunk_start in range(0, len(candidates), chunk_size)]
+    mapper = executor.map if executor is not None else map
+    season_counts = [counts for chunk_counts in mapper(_simulate_candidate_chunk, chunk_args) for counts in chunk_counts]
+    ball_in_play_shares = [event_probs["2B"] + event_probs["1B"] + event_probs["IPO"] for event_probs in event_probs_list]
+    return {triple: (counts, share) for triple, counts, share in zip(triples, season_counts, ball_in_play_shares)}
+
+
+def _player_mean_stats(player, triples, cache, rng, league_avg_hbp_rate):
+    """
+    Mean stats of each triple for one player, derived from the shared cache (its PA count and HBP rate;
+    a missing rate means league_avg_hbp_rate, as in get_pa_event_probabilities).
+    """
+    if not triples:
+        return []
+    hbp_rate = clamp_hbp_rate(player["player_hbp_rate"], league_avg_hbp_rate)
+    reference_counts = np.stack([cache[triple][0] for triple in triples])
+    ball_in_play_shares = np.array([cache[triple][1] for triple in triples])
+    thinning = np.divide(hbp_rate, ball_in_play_shares, out=np.ones_like(ball_in_play_shares), where=ball_in_play_shares > 0)
+    return _grouped_mean_stats(derive_season_counts(reference_counts, player["target_pa"], thinning[:, np.newaxis], rng))
+
+
+def find_best_attributes_batch(
+        players, # 每位球員一個 dict: player_name, anchor_abilities, target_pa, target_counts, target_ratios, player_hbp_rate, search_ranges
+        prob_calculator_func,
+        season_simulator_func, # 批次模擬: (num_seasons, num_pa, probabilities, rng=...) -> 事件計數陣列 (需可 pickle)
+        rng=None,
+        executor=None,
+        chunk_size=OPTIMIZER_CANDIDATE_CHUNK_SIZE,
+        params=None # prob_calculator_func 使用的參數組 (預設為目前啟用的參數組)，用於未提供 HBP 率時的聯盟平均
+    ):
+    """
+    多球員批次兩階段搜索，共用評估快取。
+    每個屬性組合只在 HBP 率 0、所有球員中最多的打席數下模擬一次 (每階段一次)；每位球員的賽季由
+    derive_season_counts 從這些賽季推導 (抽出該球員打席數的子樣本並把部分界內球轉為觸身球)，
+    分布與直接模擬完全相同，因此搜索範圍重疊的球員共用同一批模擬。
+    階段一在所有球員搜索範圍的偶數格點聯集上抽樣 (密度與單人搜索的 NUM_ITERATIONS_STAGE_ONE 相同)，
+    每位球員評估落在自己範圍內的組合；階段二對各球員前 TOP_N_CANDIDATES_FROM_STAGE_ONE 名的聯集以新的賽季重新評估。
+    誤差權重與單人兩階段搜索相同。回傳 {player_name: (best_attrs, min_err)}。
+    """
+    rng = make_rng(rng)
+    league_avg_hbp_rate = (params if params is not None else get_active_parameter_set()).LEAGUE_AVG_HBP_RATE
+    reference_pa = max(player["target_pa"] for player in players)
+    player_rngs = [np.random.default_rng(seed_sequence) for seed_sequence in spawn_seed_sequences(rng, len(players))]
+    player_grids = [
+        set(itertools.product(*(get_even_integers_in_range(low, high) for low, high in player["search_ranges"])))
+        for player in players
+    ]
+    union_grid = sorted(set().union(*player_grids))
+    sample_fraction = max(min(1.0, NUM_ITERATIONS_STAGE_ONE / len(grid)) for grid in player_grids)
+    sample_size = min(len(union_grid), math.ceil(sample_fraction * len(union_grid)))
+    stage_one_triples = [union_grid[index] for index in sorted(rng.choice(len(union_grid), size=sample_size, replace=False))]
+    separate_stage_one = sum(min(NUM_ITERATIONS_STAGE_ONE, len(grid)) for grid in player_grids)
+
+    print(f"\n===== 批次最佳化: {len(players)} 位球員，共用評估快取 =====")
+    print(f"參考賽季: 每個組合 {reference_pa} 個打席、HBP 率 0；各球員的賽季由此推導。")
+    print(f"階段一: 搜索範圍聯集共 {len(union_grid)} 個偶數組合，抽取 {len(stage_one_triples)} 個 "
+          f"(各球員分別搜索共需 {separate_stage_one} 個)，每個模擬 {NUM_SEASONS_PER_EVAL_STAGE_ONE} 個賽季。")
+    start_time = time.time()
+    stage_one_cache = _reference_seasons(stage_one_triples, NUM_SEASONS_PER_EVAL_STAGE_ONE, reference_pa,
+                                         prob_calculator_func, season_simulator_func, rng, executor, chunk_size)
+
+    def player_errors(player, triples, mean_stats_list, error_weights, deviation_penalty_weight):
+        errors = []
+        for triple, mean_stats in zip(triples, mean_stats_list):
+            abilities = dict(zip(("POW", "HIT", "EYE"), map(float, triple)))
+            errors.append(calculate_error_with_anchor(
+                mean_stats, player["target_ratios"], player["target_counts"], abilities, player["anchor_abilities"],
+                error_weights, deviation_penalty_weight
+            ))
+        return errors
+
+    top_triples = []
+    for player, grid, player_rng in zip(players, player_grids, player_rngs):
+        triples = [triple for triple in stage_one_triples if triple in grid]
+        errors = player_errors(player, triples, _player_mean_stats(player, triples, stage_one_cache, player_rng, league_avg_hbp_rate),
+                               ERROR_WEIGHTS_STAGE_ONE, DEVIATION_PENALTY_WEIGHT_STAGE_ONE)
+        ranked = sorted(range(len(triples)), key=lambda i: (errors[i], i))[:TOP_N_CANDIDATES_FROM_STAGE_ONE]
+        top_triples.append([triples[i] for i in ranked])
+        best_error = errors[ranked[0]] if ranked else float('inf')
+        print(f"  {player['player_name']}: 階段一評估 {len(triples)} 個組合，最佳誤差 {best_error:.4f}")
+
+    stage_two_triples = set().union(*map(set, top_triples))
+    separate_stage_two = sum(len(triples) for triples in top_triples)
+    print(f"階段二: 各球員前 {TOP_N_CANDIDATES_FROM_STAGE_ONE} 名的聯集共 {len(stage_two_triples)} 個組合 "
+          f"(各球員分別搜索共需 {separate_stage_two} 個)，每個模擬 {NUM_SEASONS_PER_EVAL_STAGE_TWO} 個賽季。")
+    stage_two_cache = _reference_seasons(stage_two_triples, NUM_SEASONS_PER_EVAL_STAGE_TWO, reference_pa,
+                                         prob_calculator_func, season_simulator_func, rng, executor, chunk_size)
+
+    results = {}
+    for player, triples, player_rng in zip(players, top_triples, player_rngs):
+        errors = player_errors(player, triples, _player_mean_stats(player, triples, stage_two_cache, player_rng, league_avg_hbp_rate),
+                               ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO)
+        if errors:
+            best_index = min(range(len(triples)), key=lambda i: (errors[i], i))
+            best_attrs = dict(zip(("POW", "HIT", "EYE"), map(float, triples[best_index])))
+            min_error = errors[best_index]
+        else: # 搜索範圍內沒有抽到組合時保留錨點
+            best_attrs, min_error = dict(player["anchor_abilities"]), float('inf')
+        results[player["player_name"]] = (best_attrs, min_error)
+        print(f"  {player['player_name']}: POW: {best_attrs['POW']:.2f}  HIT: {best_attrs['HIT']:.2f}  "
+              f"EYE: {best_attrs['EYE']:.2f}  誤差 (階段二): {min_error:.4f}")
+
+    simulated_seasons = (len(stage_one_triples) * NUM_SEASONS_PER_EVAL_STAGE_ONE
+                         + len(stage_two_triples) * NUM_SEASONS_PER_EVAL_STAGE_TWO)
+    separate_seasons = separate_stage_one * NUM_SEASONS_PER_EVAL_STAGE_ONE + separate_stage_two * NUM_SEASONS_PER_EVAL_STAGE_TWO
+    print(f"批次最佳化完成。耗時: {time.time() - start_time:.2f} 秒。")
+    print(f"總模擬量: {simulated_seasons} 個賽季 (各球員分別搜索需 {separate_seasons} 個，"
+          f"約 {simulated_seasons / max(1, separate_seasons):.0%})。")
+    return results
+
+
+def nelder_mead_minimize(objective, start_point, initial_step=SURROGATE_INITIAL_STEP,
+                         max_evaluations=SURROGATE_MAX_EVALUATIONS,
+                         error_tolerance=SURROGATE_ERROR_TOLERANCE,
+                         point_tolerance=SURROGATE_ATTRIBUTE_TOLERANCE):
+    """
+    Derivative-free Nelder-Mead minimization (standard coefficients: reflection 1,
+    expansion 2, contraction 0.5, shrink 0.5). The simplex starts at start_point plus one
+    vertex per axis offset by initial_step. Stops when both the spread of objective values
+    and the distance of every vertex from the best one are within tolerance, or after
+    max_evaluations calls. Returns (best_point, best_value, evaluations).
+    """
+    start_point = [float(value) for value in start_point]
+    dimension = len(start_point)
+    simplex = [start_point] + [
+        [value + (initial_step if axis == i else 0.0) for axis, value in enumerate(start_point)]
+        for i in range(dimension)
+    ]
+    values = [objective(point) for point in simplex]
+    evaluations = len(simplex)
+
+    def towards(origin, target, factor):
+        return [o + factor * (t - o) for o, t in zip(origin, target)]
+
+    while evaluations < max_evaluations:
+        order = sorted(range(len(simplex)), key=values.__getitem__)
+        simplex = [simplex[i] for i in order]
+        values = [values[i] for i in order]
+        best, worst = simplex[0], simplex[-1]
+        if values[-1] - values[0] <= error_tolerance and all(
+            abs(a - b) <= point_tolerance for point in simplex[1:] for a, b in zip(point, best)
+        ):
+            break
+
+        centroid = [sum(point[axis] for point in simplex[:-1]) / dimension for axis in range(dimension)]
+        reflected = towards(centroid, worst, -1.0)
+        reflected_value = objective(reflected)
+        evaluations += 1
+        if reflected_value < values[0]:
+            expanded = towards(centroid, worst, -2.0)
+            expanded_value = objective(expanded)
+            evaluations += 1
+            if expanded_value < reflected_value:
+                simplex[-1], values[-1] = expanded, expanded_value
+            else:
+                simplex[-1], values[-1] = reflected, reflected_value
+            continue
+        if reflected_value < values[-2]:
+            simplex[-1], values[-1] = reflected, reflected_value
+            continue
+
+        # Contraction: outside when the reflection beat the worst vertex, inside otherwise
+        if reflected_value < values[-1]:
+            contracted = towards(centroid, reflected, 0.5)
+        else:
+            contracted = towards(centroid, worst, 0.5)
+        contracted_value = objective(contracted)
+        evaluations += 1
+        if contracted_value < min(reflected_value, values[-1]):
+            simplex[-1], values[-1] = contracted, contracted_value
+            continue
+
+        # Shrink every vertex towards the best one
+        for i in range(1, len(simplex)):
+            simplex[i] = towards(best, simplex[i], 0.5)
+            values[i] = objective(simplex[i])
+        evaluations += len(simplex) - 1
+
+    best_index = min(range(len(simplex)), key=values.__getitem__)
+    return simplex[best_index], values[best_index], evaluations
+
+
+def find_best_attributes_surrogate(
+        player_name,
+        anchor_abilities,
+        target_pa,
+        target_counts,
+        target_ratios,
+        player_hbp_rate,
+        prob_calculator_func,
+        pow_search_range,
+        hit_search_range,
+        eye_search_range,
+        season_simulator_func=None, # 提供時以蒙地卡羅做最終驗證: (num_seasons, num_pa, probabilities, rng=...) -> 事件計數陣列
+        stats_calculator_func=None, # 事件計數陣列 -> SeasonBatch (提供 .mean())
+        validation_seasons=NUM_SEASONS_PER_EVAL_STAGE_THREE,
+        rng=None,
+        verbose=True
+    ):
+    """
+    代理最佳化: 事件機率是屬性的確定性函數，因此直接對解析期望統計量 (expected_sim_stats)
+    計算 calculate_error_with_anchor (階段二權重)，以 Nelder-Mead 從錨點及其周圍多個起點搜索，
+    並加入解析反推 (invert_target_line) 的解作為起點，屬性限制在搜索範圍內。蒙地卡羅只用於最後的驗證。
+    回傳 (best_attrs, error)；有驗證時 error 為驗證模擬的誤差 (與兩階段搜索的回傳值可比)，否則為代理誤差。
+    """
+    search_ranges = [pow_search_range, hit_search_range, eye_search_range]
+    attribute_keys = ["POW", "HIT", "EYE"]
+
+    def clamp(point):
+        return [min(max(value, low), high) for value, (low, high) in zip(point, search_ranges)]
+
+    def surrogate_error(point):
+        abilities = dict(zip(attribute_keys, clamp(point)))
+        event_probs = prob_calculator_func(abilities["POW"], abilities["HIT"], abilities["EYE"], player_hbp_rate)
+        return calculate_error_with_anchor(
+            expected_sim_stats(event_probs, target_pa), target_ratios, target_counts,
+            abilities, anchor_abilities,
+            ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
+        )
+
+    anchor_point = clamp([float(anchor_abilities[key]) for key in attribute_keys])
+    start_points = [anchor_point]
+    for axis in range(len(attribute_keys)):
+        for direction in (-1.0, 1.0):
+            start_point = list(anchor_point)
+            start_point[axis] += direction * SURROGATE_START_OFFSET
+            start_points.append(clamp(start_point))
+    try: # 解析反推的解通常已接近最佳點
+        inverse_attrs = invert_target_line(target_ratios, target_counts, player_hbp_rate)
+        start_points.append(clamp([inverse_attrs[key] for key in attribute_keys]))
+    except ValueError as error:
+        if verbose:
+            print(f"  解析反推失敗，略過該起點: {error}")
+
+    if verbose:
+        print(f"\n===== {player_name}: 代理最佳化 (解析期望值 + Nelder-Mead, {len(start_points)} 個起點) =====")
+    start_time = time.time()
+    best_point, best_error, total_evaluations = None, float('inf'), 0
+    for start_index, start_point in enumerate(start_points):
+        point, error, evaluations = nelder_mead_minimize(surrogate_error, start_point)
+        total_evaluations += evaluations
+        point = clamp(point)
+        if verbose:
+            print(f"  起點 {start_index + 1}/{len(start_points)} "
+                  f"(POW:{start_point[0]:.2f}, HIT:{start_point[1]:.2f}, EYE:{start_point[2]:.2f}) -> "
+                  f"誤差 {error:.4f} (POW:{point[0]:.2f}, HIT:{point[1]:.2f}, EYE:{point[2]:.2f}), {evaluations} 次評估")
+        if error < best_error:
+            best_point, best_error = point, error
+    best_attrs = dict(zip(attribute_keys, best_point))
+    if verbose:
+        print(f"代理最佳化完成。耗時: {time.time() - start_time:.3f} 秒，共 {total_evaluations} 次評估。")
+        print(f"  POW: {best_attrs['POW']:.2f}  HIT: {best_attrs['HIT']:.2f}  EYE: {best_attrs['EYE']:.2f}")
+        print(f"  代理誤差 (階段二權重): {best_error:.4f}")
+
+    if season_simulator_func is None or stats_calculator_func is None:
+        return best_attrs, best_error
+
+    rng = make_rng(rng)
+    event_probs = prob_calculator_func(best_attrs["POW"], best_attrs["HIT"], best_attrs["EYE"], player_hbp_rate)
+    validation_stats = stats_calculator_func(season_simulator_func(validation_seasons, target_pa, event_probs, rng=rng)).mean()
+    validation_error = calculate_error_with_anchor(
+        validation_stats, target_ratios, target_counts, best_attrs, anchor_abilities,
+        ERROR_WEIGHTS_STAGE_TWO, DEVIATION_PENALTY_WEIGHT_STAGE_TWO
+    )
+    if verbose:
+        print(f"  蒙地卡羅驗證 ({validation_seasons} 個賽季) 誤差: {validation_error:.4f}")
+    return best_attrs, validation_error
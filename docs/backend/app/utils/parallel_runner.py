@@ -0,0 +1,45 @@
+# parallel_runner.py
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backend.app.core.rng import spawn_seed_sequences
+
+
+def _run_task(func, kwargs, seed_sequence):
+    """Runs one task on its own Generator, passed as the `rng` keyword."""
+    return func(**kwargs, rng=np.random.default_rng(seed_sequence))
+
+
+def _run_captured_task(task_args):
+    """Worker: runs one task and returns (result, captured stdout)."""
+    func, kwargs, seed_sequence = task_args
+    log_buffer = io.StringIO()
+    with contextlib.redirect_stdout(log_buffer):
+        result = _run_task(func, kwargs, seed_sequence)
+    return result, log_buffer.getvalue()
+
+
+def run_tasks_in_pool(tasks, max_workers=None, seed=None):
+    """
+    Runs independent tasks [(func, kwargs), ...] across a ProcessPoolExecutor.
+    Each task receives its own Generator as the `rng` keyword, spawned from seed by task
+    position. Its printed output is captured and replayed in submission order, so the
+    console log and the returned result list are the same as a serial run regardless of
+    which task finishes first. max_workers=1 runs the tasks in-process with the same
+    streams, so a seeded job reproduces exactly at any worker count.
+    """
+    task_seeds = spawn_seed_sequences(seed, len(tasks))
+    task_args = [(func, kwargs, task_seed) for (func, kwargs), task_seed in zip(tasks, task_seeds)]
+
+    results = []
+    if max_workers == 1:
+        # In-process: output streams live, no capture needed
+        return [_run_task(*args) for args in task_args]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for result, log_text in executor.map(_run_captured_task, task_args):
+            print(log_text, end="")
+            results.append(result)
+    return results
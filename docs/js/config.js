@@ -4,6 +4,7 @@
 // overall ratings (OVR) weights, stat normalization effects, probability caps, and stat colors.
 export const CONFIG = {
     innings: 9,
+    atBatPrefetchCount: 20, // 每次批次請求為每位打者預抽的打席結果數 (/api/v1/simulate_at_bats)
     baseProbabilities: {
         strikeout: 0.21,
         walk: 0.08,
@@ -94,16 +94,12 @@ export function initializeGame(gameTeams, awayStarterRotationIndex, homeStarterR
     console.log(`Game initialized. Away Starter: ${gameState.awayStartingPitcherThisGame?.name}, Home Starter: ${gameState.homeStartingPitcherThisGame?.name}`);
 }
 
-/**
- * Simulates an at-bat by calling the backend API.
- * @param {object} batter - The current batter object.
- * @param {object} pitcher - The current pitcher object.
- * @returns {Promise<object>} A promise that resolves to an object representing the at-bat outcome.
- */
-async function simulateAtBat(batter, pitcher) {
-    console.log(`Simulating at-bat for: <span class="math-inline">\{batter\.name\} \(POW\:</span>{batter.power}, HIT:<span class="math-inline">\{batter\.hitRate\}, EYE\:</span>{batter.contact}) vs ${pitcher.name}`); // 這裡的 log 仍用舊名
+// Pre-drawn API outcomes per batter attribute set. Outcomes do not depend on the game situation,
+// so drawing them ahead of time in one batch request is equivalent to one request per at-bat.
+const atBatOutcomeBuffers = new Map();
 
-    const batterApiAttributes = {
+function getBatterApiAttributes(batter) {
+    return {
         // 假設 teamsData.js 中的 batter.power, batter.hitRate, batter.contact 已經是後端尺度
         // 如果您在 teamsData.js 中已將屬性名改為 pow, hit, eye，則用 batter.pow, batter.hit, batter.eye
         pow: batter.power || 70,     // 直接使用，不再乘以 9.9。提供預設值以防萬一。
@@ -111,34 +107,67 @@ async function simulateAtBat(batter, pitcher) {
         eye: batter.contact || 70,   // 直接使用
         hbp_rate: batter.hbp_rate || 0.010
     };
-    // Log the attributes being sent to the API (這些應該是後端尺度的大數值了)
-    console.log("[Frontend] Attributes sent to API (backend scale):", batterApiAttributes);
+}
+
+function getOutcomeBufferKey(attributes) {
+    return `${attributes.pow}|${attributes.hit}|${attributes.eye}|${attributes.hbp_rate}`;
+}
+
+/**
+ * Refills the outcome buffers of every listed batter whose buffer is empty with one
+ * /api/v1/simulate_at_bats request (CONFIG.atBatPrefetchCount outcomes per batter).
+ * @param {object[]} batters - Batters to prefetch for (e.g. both lineups).
+ */
+async function prefetchAtBatOutcomes(batters) {
+    const requests = new Map();
+    for (const batter of batters) {
+        const attributes = getBatterApiAttributes(batter);
+        const key = getOutcomeBufferKey(attributes);
+        const buffer = atBatOutcomeBuffers.get(key);
+        if ((!buffer || buffer.length === 0) && !requests.has(key)) {
+            requests.set(key, { ...attributes, count: CONFIG.atBatPrefetchCount });
+        }
+    }
+    if (requests.size === 0) return;
+
+    const response = await fetch('http://localhost:8000/api/v1/simulate_at_bats', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ at_bats: [...requests.values()] }),
+    });
+    if (!response.ok) {
+        const errorText = await response.text(); // Get more error details
+        throw new Error(`API Error: ${response.status} - ${response.statusText} ${errorText}`);
+    }
+    const apiResult = await response.json();
+    [...requests.keys()].forEach((key, index) => {
+        atBatOutcomeBuffers.set(key, apiResult.results[index].outcomes);
+    });
+}
 
+/**
+ * Simulates an at-bat with an outcome drawn by the backend API.
+ * Outcomes come from a per-batter buffer that is refilled for the whole list of lineup batters
+ * in one batch request when the current batter's buffer runs out.
+ * @param {object} batter - The current batter object.
+ * @param {object} pitcher - The current pitcher object.
+ * @param {object[]} [lineupBatters] - Batters to prefetch for together with the current batter.
+ * @returns {Promise<object>} A promise that resolves to an object representing the at-bat outcome.
+ */
+async function simulateAtBat(batter, pitcher, lineupBatters = []) {
+    console.log(`Simulating at-bat for: ${batter.name} (POW:${batter.power}, HIT:${batter.hitRate}, EYE:${batter.contact}) vs ${pitcher.name}`);
 
+    const batterApiAttributes = getBatterApiAttributes(batter);
+    const bufferKey = getOutcomeBufferKey(batterApiAttributes);
 
     try {
-        const response = await fetch('http://localhost:8000/api/v1/simulate_at_bat', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(batterApiAttributes),
-        });
-
-        if (!response.ok) {
-            const errorText = await response.text(); // Get more error details
-            console.error(`API Error: ${response.status} - ${response.statusText}`, errorText);
-            return {
-                event: "OUT",
-                description: `${batter.name} hits into an out (API error: ${response.status}). `,
-                batter,
-                pitcher,
-                basesAdvanced: 0
-            };
+        const buffer = atBatOutcomeBuffers.get(bufferKey);
+        if (!buffer || buffer.length === 0) {
+            await prefetchAtBatOutcomes([batter, ...lineupBatters]);
         }
-
-        const apiResult = await response.json();
-        const apiOutcome = apiResult.outcome;
+        const apiOutcome = atBatOutcomeBuffers.get(bufferKey).shift();
 
         let gameEvent;
         let description = "";
@@ -199,7 +228,7 @@ async function simulateAtBat(batter, pitcher) {
         console.error("Failed to fetch at-bat simulation from API:", error);
         return {
             event: "OUT",
-            description: `${batter.name} hits into an out (Network error). `,
+            description: `${batter.name} hits into an out (API error). `,
             batter,
             pitcher,
             basesAdvanced: 0
@@ -618,7 +647,8 @@ export async function playNextAtBat(gameTeams) { // Made async
     // --- END PITCHER CHANGE LOGIC ---
 
 
-    const atBatResult = await simulateAtBat(gameState.activeBatter, gameState.activePitcher); 
+    const atBatResult = await simulateAtBat(gameState.activeBatter, gameState.activePitcher,
+                                            [...gameTeams.away.batters, ...gameTeams.home.batters]); 
     
     // Reduce pitcher stamina after the at-bat
     if (gameState.activePitcher && CONFIG && CONFIG.stamina) {